@@ -0,0 +1,124 @@
+"""
+Lasttest der Kreis-API: vollständige Liste (POST) gegen inkrementelle Updates.
+
+Startet den FastAPI-Server aus server.py ohne Pygame-Fenster in einem eigenen
+Thread, legt eine Kreistabelle mit --circles Kreisen an und bewegt dann
+fortlaufend Kreise, wie es ein Tracker mit Kamera-Bildrate tun würde:
+
+  post   POST /circles mit der ganzen Liste (bisheriger Weg)
+  put    PUT /circles/{name} mit einem Kreis
+  patch  PATCH /circles mit --batch Kreisen
+  ws     WebSocket /ws/circles mit --batch Kreisen pro Nachricht
+
+Gemessen werden Kreis-Updates pro Sekunde und die Latenz pro Anfrage; der
+Zustand wird dabei wie im Betrieb im Hintergrund gespeichert.
+Benötigt httpx und websockets (beides lokale Clients).
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _circle(i: int, step: int) -> dict:
+    return {"name": f"circle_{i}", "x": (i * 7 + step) % 1024, "y": (i * 13 + step) % 512,
+            "radius": 10 + i % 20, "color": [i % 256, step % 256, 128]}
+
+
+def _run(name: str, send, seconds: float, updates_per_request: int) -> dict:
+    latencies = []
+    step = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        t0 = time.perf_counter()
+        send(step)
+        latencies.append(time.perf_counter() - t0)
+        step += 1
+    elapsed = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000.0
+    return {"scenario": name, "requests": len(latencies),
+            "updates_per_s": len(latencies) * updates_per_request / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50)), "p99_ms": float(np.percentile(latencies, 99))}
+
+
+def benchmark(circles: int = 100, batch: int = 10, seconds: float = 3.0, journal: bool = False):
+    import httpx
+    import uvicorn
+    from websockets.sync.client import connect
+
+    import server as ui_server
+    from circle_table import CircleTable
+    from persistence import StatePersister
+
+    state_dir = tempfile.mkdtemp()
+    ui_server._circle_table = CircleTable(capacity=max(circles, 1))
+    ui_server._persister = StatePersister(os.path.join(state_dir, "circles_state.json"), ui_server._circle_table.rows,
+                                     journal=journal)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(ui_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{port}"
+    results = []
+    with httpx.Client(base_url=base) as client:
+        client.post("/circles", json={"circles": [_circle(i, 0) for i in range(circles)]}).raise_for_status()
+
+        def post(step):
+            listing = [_circle(i, 0) for i in range(circles)]
+            listing[step % circles] = _circle(step % circles, step)
+            client.post("/circles", json={"circles": listing}).raise_for_status()
+
+        def put(step):
+            circle = _circle(step % circles, step)
+            client.put(f"/circles/{circle['name']}", json=circle).raise_for_status()
+
+        def patch(step):
+            moved = [_circle((step * batch + k) % circles, step) for k in range(batch)]
+            client.patch("/circles", json={"upsert": moved}).raise_for_status()
+
+        results.append(_run("post", post, seconds, 1))
+        results.append(_run("put", put, seconds, 1))
+        results.append(_run("patch", patch, seconds, batch))
+
+    with connect(f"ws://127.0.0.1:{port}/ws/circles") as websocket:
+        def ws(step):
+            moved = [_circle((step * batch + k) % circles, step) for k in range(batch)]
+            websocket.send(json.dumps({"upsert": moved}))
+            reply = json.loads(websocket.recv())
+            if "error" in reply:
+                raise RuntimeError(reply["error"])
+
+        results.append(_run("ws", ws, seconds, batch))
+
+    server.should_exit = True
+    thread.join(timeout=5.0)
+    print(f"Zustand {ui_server._persister.writes}x gespeichert, zuletzt in {ui_server._persister.last_write_ms:.2f} ms")
+    ui_server._circle_table.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lasttest der Kreis-API (POST gegen PUT/PATCH/WebSocket).")
+    parser.add_argument("--circles", type=int, default=100, help="Anzahl Kreise im Zustand")
+    parser.add_argument("--batch", type=int, default=10, help="Kreise pro PATCH/WebSocket-Nachricht")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Dauer pro Szenario")
+    parser.add_argument("--journal", action="store_true", help="Zustand mit Journal speichern")
+    args = parser.parse_args()
+
+    print(f"{'Szenario':<8} {'Anfragen':>9} {'Updates/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for r in benchmark(args.circles, args.batch, args.seconds, args.journal):
+        print(f"{r['scenario']:<8} {r['requests']:>9} {r['updates_per_s']:>10.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
@@ -0,0 +1,465 @@
+"""
+Kreistabelle in multiprocessing.shared_memory für FastAPI- und Pygame-Prozess.
+
+Die Kreise liegen als Struct-of-Arrays (Name, x, y, Radius, Farbe) mit fester
+Kapazität in einem einzigen Shared-Memory-Block. Geschrieben wird nur aus dem
+FastAPI-Prozess, direkt in die Arrays. Ein Sequenzzähler (Seqlock) schützt die
+Leser: Er ist während eines Schreibvorgangs ungerade, danach wieder gerade.
+Der Renderer kopiert die Arrays in eigene, vorab angelegte Puffer und
+wiederholt die Kopie, falls sich der Zähler dabei geändert hat. Weder Leser
+noch Schreiber nehmen prozessübergreifende Locks oder pickeln Objekte.
+
+Im schreibenden Prozess führt die Tabelle zu jedem Schreibvorgang einen
+räumlichen Index (spatial_index.CircleGrid) mit, über den hits() und
+hits_in_rect() die Kreise unter Punkten bzw. in einem Rechteck finden. Er wird
+erst nach dem Schreibvorgang (Zähler wieder gerade) aktualisiert, damit der
+Renderer nicht auf ihn wartet; nach replace() baut ihn erst die nächste
+Abfrage neu auf.
+
+Als Skript aufgerufen führt es einen Belastungstest aus: Ein Schreiber ändert
+die Tabelle tausende Male pro Sekunde, während ein Leser-Prozess im
+Render-Takt Schnappschüsse nimmt und jeden auf Konsistenz prüft.
+"""
+import argparse
+import threading
+import time
+from multiprocessing import Process, Value, shared_memory
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from spatial_index import CircleGrid
+
+NAME_BYTES = 32
+LATENCY_SAMPLES = 512
+# capture_time: Aufnahmezeitpunkt (time.time()) des Kamerabilds, aus dem die letzte Änderung stammt, sonst 0.
+# latency_count: Anzahl der vom Renderer eingetragenen Glass-to-Glass-Latenzen (Ringpuffer "latency").
+HEADER_DTYPE = np.dtype([("sequence", "<u8"), ("count", "<u4"), ("capacity", "<u4"),
+                         ("capture_time", "<f8"), ("latency_count", "<u8")])
+
+
+def _columns(circles: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wandelt (x, y, radius) und color vorab in Arrays um und prüft die Wertebereiche,
+    damit ein Schreibvorgang nicht mittendrin scheitert und den Zähler ungerade lässt.
+    """
+    try:
+        values = np.array([(c.x, c.y, c.radius) for c in circles], dtype=np.int64).reshape(-1, 3)
+        colors = np.array([tuple(c.color) for c in circles], dtype=np.int64).reshape(-1, 3)
+    except (OverflowError, TypeError) as e:
+        raise ValueError(f"Ungültige Kreiswerte: {e}") from e
+    limits = np.iinfo(np.int32)
+    if values.size and (values.min() < limits.min or values.max() > limits.max):
+        raise ValueError(f"Position und Radius müssen zwischen {limits.min} und {limits.max} liegen.")
+    if colors.size and (colors.min() < 0 or colors.max() > 255):
+        raise ValueError("Farbwerte müssen zwischen 0 und 255 liegen.")
+    return values.astype(np.int32), colors.astype(np.uint8)
+
+
+def _encode_names(names: Iterable[str]) -> List[bytes]:
+    encoded = [name.encode("utf-8") for name in names]
+    for name in encoded:
+        if len(name) > NAME_BYTES:
+            raise ValueError(f"Name '{name.decode()}' ist länger als {NAME_BYTES} Byte.")
+    return encoded
+
+
+def _layout(capacity: int):
+    """Offsets der Arrays im Block, jeweils auf 8 Byte ausgerichtet."""
+    fields = [("name", np.dtype(f"S{NAME_BYTES}"), ()), ("x", np.dtype("<i4"), ()), ("y", np.dtype("<i4"), ()),
+              ("radius", np.dtype("<i4"), ()), ("color", np.dtype("u1"), (3,))]
+    shapes = [(name, dtype, (capacity,) + shape) for name, dtype, shape in fields]
+    shapes.append(("latency", np.dtype("<f8"), (LATENCY_SAMPLES,)))
+    offset = HEADER_DTYPE.itemsize
+    layout = []
+    for name, dtype, shape in shapes:
+        layout.append((name, dtype, shape, offset))
+        offset += dtype.itemsize * int(np.prod(shape, dtype=int))
+        offset += -offset % 8
+    return layout, offset
+
+
+class CircleSnapshot:
+    """Vorab angelegte Kopie der Tabelle für den Renderer."""
+
+    def __init__(self, capacity: int):
+        self.generation = -1
+        self.count = 0
+        self.capture_time = 0.0
+        self.name = np.zeros(capacity, dtype=f"S{NAME_BYTES}")
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.radius = np.zeros(capacity, dtype=np.int32)
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+
+
+class CircleTable:
+    """
+    Struct-of-Arrays-Kreistabelle im Shared Memory.
+
+    Args:
+        capacity (int): Maximale Anzahl Kreise (nur beim Anlegen).
+        name (str): Name eines bestehenden Blocks, an den angehängt wird.
+        notify: Optional, multiprocessing.Event, das nach jedem Schreibvorgang gesetzt
+                wird, damit der Renderer ohne Polling aufwacht.
+        grid_cell_size (int): Zellgröße des räumlichen Index in Pixeln.
+    """
+
+    def __init__(self, capacity: int = 1024, name: Optional[str] = None, notify=None, grid_cell_size: int = 64):
+        if name is None:
+            _, size = _layout(capacity)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = _attach(name)
+            self.owner = False
+        self.header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        if self.owner:
+            self.header["capacity"] = capacity
+        self.capacity = int(self.header["capacity"][0])
+        layout, _ = _layout(self.capacity)
+        for field, dtype, shape, offset in layout:
+            setattr(self, field, np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset))
+        self._write_lock = threading.Lock()
+        self.notify = notify
+        # Name -> Zeile und räumlicher Index, werden nur im schreibenden Prozess gepflegt
+        self._slots: Dict[bytes, int] = {}
+        self.grid = CircleGrid(grid_cell_size)
+        self._grid_stale = False
+
+    @property
+    def shm_name(self) -> str:
+        """Name des Shared-Memory-Blocks zum Anhängen in einem anderen Prozess."""
+        return self.shm.name
+
+    @property
+    def generation(self) -> int:
+        """Anzahl abgeschlossener Schreibvorgänge."""
+        return int(self.header["sequence"][0]) // 2
+
+    def _begin(self):
+        self.header["sequence"] += 1  # ungerade: Schreibvorgang läuft
+
+    def _end(self):
+        self.header["sequence"] += 1
+        if self.notify is not None:
+            self.notify.set()
+
+    def __len__(self) -> int:
+        return int(self.header["count"][0])
+
+    def __contains__(self, name: str) -> bool:
+        return name.encode("utf-8") in self._slots
+
+    def replace(self, circles: Sequence) -> int:
+        """
+        Ersetzt alle Kreise (Objekte mit name, x, y, radius, color).
+
+        Returns:
+            int: Die neue Generation.
+
+        Raises:
+            ValueError: Zu viele Kreise, doppelte Namen, ein Name länger als NAME_BYTES
+                        oder Werte außerhalb von int32 bzw. Farben außerhalb von 0..255.
+        """
+        if len(circles) > self.capacity:
+            raise ValueError(f"Höchstens {self.capacity} Kreise möglich, erhalten: {len(circles)}.")
+        names = _encode_names(c.name for c in circles)
+        if len(set(names)) != len(names):
+            raise ValueError("Die Namen der Kreise müssen eindeutig sein.")
+        values, colors = _columns(circles)
+        name_array = np.array(names, dtype=f"S{NAME_BYTES}")
+        slots = {name: i for i, name in enumerate(names)}
+        n = len(circles)
+        with self._write_lock:
+            self._begin()
+            try:
+                self.name[:n] = name_array
+                self.x[:n] = values[:, 0]
+                self.y[:n] = values[:, 1]
+                self.radius[:n] = values[:, 2]
+                self.color[:n] = colors
+                self.header["count"] = n
+                self.header["capture_time"] = 0.0
+                self._slots = slots
+            finally:
+                self._end()
+            # Der Index gehört nur diesem Prozess und wird erst bei der nächsten Abfrage neu aufgebaut
+            self._grid_stale = True
+        return self.generation
+
+    def apply(self, upsert: Sequence = (), delete: Sequence[str] = (), capture_time: Optional[float] = None) -> int:
+        """
+        Ändert einzelne Kreise, identifiziert über ihren Namen, in einem Schreibvorgang.
+
+        Zuerst werden die Kreise in delete entfernt (unbekannte Namen werden
+        ignoriert), dann die Kreise in upsert eingefügt oder überschrieben.
+        Entfernte Kreise werden durch den letzten Eintrag ersetzt, damit die
+        Tabelle lückenlos bleibt. capture_time (time.time() der Kameraaufnahme)
+        wird mitgeschrieben, damit der Renderer die Glass-to-Glass-Latenz messen kann.
+
+        Returns:
+            int: Die neue Generation.
+
+        Raises:
+            ValueError: Kapazität überschritten, ein Name länger als NAME_BYTES oder
+                        Werte außerhalb von int32 bzw. Farben außerhalb von 0..255.
+        """
+        names = _encode_names(c.name for c in upsert)
+        removed = _encode_names(delete)
+        values, colors = _columns(upsert)
+        rows = list(zip(names, values.tolist(), colors))
+        with self._write_lock:
+            remaining = self._slots.keys() - set(removed)
+            added = set(names) - remaining
+            if len(remaining) + len(added) > self.capacity:
+                raise ValueError(f"Höchstens {self.capacity} Kreise möglich.")
+            count = len(self._slots)
+            moves, inserts = [], []
+            self._begin()
+            try:
+                for name in removed:
+                    i = self._slots.pop(name, None)
+                    if i is None:
+                        continue
+                    count -= 1
+                    moves.append((i, count))
+                    if i != count:
+                        self._move(count, i)
+                for name, (x, y, radius), color in rows:
+                    i = self._slots.get(name)
+                    if i is None:
+                        i = self._slots[name] = count
+                        self.name[i] = name
+                        count += 1
+                    self.x[i] = x
+                    self.y[i] = y
+                    self.radius[i] = radius
+                    self.color[i] = color
+                    inserts.append((i, x, y, radius))
+                self.header["count"] = count
+                self.header["capture_time"] = capture_time or 0.0
+            finally:
+                self._end()
+            # Index erst nach dem Schreibvorgang, aber noch unter dem Lock nachführen
+            if self._grid_stale:
+                return self.generation
+            for i, last in moves:
+                self.grid.remove(i)
+                if i != last:
+                    self.grid.move(last, i)
+            for i, x, y, radius in inserts:
+                self.grid.insert(i, x, y, radius)
+        return self.generation
+
+    def _move(self, source: int, target: int):
+        for array in (self.name, self.x, self.y, self.radius, self.color):
+            array[target] = array[source]
+        self._slots[bytes(self.name[target])] = target
+
+    def _refresh_grid(self):
+        """Baut den Index nach replace() neu auf (Aufruf unter _write_lock)."""
+        if self._grid_stale:
+            n = len(self._slots)
+            self.grid.rebuild(self.x[:n], self.y[:n], self.radius[:n])
+            self._grid_stale = False
+
+    def hits(self, points) -> List[List[str]]:
+        """
+        Namen der Kreise unter jedem Punkt, in einer Abfrage für alle Punkte
+        (nur im schreibenden Prozess).
+
+        Args:
+            points: (N, 2) Punkte in Pixeln, z.B. alle 21 Landmarken einer Hand.
+
+        Returns:
+            list: Pro Punkt die Namen, zuletzt gezeichnete (oben liegende) Kreise zuerst.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        with self._write_lock:
+            self._refresh_grid()
+            point_index, slots = self.grid.query_points(points, self.x, self.y, self.radius)
+            names = self.name[slots]
+        result = [[] for _ in range(len(points))]
+        for i, name in zip(point_index.tolist(), names.tolist()):
+            result[i].append(name.decode("utf-8"))
+        return result
+
+    def hits_in_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[str]:
+        """Namen der Kreise, die das Rechteck berühren, oben liegende zuerst (nur im schreibenden Prozess)."""
+        with self._write_lock:
+            self._refresh_grid()
+            slots = self.grid.query_rect(x0, y0, x1, y1, self.x, self.y, self.radius)
+            names = self.name[slots]
+        return [name.decode("utf-8") for name in names.tolist()]
+
+    def snapshot(self, out: CircleSnapshot, retries: int = 100) -> bool:
+        """
+        Kopiert einen konsistenten Stand nach out, falls sich die Generation geändert hat.
+
+        Returns:
+            bool: True, wenn out aktualisiert wurde.
+        """
+        for _ in range(retries):
+            start = int(self.header["sequence"][0])
+            if start & 1:
+                continue  # Schreiber ist gerade aktiv
+            if start // 2 == out.generation:
+                return False
+            n = min(int(self.header["count"][0]), self.capacity)
+            capture_time = float(self.header["capture_time"][0])
+            np.copyto(out.name[:n], self.name[:n])
+            np.copyto(out.x[:n], self.x[:n])
+            np.copyto(out.y[:n], self.y[:n])
+            np.copyto(out.radius[:n], self.radius[:n])
+            np.copyto(out.color[:n], self.color[:n])
+            if int(self.header["sequence"][0]) == start:
+                out.count = n
+                out.capture_time = capture_time
+                out.generation = start // 2
+                return True
+        return False
+
+    def record_latency(self, seconds: float):
+        """Trägt eine Glass-to-Glass-Latenz ein (nur aus dem Renderer-Prozess)."""
+        count = int(self.header["latency_count"][0])
+        self.latency[count % LATENCY_SAMPLES] = seconds
+        self.header["latency_count"] = count + 1
+
+    def latency_summary(self) -> Dict[str, float]:
+        """Perzentile (ms) der zuletzt eingetragenen Latenzen."""
+        count = int(self.header["latency_count"][0])
+        if count == 0:
+            return {"count": 0}
+        samples = self.latency[:min(count, LATENCY_SAMPLES)] * 1000.0
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {"count": count, "mean_ms": float(samples.mean()), "p50_ms": float(p50), "p95_ms": float(p95),
+                "p99_ms": float(p99), "max_ms": float(samples.max())}
+
+    def rows(self, retries: int = 1000) -> List[dict]:
+        """
+        Konsistente Liste der Kreise als Dictionaries (für die API).
+
+        Raises:
+            RuntimeError: Nach retries Versuchen kein konsistenter Stand (Schreiber hängt).
+        """
+        snapshot = CircleSnapshot(self.capacity)
+        # Im schreibenden Prozess hält der Lock Schreibvorgänge auf, dann gelingt der erste Versuch
+        with self._write_lock:
+            for _ in range(retries):
+                if self.snapshot(snapshot):
+                    break
+            else:
+                raise RuntimeError("Kein konsistenter Stand der Kreistabelle lesbar.")
+        return [{"name": snapshot.name[i].decode("utf-8"), "x": int(snapshot.x[i]), "y": int(snapshot.y[i]),
+                 "radius": int(snapshot.radius[i]), "color": tuple(int(c) for c in snapshot.color[i])}
+                for i in range(snapshot.count)]
+
+    def close(self):
+        # Sichten freigeben, bevor der Block geschlossen wird
+        self.header = self.name = self.x = self.y = self.radius = self.color = self.latency = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Hängt an einen bestehenden Block an, ohne ihn beim Prozessende zu löschen."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # ab Python 3.13
+    except TypeError:
+        # Ältere Versionen registrieren den Block erneut beim Resource-Tracker. Kind-
+        # prozesse teilen den Tracker des Erzeugers, die Registrierung ist dort nur
+        # einmal vermerkt und wird mit unlink() im Erzeuger wieder entfernt.
+        return shared_memory.SharedMemory(name=name)
+
+
+# --- Belastungstest ---
+
+class _Row:
+    __slots__ = ("name", "x", "y", "radius", "color")
+
+    def __init__(self, name, x, y, radius, color):
+        self.name, self.x, self.y, self.radius, self.color = name, x, y, radius, color
+
+
+def _stress_reader(table_name: str, fps: float, stop, result):
+    table = CircleTable(name=table_name)
+    snapshot = CircleSnapshot(table.capacity)
+    frames = updates = torn = 0
+    copy_time = 0.0
+    interval = 1.0 / fps if fps > 0 else 0.0
+    next_frame = time.perf_counter()
+    while not stop.value:
+        start = time.perf_counter()
+        if table.snapshot(snapshot):
+            updates += 1
+            # Der Schreiber setzt in einer Generation alle Felder aller Kreise auf denselben Wert
+            n = snapshot.count
+            k = snapshot.x[:n]
+            if n and not ((snapshot.y[:n] == k).all() and (snapshot.radius[:n] == k % 500 + 1).all()
+                          and (snapshot.color[:n, 0] == k % 256).all() and (k == k[0]).all()):
+                torn += 1
+        copy_time += time.perf_counter() - start
+        frames += 1
+        if interval:
+            next_frame += interval
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+    result[:] = [frames, updates, torn, copy_time]
+    table.close()
+
+
+def stress_test(circles: int = 200, seconds: float = 5.0, fps: float = 60.0, min_success: float = 0.9) -> bool:
+    """
+    Schreibt so schnell wie möglich, während ein Leser-Prozess im Render-Takt liest.
+
+    Da sich die Tabelle zwischen zwei Render-Frames immer ändert, sollte fast
+    jeder Frame einen neuen Schnappschuss bekommen; bleibt der Zähler zu lange
+    ungerade, scheitern die Versuche des Lesers.
+
+    Returns:
+        bool: True, wenn kein Schnappschuss einen halb geschriebenen Stand enthielt und
+              (bei fps > 0) mindestens min_success der Frames einen neuen Stand bekamen.
+    """
+    from multiprocessing import Array
+
+    table = CircleTable(capacity=circles)
+    stop = Value("b", 0)
+    result = Array("d", 4)
+    reader = Process(target=_stress_reader, args=(table.shm_name, fps, stop, result))
+    reader.start()
+    rows = [_Row(f"circle_{i}", 0, 0, 1, (0, 0, 0)) for i in range(circles)]
+    writes = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        k = writes
+        for row in rows:
+            row.x = row.y = k
+            row.radius = k % 500 + 1
+            row.color = (k % 256, 0, 0)
+        table.replace(rows)
+        writes += 1
+    elapsed = time.perf_counter() - start
+    stop.value = 1
+    reader.join()
+    frames, updates, torn, copy_time = result[:]
+    table.close()
+    print(f"{writes} Schreibvorgänge mit je {circles} Kreisen in {elapsed:.1f} s ({writes / elapsed:.0f}/s)")
+    success = updates / max(1, frames)
+    print(f"Leser: {int(frames)} Frames, {int(updates)} neue Stände ({100 * success:.0f} %), {int(torn)} inkonsistent, "
+          f"Schnappschuss im Mittel {1e6 * copy_time / max(1, frames):.1f} µs")
+    return torn == 0 and updates > 0 and (fps <= 0 or success >= min_success)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Belastungstest der Shared-Memory-Kreistabelle.")
+    parser.add_argument("--circles", type=int, default=200, help="Anzahl Kreise pro Schreibvorgang")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Testdauer in Sekunden")
+    parser.add_argument("--fps", type=float, default=60.0, help="Lesetakt des Renderers (0 = so schnell wie möglich)")
+    parser.add_argument("--min-success", type=float, default=0.9,
+                        help="Mindestanteil der Frames mit neuem Schnappschuss (Standard: 0.9)")
+    args = parser.parse_args()
+
+    ok = stress_test(args.circles, args.seconds, args.fps, args.min_success)
+    print("OK" if ok else "FEHLER")
+    exit(0 if ok else 1)
@@ -0,0 +1,73 @@
+"""
+Datenmodelle der Kreis-API und Laden des Zustands.
+
+Gespeichert wird nur über persistence.StatePersister (dump_state/write_atomic),
+damit die Zustandsdatei immer die Nummer der letzten Änderung trägt.
+
+Nur pydantic, ohne FastAPI, Uvicorn und Pygame, damit main.py die
+Konfiguration prüfen und das Fenster starten kann, bevor der Server geladen ist.
+"""
+import json
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from persistence import load_state
+
+# --- Pydantic Modelle ---
+
+class Circle(BaseModel):
+    """Repräsentiert einen Kreis, der gezeichnet werden soll."""
+    name: str = Field(..., description="Eindeutiger Name des Kreises")
+    x: int = Field(..., description="X-Koordinate des Kreismittelpunkts in Pixeln")
+    y: int = Field(..., description="Y-Koordinate des Kreismittelpunkts in Pixeln")
+    radius: int = Field(..., gt=0, description="Radius des Kreises in Pixeln")
+    color: Tuple[int, int, int] = Field(..., description="RGB-Farbe des Kreises (z.B. [255, 0, 0] für Rot)")
+
+class CircleList(BaseModel):
+    """Liste von Kreisen für die API."""
+    circles: List[Circle]
+
+class CircleDelta(BaseModel):
+    """Inkrementelle Änderung: Kreise einfügen/überschreiben und Kreise entfernen (über den Namen)."""
+    upsert: List[Circle] = Field(default_factory=list, description="Neue oder geänderte Kreise")
+    delete: List[str] = Field(default_factory=list, description="Namen der zu entfernenden Kreise")
+    capture_time: Optional[float] = Field(None, description="Aufnahmezeitpunkt (Unix-Zeit) des Kamerabilds, für die Latenzmessung")
+
+class UpdateResult(BaseModel):
+    """Kurze Antwort auf inkrementelle Änderungen."""
+    generation: int = Field(..., description="Zähler der Schreibvorgänge auf die Kreistabelle")
+    count: int = Field(..., description="Anzahl Kreise nach der Änderung")
+
+class HitQuery(BaseModel):
+    """Mehrere Punkte für eine gemeinsame Trefferabfrage (z.B. alle Landmarken einer Hand)."""
+    points: List[Tuple[float, float]] = Field(..., description="Punkte (x, y) in Pixeln des Hintergrundbilds")
+
+class HitList(BaseModel):
+    """Getroffene Kreise eines Punkts oder Rechtecks."""
+    names: List[str] = Field(..., description="Namen der Kreise, oben liegende (zuletzt gezeichnete) zuerst")
+
+class HitResult(BaseModel):
+    """Getroffene Kreise pro Punkt einer HitQuery."""
+    hits: List[List[str]] = Field(..., description="Pro Punkt die Namen der Kreise, oben liegende zuerst")
+
+class Config(BaseModel):
+    """Konfigurationsmodell für das Programm."""
+    background_image: str = Field(..., description="Pfad zum Hintergrundbild")
+    state_file: str = Field(..., description="Pfad zur JSON-Datei für den Programmzustand")
+    max_circles: int = Field(1024, gt=0, description="Kapazität der geteilten Kreistabelle")
+    persist_interval_ms: int = Field(200, ge=0, description="Mindestabstand zwischen zwei Speichervorgängen")
+    journal: bool = Field(False, description="Änderungen an ein Journal anhängen statt jedes Mal alles zu schreiben")
+    grid_cell_size: int = Field(64, gt=0, description="Zellgröße des räumlichen Index für Trefferabfragen in Pixeln")
+
+# --- Funktionen zur Zustandsverwaltung ---
+
+def load_circles_state(state_file_path: str) -> List[Circle]:
+    """Lädt den Zustand der Kreise aus einer JSON-Datei und wendet das Journal an, falls vorhanden."""
+    try:
+        data = load_state(state_file_path)
+        # Validierung der geladenen Daten mit Pydantic
+        return [Circle(**item) for item in data]
+    except (json.JSONDecodeError, TypeError, ValueError, KeyError) as e:
+        print(f"Fehler beim Laden der Zustandsdatei '{state_file_path}': {e}. Starte mit leerem Zustand.")
+        return []
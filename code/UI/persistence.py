@@ -0,0 +1,239 @@
+"""
+Verzögertes, atomares Speichern des Kreis-Zustands im Hintergrund.
+
+Änderungen werden nur vorgemerkt; ein Hintergrund-Task schreibt höchstens
+alle interval_ms Millisekunden in einem Worker-Thread, sodass die Handler der
+API nie auf die Festplatte warten. Der Zustand wird kompakt (JSON ohne
+Einrückung) in eine temporäre Datei geschrieben und per os.replace atomar
+umbenannt; ein Absturz hinterlässt also entweder den alten oder den neuen
+Stand, nie eine halbe Datei.
+
+Optional wird zusätzlich ein Journal geführt (<state_file>.journal, eine
+JSON-Zeile pro Änderung). Dann wird pro Intervall nur an das Journal
+angehängt und der volle Zustand erst geschrieben, wenn das Journal
+compact_after Einträge erreicht. Beim Laden wird das Journal auf den
+gespeicherten Zustand angewendet.
+
+Jede Änderung bekommt eine laufende Nummer ("seq"); die Zustandsdatei
+({"sequence": N, "circles": [...]}) vermerkt die letzte enthaltene Nummer.
+Beim Laden werden nur Journal-Einträge mit größerer Nummer angewendet. Stürzt
+das Programm zwischen dem Umbenennen der Zustandsdatei und dem Leeren des
+Journals ab, werden ältere Änderungen also nicht über den neueren Stand
+gespielt. Die frühere Zustandsdatei (nur die Liste) wird weiter gelesen.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def journal_path(state_file: str) -> str:
+    return state_file + ".journal"
+
+
+def write_atomic(path: str, data: bytes):
+    """Schreibt data in eine temporäre Datei im selben Ordner und benennt sie atomar um."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def dump_state(circles: List[Dict], sequence: int) -> bytes:
+    """Zustandsdatei mit der Nummer der letzten enthaltenen Änderung."""
+    return dumps({"sequence": sequence, "circles": circles})
+
+
+def _read_state(state_file: str) -> Tuple[List[Dict], int]:
+    """Kreise und Nummer der letzten enthaltenen Änderung (0 für das frühere Format ohne Nummer)."""
+    if not os.path.exists(state_file):
+        return [], 0
+    with open(state_file, "rb") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data, 0
+    return data["circles"], int(data.get("sequence", 0))
+
+
+def _read_journal(state_file: str) -> Iterator[Dict]:
+    """Einträge des Journals; eine abgebrochene letzte Zeile beendet das Lesen."""
+    journal = journal_path(state_file)
+    if not os.path.exists(journal):
+        return
+    with open(journal, "rb") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                break
+
+
+def last_sequence(state_file: str) -> int:
+    """Größte bisher vergebene Änderungsnummer aus Zustandsdatei und Journal."""
+    try:
+        _, sequence = _read_state(state_file)
+    except (json.JSONDecodeError, TypeError, ValueError, KeyError):
+        sequence = 0
+    for record in _read_journal(state_file):
+        sequence = max(sequence, record.get("seq", 0))
+    return sequence
+
+
+def load_state(state_file: str) -> List[Dict]:
+    """
+    Lädt den gespeicherten Zustand und wendet die neueren Einträge des Journals an.
+
+    Journal-Einträge, deren Nummer schon in der Zustandsdatei enthalten ist,
+    werden übersprungen; eine abgebrochene letzte Journal-Zeile wird ignoriert.
+    Das Journal wird unabhängig von StatePersister.journal gelesen: übrig
+    gebliebene neuere Einträge sind Änderungen, die sonst verloren wären.
+
+    Raises:
+        json.JSONDecodeError: Die Zustandsdatei selbst ist beschädigt.
+    """
+    items, sequence = _read_state(state_file)
+    circles: Dict[str, Dict] = {item["name"]: item for item in items}
+    for record in _read_journal(state_file):
+        # Einträge ohne Nummer stammen aus der Zeit vor den Nummern und werden angewendet
+        if record.get("seq", sequence + 1) <= sequence:
+            continue
+        if "replace" in record:
+            circles = {item["name"]: item for item in record["replace"]}
+        for name in record.get("delete", []):
+            circles.pop(name, None)
+        for item in record.get("upsert", []):
+            circles[item["name"]] = item
+    return list(circles.values())
+
+
+class StatePersister:
+    """
+    Schreibt den Zustand verzögert und gebündelt im Hintergrund.
+
+    Args:
+        state_file (str): Pfad zur Zustandsdatei.
+        snapshot (callable): Liefert den aktuellen Zustand als Liste von Dictionaries.
+                             Wird im Event-Loop aufgerufen und muss schnell sein.
+        interval_ms (int): Mindestabstand zwischen zwei Schreibvorgängen.
+        journal (bool): Änderungen an ein Journal anhängen statt jedes Mal alles zu schreiben.
+        compact_after (int): Journal-Einträge, nach denen der volle Zustand geschrieben wird.
+
+    Der volle Zustand wird auch ohne Journal mit der laufenden Änderungsnummer
+    geschrieben, und jedes Schreiben des vollen Zustands leert ein vorhandenes
+    Journal (auch ein übrig gebliebenes aus einem Lauf mit journal=True).
+    """
+
+    def __init__(self, state_file: str, snapshot: Callable[[], List[Dict]], interval_ms: int = 200,
+                 journal: bool = False, compact_after: int = 1000):
+        self.state_file = state_file
+        self.snapshot = snapshot
+        self.interval = interval_ms / 1000.0
+        self.journal = journal
+        self.compact_after = compact_after
+        self.dirty = False
+        self.writes = 0
+        self.journal_entries = 0
+        self.last_write_ms = 0.0
+        self.sequence = last_sequence(state_file)
+        self._pending: List[Dict] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    def mark(self, upsert: List[Dict] = (), delete: List[str] = ()):
+        """Merkt eine inkrementelle Änderung vor."""
+        self.sequence += 1
+        if self.journal:
+            self._pending.append({"seq": self.sequence, "upsert": list(upsert), "delete": list(delete)})
+        self._set_dirty()
+
+    def mark_replace(self, circles: List[Dict]):
+        """Merkt das Ersetzen aller Kreise vor."""
+        self.sequence += 1
+        if self.journal:
+            self._pending.append({"seq": self.sequence, "replace": list(circles)})
+        self._set_dirty()
+
+    def _set_dirty(self):
+        self.dirty = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _take(self, compact: bool = False):
+        """Übernimmt die vorgemerkten Änderungen (im Event-Loop, daher ohne Lock)."""
+        pending, self._pending = self._pending, []
+        self.dirty = False
+        compact = compact or not self.journal or self.journal_entries + len(pending) >= self.compact_after
+        # Der Schnappschuss enthält genau die Änderungen bis zur aktuellen Nummer
+        return pending, ((self.snapshot(), self.sequence) if compact else None)
+
+    def _write(self, pending: List[Dict], state: Optional[Tuple[List[Dict], int]]):
+        start = time.perf_counter()
+        if state is not None:
+            write_atomic(self.state_file, dump_state(*state))
+            # Erst nach dem Umbenennen leeren; ein Absturz dazwischen ist harmlos, weil
+            # load_state Einträge bis zur Nummer des Zustands überspringt
+            journal = journal_path(self.state_file)
+            if self.journal or os.path.exists(journal):
+                open(journal, "wb").close()
+            self.journal_entries = 0
+        elif pending:
+            with open(journal_path(self.state_file), "ab") as f:
+                f.write(b"".join(dumps(record) + b"\n" for record in pending))
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_entries += len(pending)
+        self.writes += 1
+        self.last_write_ms = 1000.0 * (time.perf_counter() - start)
+
+    async def run(self):
+        """Hintergrund-Task: schreibt vorgemerkte Änderungen höchstens alle interval_ms."""
+        self._wakeup = asyncio.Event()
+        if self.dirty:
+            self._wakeup.set()
+        try:
+            while not self._stopping:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                if self.dirty:
+                    pending, state = self._take()
+                    try:
+                        await asyncio.to_thread(self._write, pending, state)
+                    except OSError as e:
+                        print(f"Fehler beim Speichern der Zustandsdatei '{self.state_file}': {e}")
+                        # Beim nächsten Intervall erneut versuchen
+                        self._pending = pending + self._pending
+                        self.dirty = True
+                await asyncio.sleep(self.interval)
+        finally:
+            self._wakeup = None
+
+    def stop(self):
+        """Beendet run() nach dem laufenden Schreibvorgang; danach flush() aufrufen."""
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def flush(self, compact: bool = False):
+        """
+        Schreibt ausstehende Änderungen sofort (z.B. beim Beenden).
+
+        Mit compact=True wird der volle Zustand geschrieben und das Journal geleert.
+        """
+        if self.dirty or compact:
+            self._write(*self._take(compact))
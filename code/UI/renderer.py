@@ -0,0 +1,286 @@
+"""
+Dirty-Rectangle-Renderer für die Kreisanzeige.
+
+Statt pro Frame den ganzen Hintergrund zu blitten und display.flip()
+aufzurufen, vergleicht der DirtyRenderer den neuen Schnappschuss der
+Kreistabelle mit dem zuletzt gezeichneten. Nur unter den alten und neuen
+Umrissen geänderter Kreise wird der Hintergrund wiederhergestellt und die
+dort liegenden Kreise neu gezeichnet; die Rechtecke gehen an
+pygame.display.update(rects). Ohne Änderung fällt keine Arbeit an.
+
+OffscreenScene nutzt denselben Renderer ohne Fenster und liefert den Stand
+als PNG/JPEG, zwischengespeichert pro Generation der Kreistabelle.
+
+Als Skript aufgerufen misst es headless (SDL-Treiber "dummy") die CPU-Zeit
+pro Frame für 10, 100 und 1000 Kreise, jeweils für das bisherige Neuzeichnen
+des ganzen Bildes und für den DirtyRenderer.
+"""
+import argparse
+import io
+import os
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+import pygame
+
+from circle_table import CircleSnapshot
+
+
+def _boxes(x: np.ndarray, y: np.ndarray, radius: np.ndarray) -> np.ndarray:
+    """(N, 4) Umrisse x1, y1, x2, y2 (exklusiv) der Kreise."""
+    return np.stack([x - radius, y - radius, x + radius + 1, y + radius + 1], axis=1)
+
+
+class DirtyRenderer:
+    """
+    Zeichnet Kreise inkrementell auf eine Surface.
+
+    Args:
+        screen (pygame.Surface): Ziel (Display-Surface oder Off-Screen-Surface).
+        background (pygame.Surface): Optional, Hintergrundbild in Größe des Ziels.
+        fill (tuple): Hintergrundfarbe ohne Bild.
+        max_rects (int): Ab so vielen Rechtecken wird stattdessen das ganze Bild neu gezeichnet.
+    """
+
+    def __init__(self, screen: pygame.Surface, background: Optional[pygame.Surface] = None,
+                 fill=(0, 0, 0), max_rects: int = 64):
+        self.screen = screen
+        self.background = background
+        self.fill = fill
+        self.max_rects = max_rects
+        self.width, self.height = screen.get_size()
+        self.full_redraws = 0
+        self.partial_redraws = 0
+        self._drawn: Optional[CircleSnapshot] = None
+        self._valid = False
+
+    def invalidate(self):
+        """Erzwingt beim nächsten render() ein vollständiges Neuzeichnen (z.B. nach einem Expose-Event)."""
+        self._valid = False
+
+    def _restore(self, rect):
+        if self.background is not None:
+            self.screen.blit(self.background, rect, rect)
+        else:
+            self.screen.fill(self.fill, rect)
+
+    def _dirty_boxes(self, circles: CircleSnapshot) -> np.ndarray:
+        drawn, n = self._drawn, circles.count
+        shared = min(n, drawn.count)
+        changed = ((drawn.x[:shared] != circles.x[:shared]) | (drawn.y[:shared] != circles.y[:shared])
+                   | (drawn.radius[:shared] != circles.radius[:shared])
+                   | (drawn.color[:shared] != circles.color[:shared]).any(axis=1)
+                   | (drawn.name[:shared] != circles.name[:shared]))
+        rows = np.flatnonzero(changed)
+        old = _boxes(drawn.x[rows], drawn.y[rows], drawn.radius[rows])
+        new = _boxes(circles.x[rows], circles.y[rows], circles.radius[rows])
+        # Kleine Bewegungen: alter und neuer Umriss überlappen, ein gemeinsames Rechteck genügt
+        overlap = (old[:, 0] < new[:, 2]) & (new[:, 0] < old[:, 2]) & (old[:, 1] < new[:, 3]) & (new[:, 1] < old[:, 3])
+        union = np.concatenate([np.minimum(old[overlap, :2], new[overlap, :2]),
+                                np.maximum(old[overlap, 2:], new[overlap, 2:])], axis=1)
+        removed = _boxes(drawn.x[shared:drawn.count], drawn.y[shared:drawn.count], drawn.radius[shared:drawn.count])
+        added = _boxes(circles.x[shared:n], circles.y[shared:n], circles.radius[shared:n])
+        boxes = np.concatenate([union, old[~overlap], new[~overlap], removed, added])
+        # Auf den Bildschirm begrenzen und leere Rechtecke verwerfen
+        np.clip(boxes, 0, [self.width, self.height, self.width, self.height], out=boxes)
+        return boxes[(boxes[:, 2] > boxes[:, 0]) & (boxes[:, 3] > boxes[:, 1])]
+
+    def _remember(self, circles: CircleSnapshot):
+        if self._drawn is None or len(self._drawn.x) < circles.count:
+            self._drawn = CircleSnapshot(max(circles.count, len(circles.x)))
+        n = circles.count
+        for field in ("name", "x", "y", "radius", "color"):
+            np.copyto(getattr(self._drawn, field)[:n], getattr(circles, field)[:n])
+        self._drawn.count = n
+        self._drawn.generation = circles.generation
+
+    def _draw(self, circles: CircleSnapshot, rows):
+        for x, y, radius, color in zip(circles.x[rows].tolist(), circles.y[rows].tolist(),
+                                       circles.radius[rows].tolist(), circles.color[rows].tolist()):
+            pygame.draw.circle(self.screen, color, (x, y), radius)
+
+    def render(self, circles: CircleSnapshot) -> List[pygame.Rect]:
+        """
+        Bringt die Surface auf den Stand von circles.
+
+        Returns:
+            list: Die geänderten Bereiche für pygame.display.update (leer ohne Änderung).
+        """
+        n = circles.count
+        boxes = None
+        if self._valid and self._drawn is not None and circles.generation == self._drawn.generation:
+            return []
+        if self._valid and self._drawn is not None:
+            boxes = self._dirty_boxes(circles)
+            if not len(boxes):
+                self._remember(circles)
+                return []
+        if boxes is None or len(boxes) > self.max_rects:
+            self._restore(self.screen.get_rect())
+            self._draw(circles, slice(0, n))
+            self._remember(circles)
+            self._valid = True
+            self.full_redraws += 1
+            return [self.screen.get_rect()]
+
+        # (Rechteck, Kreis): welche Kreise in welches Rechteck neu gezeichnet werden müssen
+        c = _boxes(circles.x[:n], circles.y[:n], circles.radius[:n])
+        hits = ((c[None, :, 0] < boxes[:, None, 2]) & (c[None, :, 2] > boxes[:, None, 0])
+                & (c[None, :, 1] < boxes[:, None, 3]) & (c[None, :, 3] > boxes[:, None, 1]))
+        rects = []
+        for (x1, y1, x2, y2), row in zip(boxes.tolist(), hits):
+            rect = pygame.Rect(x1, y1, x2 - x1, y2 - y1)
+            # Nur innerhalb des Rechtecks zeichnen, damit Kreise darüber nicht übermalt werden
+            self.screen.set_clip(rect)
+            self._restore(rect)
+            self._draw(circles, np.flatnonzero(row))
+            rects.append(rect)
+        self.screen.set_clip(None)
+        self._remember(circles)
+        self.partial_redraws += 1
+        return rects
+
+
+class OffscreenScene:
+    """
+    Zeichnet die Kreistabelle ohne Fenster auf eine Off-Screen-Surface und kodiert sie als Bild.
+
+    Kodierte Bilder werden pro Format mit der Generation der Tabelle
+    zwischengespeichert: Solange sich nichts ändert, bekommen alle Betrachter
+    dieselben Bytes, ohne neu zu zeichnen oder zu kodieren. encode() ist
+    threadsicher und für einen Thread-Pool gedacht.
+
+    Args:
+        table (CircleTable): Die geteilte Kreistabelle.
+        background_image_path (str): Optional, Hintergrundbild (bestimmt die Bildgröße).
+        size (tuple): Bildgröße ohne Hintergrundbild.
+    """
+
+    FORMATS = {"png": "frame.png", "jpeg": "frame.jpg"}
+
+    def __init__(self, table, background_image_path: Optional[str] = None, size=(1024, 512)):
+        self.table = table
+        background = None
+        if background_image_path:
+            try:
+                background = pygame.image.load(background_image_path)
+                size = background.get_size()
+            except (pygame.error, FileNotFoundError) as e:
+                print(f"Fehler beim Laden des Hintergrundbildes '{background_image_path}': {e}")
+        self.surface = pygame.Surface(size)
+        self.renderer = DirtyRenderer(self.surface, background)
+        self.circles = CircleSnapshot(table.capacity)
+        self.encodes = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self.table.generation
+
+    def encode(self, fmt: str = "png"):
+        """
+        Gibt (generation, Bilddaten) im Format "png" oder "jpeg" zurück.
+
+        Raises:
+            KeyError: Unbekanntes Format.
+        """
+        namehint = self.FORMATS[fmt]
+        with self._lock:
+            self.table.snapshot(self.circles)
+            cached = self._cache.get(fmt)
+            if cached is not None and cached[0] == self.circles.generation:
+                return cached
+            self.renderer.render(self.circles)
+            buffer = io.BytesIO()
+            pygame.image.save(self.surface, buffer, namehint)
+            self.encodes += 1
+            self._cache[fmt] = (self.circles.generation, buffer.getvalue())
+            return self._cache[fmt]
+
+
+def _full_redraw(screen, background, circles: CircleSnapshot):
+    """Bisheriger Weg: alles neu zeichnen und flip()."""
+    screen.blit(background, (0, 0))
+    n = circles.count
+    for x, y, radius, color in zip(circles.x[:n].tolist(), circles.y[:n].tolist(),
+                                   circles.radius[:n].tolist(), circles.color[:n].tolist()):
+        pygame.draw.circle(screen, color, (x, y), radius)
+    pygame.display.flip()
+
+
+def benchmark(counts=(10, 100, 1000), frames: int = 300, moving: float = 0.05, size=(1024, 512)):
+    """
+    Misst CPU-Zeit pro Frame (time.process_time) headless.
+
+    Pro Frame bewegen sich ceil(moving * N) Kreise um wenige Pixel; zusätzlich
+    werden Frames ohne Änderung gemessen (Leerlauf).
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    background = pygame.Surface(size).convert()
+    background.fill((40, 40, 60))
+    rng = np.random.default_rng(0)
+    results = []
+    for count in counts:
+        circles = CircleSnapshot(count)
+        circles.count = count
+        circles.name[:] = [f"circle_{i}".encode() for i in range(count)]
+        circles.x[:] = rng.integers(0, size[0], count)
+        circles.y[:] = rng.integers(0, size[1], count)
+        circles.radius[:] = rng.integers(5, 30, count)
+        circles.color[:] = rng.integers(0, 256, (count, 3))
+        movers = max(1, int(np.ceil(moving * count)))
+
+        def move():
+            rows = rng.choice(count, movers, replace=False)
+            circles.x[rows] = np.clip(circles.x[rows] + rng.integers(-4, 5, movers), 0, size[0])
+            circles.y[rows] = np.clip(circles.y[rows] + rng.integers(-4, 5, movers), 0, size[1])
+            circles.generation += 1
+
+        row = {"circles": count, "moving": movers}
+        start = time.process_time()
+        for _ in range(frames):
+            move()
+            _full_redraw(screen, background, circles)
+        row["full_ms"] = 1000.0 * (time.process_time() - start) / frames
+
+        renderer = DirtyRenderer(screen, background)
+        pygame.display.update(renderer.render(circles))
+        area = 0
+        start = time.process_time()
+        for _ in range(frames):
+            move()
+            rects = renderer.render(circles)
+            if rects:
+                pygame.display.update(rects)
+            area += sum(r.width * r.height for r in rects)
+        row["dirty_ms"] = 1000.0 * (time.process_time() - start) / frames
+        row["area_percent"] = 100.0 * area / frames / (size[0] * size[1])
+
+        start = time.process_time()
+        for _ in range(frames):
+            rects = renderer.render(circles)
+            if rects:
+                pygame.display.update(rects)
+        row["idle_ms"] = 1000.0 * (time.process_time() - start) / frames
+        results.append(row)
+    pygame.quit()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless-Benchmark: Neuzeichnen gegen Dirty-Rectangles.")
+    parser.add_argument("--circles", type=int, nargs="+", default=[10, 100, 1000], help="Anzahl Kreise")
+    parser.add_argument("--frames", type=int, default=300, help="Frames pro Messung")
+    parser.add_argument("--moving", type=float, default=0.05, help="Anteil der pro Frame bewegten Kreise")
+    args = parser.parse_args()
+
+    print(f"{'Kreise':>7} {'bewegt':>7} {'voll ms':>9} {'dirty ms':>9} {'Fläche %':>9} {'Leerlauf ms':>12}"
+          "  (CPU-Zeit pro Frame)")
+    for r in benchmark(args.circles, args.frames, args.moving):
+        print(f"{r['circles']:>7} {r['moving']:>7} {r['full_ms']:>9.3f} {r['dirty_ms']:>9.3f} "
+              f"{r['area_percent']:>9.1f} {r['idle_ms']:>12.4f}")
@@ -0,0 +1,300 @@
+"""
+FastAPI-Server der Kreis-API.
+
+Schreibt in die geteilte Kreistabelle, die main.py anlegt und vor dem Start von
+Uvicorn zusammen mit Persister und Offscreen-Szene hier einträgt. Wird erst
+geladen, nachdem das Pygame-Fenster schon startet (siehe main.py).
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+
+from circle_table import CircleTable
+from models import Circle, CircleDelta, CircleList, HitList, HitQuery, HitResult, UpdateResult
+from persistence import StatePersister
+from renderer import OffscreenScene
+
+# Gemeinsame Messwerkzeuge (metrics.py) liegen eine Ebene höher in code/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import REGISTRY  # noqa: E402
+
+# --- Geteilter Zustand zwischen FastAPI und Pygame ---
+# Die Kreise liegen in einer CircleTable (multiprocessing.shared_memory), die im
+# Hauptprozess angelegt wird. Der Pygame-Prozess hängt sich über den Namen des
+# Blocks an und liest nur; geschrieben wird ausschließlich von FastAPI.
+
+# --- FastAPI Anwendung ---
+
+# Diese Variablen werden im Hauptprozess gesetzt, bevor Uvicorn gestartet wird
+# und sind dann für die FastAPI-Routen verfügbar.
+_circle_table: Optional[CircleTable] = None
+_persister: Optional[StatePersister] = None
+_scene: Optional[OffscreenScene] = None
+
+# Kodiert Bilder außerhalb des Event-Loops
+_encoder_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="encoder")
+
+# Messwerte für GET /metrics
+_apply_stats = REGISTRY.stage("ui_apply")
+_ws_stats = REGISTRY.stage("ui_ws_message")
+_encode_stats = REGISTRY.stage("ui_encode")
+_hit_stats = REGISTRY.stage("ui_hit_query")
+_updates = REGISTRY.counter("ui_circle_updates")
+_rejected = REGISTRY.counter("ui_rejected_updates")
+REGISTRY.gauge("ui_circles", lambda: len(_circle_table) if _circle_table else 0)
+REGISTRY.gauge("ui_generation", lambda: _circle_table.generation if _circle_table else 0)
+REGISTRY.gauge("ui_state_writes", lambda: _persister.writes if _persister else 0)
+REGISTRY.gauge("ui_state_last_write_ms", lambda: _persister.last_write_ms if _persister else 0.0)
+REGISTRY.collect("ui_glass_to_glass", lambda: _circle_table.latency_summary() if _circle_table else {"count": 0})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startet das Speichern im Hintergrund und schreibt beim Beenden ausstehende Änderungen."""
+    task = asyncio.create_task(_persister.run()) if _persister else None
+    yield
+    if task:
+        _persister.stop()
+        await task
+        _persister.flush()
+
+app = FastAPI(
+    title="Pygame Circle API",
+    description="API zur Steuerung von Kreisen in einem Pygame-Fenster.",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+@app.post("/circles", response_model=CircleList, summary="Aktualisiert die Liste der Kreise")
+async def update_circles(circle_list: CircleList):
+    """
+    Aktualisiert die Liste der im Pygame-Fenster angezeigten Kreise.
+    Alle vorhandenen Kreise werden durch die neue Liste ersetzt.
+    """
+    _require_table()
+
+    # Schreibe die neuen Kreise direkt in die geteilte Tabelle
+    try:
+        with _apply_stats.time():
+            _circle_table.replace(circle_list.circles)
+    except ValueError as e:
+        _rejected.inc()
+        raise HTTPException(status_code=422, detail=str(e))
+    _updates.inc(len(circle_list.circles))
+
+    # Gespeichert wird verzögert im Hintergrund
+    _persister.mark_replace([circle.model_dump() for circle in circle_list.circles])
+
+    return circle_list
+
+def _require_table():
+    if _circle_table is None or _persister is None:
+        raise HTTPException(status_code=500, detail="Server nicht korrekt initialisiert.")
+
+def _apply_delta(delta: CircleDelta) -> UpdateResult:
+    """Wendet eine Änderung auf die geteilte Tabelle an und merkt sie zum Speichern vor."""
+    try:
+        with _apply_stats.time():
+            generation = _circle_table.apply(upsert=delta.upsert, delete=delta.delete,
+                                             capture_time=delta.capture_time)
+    except ValueError:
+        _rejected.inc()
+        raise
+    _updates.inc(len(delta.upsert) + len(delta.delete))
+    _persister.mark(upsert=[circle.model_dump() for circle in delta.upsert], delete=delta.delete)
+    return UpdateResult(generation=generation, count=len(_circle_table))
+
+@app.put("/circles/{name}", response_model=UpdateResult, summary="Fügt einen Kreis ein oder ändert ihn")
+async def upsert_circle(name: str, circle: Circle):
+    """
+    Fügt den Kreis mit diesem Namen ein oder überschreibt ihn.
+    Die übrigen Kreise bleiben unverändert.
+    """
+    _require_table()
+    if circle.name != name:
+        raise HTTPException(status_code=422, detail=f"Name im Pfad ('{name}') und im Kreis ('{circle.name}') unterscheiden sich.")
+    try:
+        return _apply_delta(CircleDelta(upsert=[circle]))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.delete("/circles/{name}", response_model=UpdateResult, summary="Entfernt einen Kreis")
+async def delete_circle(name: str):
+    """
+    Entfernt den Kreis mit diesem Namen.
+    """
+    _require_table()
+    if name not in _circle_table:
+        raise HTTPException(status_code=404, detail=f"Kreis '{name}' nicht gefunden.")
+    return _apply_delta(CircleDelta(delete=[name]))
+
+@app.patch("/circles", response_model=UpdateResult, summary="Ändert mehrere Kreise in einem Schritt")
+async def patch_circles(delta: CircleDelta):
+    """
+    Entfernt die Kreise in delete und fügt die Kreise in upsert ein oder überschreibt sie.
+    Alle Änderungen werden gemeinsam sichtbar.
+    """
+    _require_table()
+    try:
+        return _apply_delta(delta)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.websocket("/ws/circles")
+async def circles_websocket(websocket: WebSocket):
+    """
+    Dauerhafter Kanal für laufende Änderungen (z.B. vom Tracker mit Kamera-Bildrate).
+    Jede Nachricht ist ein CircleDelta als JSON, die Antwort ein UpdateResult
+    oder {"error": ...}.
+    """
+    await websocket.accept()
+    if _circle_table is None or _persister is None:
+        await websocket.close(code=1011)
+        return
+    try:
+        while True:
+            message = await websocket.receive_text()
+            start = time.perf_counter()
+            try:
+                result = _apply_delta(CircleDelta.model_validate_json(message))
+                await websocket.send_text(result.model_dump_json())
+            except ValidationError as e:
+                _rejected.inc()
+                await websocket.send_json({"error": str(e)})
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
+            _ws_stats.add(time.perf_counter() - start)
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/circles", response_model=CircleList, summary="Gibt die aktuelle Liste der Kreise zurück")
+async def get_circles():
+    """
+    Gibt die aktuell im Pygame-Fenster angezeigten Kreise zurück.
+    """
+    if _circle_table is None:
+        raise HTTPException(status_code=500, detail="Server nicht korrekt initialisiert.")
+    return CircleList(circles=[Circle(**row) for row in _circle_table.rows()])
+
+
+# --- Trefferabfragen (räumlicher Index der Kreistabelle) ---
+
+@app.get("/hits", response_model=HitList, summary="Kreise unter einem Punkt")
+async def hit_point(x: float = Query(..., description="X-Koordinate in Pixeln"),
+                    y: float = Query(..., description="Y-Koordinate in Pixeln")):
+    """
+    Gibt die Kreise zurück, in denen der Punkt liegt, oben liegende zuerst
+    (z.B. welches Bedienelement unter einer Fingerspitze liegt).
+    """
+    if _circle_table is None:
+        raise HTTPException(status_code=500, detail="Server nicht korrekt initialisiert.")
+    with _hit_stats.time():
+        return HitList(names=_circle_table.hits([(x, y)])[0])
+
+@app.get("/hits/rect", response_model=HitList, summary="Kreise, die ein Rechteck berühren")
+async def hit_rect(x0: float = Query(..., description="Linke Kante in Pixeln"),
+                   y0: float = Query(..., description="Obere Kante in Pixeln"),
+                   x1: float = Query(..., description="Rechte Kante in Pixeln"),
+                   y1: float = Query(..., description="Untere Kante in Pixeln")):
+    """
+    Gibt die Kreise zurück, die das Rechteck berühren oder darin liegen, oben liegende zuerst.
+    """
+    if _circle_table is None:
+        raise HTTPException(status_code=500, detail="Server nicht korrekt initialisiert.")
+    with _hit_stats.time():
+        return HitList(names=_circle_table.hits_in_rect(x0, y0, x1, y1))
+
+@app.post("/hits", response_model=HitResult, summary="Trefferabfrage für viele Punkte")
+async def hit_points(query: HitQuery):
+    """
+    Prüft alle Punkte in einem Schritt (z.B. die 21 Landmarken einer Hand oder
+    alle Marker-Erkennungen eines Frames) und gibt pro Punkt die getroffenen
+    Kreise zurück, oben liegende zuerst.
+    """
+    if _circle_table is None:
+        raise HTTPException(status_code=500, detail="Server nicht korrekt initialisiert.")
+    with _hit_stats.time():
+        return HitResult(hits=_circle_table.hits(query.points))
+
+@app.get("/latency", summary="Glass-to-Glass-Latenz der Anzeige")
+async def get_latency():
+    """
+    Perzentile der Zeit von der Kameraaufnahme bis zum gezeichneten Pixel (in ms),
+    für Änderungen mit capture_time (z.B. von ui_bridge.py).
+    """
+    if _circle_table is None:
+        raise HTTPException(status_code=500, detail="Server nicht korrekt initialisiert.")
+    return _circle_table.latency_summary()
+
+@app.get("/metrics", summary="Messwerte des Servers", response_class=PlainTextResponse)
+async def get_metrics(format: str = Query("prometheus", pattern="^(prometheus|json)$",
+                                          description="prometheus (Textformat) oder json")):
+    """
+    Laufzeiten (p50/p95/p99) für Änderungen, WebSocket-Nachrichten und Bildkodierung,
+    die Glass-to-Glass-Latenz, Zähler und aktuelle Messgrößen.
+    """
+    if format == "json":
+        return JSONResponse(REGISTRY.snapshot())
+    return PlainTextResponse(REGISTRY.prometheus(), media_type="text/plain; version=0.0.4")
+
+# --- Bildausgabe ohne Fenster ---
+
+MEDIA_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+async def _encoded_frame(fmt: str):
+    if _scene is None:
+        raise HTTPException(status_code=500, detail="Server nicht korrekt initialisiert.")
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    result = await loop.run_in_executor(_encoder_pool, _scene.encode, fmt)
+    _encode_stats.add(time.perf_counter() - start)
+    return result
+
+async def _frame_response(request: Request, fmt: str) -> Response:
+    generation, data = await _encoded_frame(fmt)
+    etag = f'"{generation}-{fmt}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=data, media_type=MEDIA_TYPES[fmt], headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.get("/frame.png", summary="Aktueller Stand als PNG", response_class=Response)
+async def frame_png(request: Request):
+    """
+    Zeichnet Hintergrund und Kreise ohne Fenster und liefert sie als PNG.
+    Unveränderte Stände kommen aus dem Cache (ETag = Generation der Kreistabelle).
+    """
+    return await _frame_response(request, "png")
+
+@app.get("/frame.jpg", summary="Aktueller Stand als JPEG", response_class=Response)
+async def frame_jpeg(request: Request):
+    """
+    Wie /frame.png, aber als JPEG.
+    """
+    return await _frame_response(request, "jpeg")
+
+@app.get("/stream.mjpeg", summary="Laufende Anzeige als MJPEG-Stream")
+async def stream_mjpeg(fps: float = Query(15.0, gt=0, le=60, description="Maximale Bildrate")):
+    """
+    Sendet bei jeder Änderung der Kreise ein neues JPEG (multipart/x-mixed-replace),
+    höchstens fps-mal pro Sekunde.
+    """
+    if _scene is None:
+        raise HTTPException(status_code=500, detail="Server nicht korrekt initialisiert.")
+
+    async def frames():
+        sent = None
+        while True:
+            if _scene.generation != sent:
+                sent, data = await _encoded_frame("jpeg")
+                yield (b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: " + str(len(data)).encode()
+                       + b"\r\n\r\n" + data + b"\r\n")
+            await asyncio.sleep(1.0 / fps)
+
+    return StreamingResponse(frames(), media_type="multipart/x-mixed-replace; boundary=frame")
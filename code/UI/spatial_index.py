@@ -0,0 +1,252 @@
+"""
+Räumlicher Index für die Kreistabelle: gleichmäßiges Gitter über den Kreisen.
+
+Jeder Kreis steht in allen Gitterzellen, die sein umschließendes Quadrat
+berührt. Eine Trefferabfrage prüft dann nur die Kreise der Zellen unter dem
+Punkt bzw. Rechteck statt aller Kreise; die genaue Prüfung läuft vektorisiert
+über NumPy. Kreise, die mehr als max_cells Zellen bedecken würden, stehen in
+keiner Zelle und werden bei jeder Abfrage mitgeprüft.
+
+Der Index kennt nur Zeilennummern der CircleTable. Die Tabelle führt ihn bei
+jedem Schreibvorgang mit (einfügen, verschieben, entfernen); die Koordinaten
+liest die Abfrage aus den Arrays der Tabelle.
+
+Als Skript aufgerufen vergleicht es Gitter und vollständigen Durchlauf mit
+vielen Kreisen und Punkten (Ergebnis und Laufzeit).
+"""
+import argparse
+import time
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+import numpy as np
+
+Cell = Tuple[int, int]
+CellRange = Tuple[int, int, int, int]
+
+
+class CircleGrid:
+    """
+    Gitterindex über den Zeilen einer Kreistabelle.
+
+    Args:
+        cell_size (int): Kantenlänge einer Zelle in Pixeln, etwa der typische Kreisdurchmesser.
+        max_cells (int): Kreise, die mehr Zellen bedecken, werden bei jeder Abfrage geprüft.
+    """
+
+    def __init__(self, cell_size: int = 64, max_cells: int = 64):
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self.cells: Dict[Cell, Set[int]] = {}
+        # Zeile -> bedeckter Zellbereich (cx0, cy0, cx1, cy1), None für große Kreise
+        self.ranges: Dict[int, Optional[CellRange]] = {}
+        self.large: Set[int] = set()
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    def _range(self, x: int, y: int, radius: int) -> Optional[CellRange]:
+        s = self.cell_size
+        cells = ((x - radius) // s, (y - radius) // s, (x + radius) // s, (y + radius) // s)
+        if (cells[2] - cells[0] + 1) * (cells[3] - cells[1] + 1) > self.max_cells:
+            return None
+        return cells
+
+    @staticmethod
+    def _keys(cells: CellRange) -> Iterator[Cell]:
+        cx0, cy0, cx1, cy1 = cells
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                yield cx, cy
+
+    def insert(self, slot: int, x: int, y: int, radius: int):
+        """Trägt Zeile slot ein oder aktualisiert sie; bleibt der Zellbereich gleich, ändert sich nichts."""
+        cells = self._range(int(x), int(y), int(radius))
+        if slot in self.ranges:
+            if self.ranges[slot] == cells:
+                return
+            self.remove(slot)
+        self.ranges[slot] = cells
+        if cells is None:
+            self.large.add(slot)
+            return
+        for key in self._keys(cells):
+            self.cells.setdefault(key, set()).add(slot)
+
+    def remove(self, slot: int):
+        """Entfernt Zeile slot (unbekannte Zeilen werden ignoriert)."""
+        if slot not in self.ranges:
+            return
+        cells = self.ranges.pop(slot)
+        if cells is None:
+            self.large.discard(slot)
+            return
+        for key in self._keys(cells):
+            members = self.cells[key]
+            members.discard(slot)
+            if not members:
+                del self.cells[key]
+
+    def move(self, source: int, target: int):
+        """Der Kreis aus Zeile source steht jetzt in Zeile target (wie CircleTable._move)."""
+        self.remove(target)
+        cells = self.ranges.pop(source)
+        self.ranges[target] = cells
+        if cells is None:
+            self.large.discard(source)
+            self.large.add(target)
+            return
+        for key in self._keys(cells):
+            members = self.cells[key]
+            members.discard(source)
+            members.add(target)
+
+    def rebuild(self, x: np.ndarray, y: np.ndarray, radius: np.ndarray):
+        """Baut den Index für die Zeilen 0..len(x)-1 neu auf."""
+        self.cells.clear()
+        self.ranges.clear()
+        self.large.clear()
+        for slot, (cx, cy, r) in enumerate(zip(x.tolist(), y.tolist(), radius.tolist())):
+            self.insert(slot, cx, cy, r)
+
+    def query_points(self, points: np.ndarray, x: np.ndarray, y: np.ndarray,
+                     radius: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Alle Treffer (Punkt, Zeile) für viele Punkte auf einmal.
+
+        Pro Punkt wird nur seine Zelle nachgeschlagen; die Abstandsprüfung aller
+        Kandidatenpaare (z.B. 21 Landmarken einer Hand mal die Kreise ihrer
+        Zellen) ist dann ein einziger NumPy-Schritt.
+
+        Args:
+            points (np.ndarray): (N, 2) Punkte in Pixeln.
+            x, y, radius (np.ndarray): Spalten der Kreistabelle.
+
+        Returns:
+            (point_index, slot): Gleich lange Arrays, sortiert nach Punkt und je
+            Punkt nach absteigender Zeile (zuletzt gezeichnete Kreise zuerst).
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        empty = np.empty(0, dtype=np.intp)
+        if not len(points) or not self.ranges:
+            return empty, empty
+        point_list, slot_list = [], []
+        cells = np.floor_divide(points, self.cell_size).astype(np.int64)
+        for i, key in enumerate(map(tuple, cells.tolist())):
+            slots = self.cells.get(key)
+            if slots:
+                point_list.extend([i] * len(slots))
+                slot_list.extend(slots)
+        for slot in self.large:
+            point_list.extend(range(len(points)))
+            slot_list.extend([slot] * len(points))
+        if not point_list:
+            return empty, empty
+        point_index = np.array(point_list, dtype=np.intp)
+        slot = np.array(slot_list, dtype=np.intp)
+        dx = points[point_index, 0] - x[slot]
+        dy = points[point_index, 1] - y[slot]
+        r = radius[slot].astype(np.float64)
+        hit = dx * dx + dy * dy <= r * r
+        point_index, slot = point_index[hit], slot[hit]
+        order = np.lexsort((-slot, point_index))
+        return point_index[order], slot[order]
+
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float, x: np.ndarray, y: np.ndarray,
+                   radius: np.ndarray) -> np.ndarray:
+        """Zeilen der Kreise, die das Rechteck berühren, zuletzt gezeichnete zuerst."""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        s = self.cell_size
+        cells = (int(x0 // s), int(y0 // s), int(x1 // s), int(y1 // s))
+        if (cells[2] - cells[0] + 1) * (cells[3] - cells[1] + 1) > len(self.cells):
+            # Großes Rechteck: mehr Zellen als belegt, alle Kreise prüfen
+            found = self.ranges.keys()
+        else:
+            found = set(self.large)
+            for key in self._keys(cells):
+                found.update(self.cells.get(key, ()))
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        slot = np.fromiter(found, dtype=np.intp, count=len(found))
+        cx, cy = x[slot].astype(np.float64), y[slot].astype(np.float64)
+        # Abstand vom Mittelpunkt zum nächsten Punkt des Rechtecks
+        dx = np.clip(cx, x0, x1) - cx
+        dy = np.clip(cy, y0, y1) - cy
+        r = radius[slot].astype(np.float64)
+        return np.sort(slot[dx * dx + dy * dy <= r * r])[::-1]
+
+
+# --- Vergleich mit vollständigem Durchlauf ---
+
+def _brute_force(points: np.ndarray, x: np.ndarray, y: np.ndarray, radius: np.ndarray):
+    dx = points[:, 0, None] - x[None, :]
+    dy = points[:, 1, None] - y[None, :]
+    point_index, slot = np.nonzero(dx * dx + dy * dy <= radius[None, :].astype(np.float64) ** 2)
+    order = np.lexsort((-slot, point_index))
+    return point_index[order], slot[order]
+
+
+def compare(circles: int = 5000, points: int = 21, updates: int = 1000, width: int = 1920, height: int = 1080,
+            cell_size: int = 64, repeat: int = 200, seed: int = 0) -> bool:
+    """
+    Vergleicht Gitter und vollständigen Durchlauf nach zufälligen Änderungen.
+
+    Returns:
+        bool: True, wenn beide für alle Abfragen dieselben Treffer liefern.
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.integers(0, width, circles).astype(np.int32)
+    y = rng.integers(0, height, circles).astype(np.int32)
+    radius = rng.integers(5, 40, circles).astype(np.int32)
+    radius[:10] = 600  # einige sehr große Kreise
+    grid = CircleGrid(cell_size)
+    start = time.perf_counter()
+    grid.rebuild(x, y, radius)
+    build = time.perf_counter() - start
+
+    # Einzelne Kreise bewegen, wie PUT /circles/{name}
+    start = time.perf_counter()
+    for slot in rng.integers(0, circles, updates).tolist():
+        x[slot] = min(width - 1, max(0, x[slot] + rng.integers(-50, 51)))
+        y[slot] = min(height - 1, max(0, y[slot] + rng.integers(-50, 51)))
+        grid.insert(slot, x[slot], y[slot], radius[slot])
+    update = time.perf_counter() - start
+
+    ok = True
+    grid_time = brute_time = 0.0
+    for _ in range(repeat):
+        # Punkte gehäuft wie die Landmarken einer Hand
+        center = rng.uniform((0, 0), (width, height))
+        query = center + rng.normal(0, 40, (points, 2))
+        start = time.perf_counter()
+        found = grid.query_points(query, x, y, radius)
+        grid_time += time.perf_counter() - start
+        start = time.perf_counter()
+        expected = _brute_force(query, x, y, radius)
+        brute_time += time.perf_counter() - start
+        ok &= all(np.array_equal(a, b) for a, b in zip(found, expected))
+
+        x0, y0 = center
+        rect = grid.query_rect(x0, y0, x0 + 200, y0 + 100, x, y, radius)
+        dx = np.clip(x, x0, x0 + 200) - x
+        dy = np.clip(y, y0, y0 + 100) - y
+        ok &= np.array_equal(rect, np.flatnonzero(dx * dx + dy * dy <= radius.astype(np.float64) ** 2)[::-1])
+
+    print(f"{circles} Kreise: Aufbau {1000 * build:.1f} ms, {1e6 * update / updates:.1f} µs pro Änderung")
+    print(f"{points} Punkte pro Abfrage: Gitter {1e6 * grid_time / repeat:.0f} µs, "
+          f"vollständiger Durchlauf {1e6 * brute_time / repeat:.0f} µs")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vergleicht den Gitterindex mit einem vollständigen Durchlauf.")
+    parser.add_argument("--circles", type=int, default=5000, help="Anzahl Kreise")
+    parser.add_argument("--points", type=int, default=21, help="Punkte pro Abfrage")
+    parser.add_argument("--updates", type=int, default=1000, help="Einzeländerungen vor den Abfragen")
+    parser.add_argument("--cell-size", type=int, default=64, help="Kantenlänge einer Gitterzelle in Pixeln")
+    parser.add_argument("--repeat", type=int, default=200, help="Anzahl Abfragen")
+    args = parser.parse_args()
+
+    ok = compare(args.circles, args.points, args.updates, cell_size=args.cell_size, repeat=args.repeat)
+    print("OK" if ok else "FEHLER")
+    exit(0 if ok else 1)
@@ -0,0 +1,92 @@
+"""
+Pygame-Fenster, das die geteilte Kreistabelle zeichnet (eigener Prozess).
+
+Importiert nur Pygame, die Kreistabelle und den Renderer, sodass main.py das
+Fenster starten kann, bevor FastAPI und Uvicorn geladen sind.
+"""
+import os
+import sys
+import threading
+import time
+
+import pygame
+
+from circle_table import CircleSnapshot, CircleTable
+from renderer import DirtyRenderer
+
+# Gemeinsame Messwerkzeuge (metrics.py) liegen eine Ebene höher in code/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import mark_first_frame  # noqa: E402
+
+# Pygame-Event, mit dem der Wecker-Thread eine Änderung der Kreistabelle meldet
+TABLE_CHANGED = pygame.USEREVENT + 1
+
+def _forward_changes(changed, stop: threading.Event):
+    """Wartet auf Schreibvorgänge des FastAPI-Prozesses und weckt die Pygame-Schleife."""
+    while not stop.is_set():
+        if changed.wait(0.5):
+            changed.clear()
+            pygame.event.post(pygame.event.Event(TABLE_CHANGED))
+
+def pygame_process(background_image_path: str, table_name: str, changed):
+    """
+    Der separate Prozess, der das Pygame-Fenster und die Zeichenlogik verwaltet.
+
+    Gezeichnet wird nur nach einer Änderung der Kreistabelle oder einem
+    Fenster-Event, und nur die Bereiche geänderter Kreise.
+    """
+    table = CircleTable(name=table_name)
+    circles = CircleSnapshot(table.capacity)
+    pygame.init()
+
+    # Lade das Hintergrundbild
+    try:
+        screen = pygame.display.set_mode((1024,512))
+        background_image = pygame.image.load(background_image_path).convert()
+        screen_width, screen_height = background_image.get_size()
+    except pygame.error as e:
+        print(f"Fehler beim Laden des Hintergrundbildes '{background_image_path}': {e}")
+        print("Starte mit Standardauflösung (800x600) und ohne Hintergrundbild.")
+        screen_width, screen_height = 1024, 512
+        background_image = None # Setze auf None, um Fehler beim Blitting zu vermeiden
+
+    screen = pygame.display.set_mode((screen_width, screen_height))
+    pygame.display.set_caption("Pygame Circle Renderer")
+    # Schwarzer Hintergrund, wenn kein Bild geladen
+    renderer = DirtyRenderer(screen, background_image, fill=(0, 0, 0))
+
+    stop = threading.Event()
+    waker = threading.Thread(target=_forward_changes, args=(changed, stop), daemon=True)
+    waker.start()
+
+    running = True
+    clock = pygame.time.Clock()
+    table.snapshot(circles)
+    pygame.display.update(renderer.render(circles))
+    mark_first_frame("ui")
+
+    while running:
+        # Schlafen, bis ein Fenster-Event oder eine Änderung der Tabelle eintrifft
+        for event in [pygame.event.wait()] + pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                renderer.invalidate()
+
+        # Kreise zeichnen: konsistenten Stand der geteilten Tabelle übernehmen (nur bei Änderungen)
+        if not table.snapshot(circles) and table.generation != circles.generation:
+            # Der Schreiber war während des Kopierens aktiv: gleich noch einmal versuchen
+            pygame.event.post(pygame.event.Event(TABLE_CHANGED))
+        rects = renderer.render(circles)
+        if rects:
+            pygame.display.update(rects)
+            if circles.capture_time:
+                # Glass-to-Glass: Kameraaufnahme bis zum gezeichneten Pixel
+                table.record_latency(time.time() - circles.capture_time)
+        clock.tick(60) # Begrenze die Bildrate auf 60 FPS
+
+    stop.set()
+    waker.join()
+    pygame.quit()
+    table.close()
+    print("Pygame-Fenster geschlossen.")
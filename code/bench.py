@@ -0,0 +1,217 @@
+"""
+Reproduzierbarer Benchmark über Erkennung, Hand-Tracking und UI-Updates.
+
+Feste Eingaben werden so schnell wie möglich durch die Stufen geschickt:
+
+  detect  Videodatei/Bildordner (--video) durch das Marker-Modell (--model),
+          verlustfrei über die Pipeline (Inferenz und Capture-bis-Ergebnis).
+  hands   Landmarken aus einer Aufnahme (--recording, .smcrec) durch die
+          Gesten-Engine; ohne Aufnahme deterministisch erzeugte Hände.
+  ui      Marker-Erkennungen aus der Aufnahme (ohne Aufnahme erzeugte,
+          wandernde Marker) über ui_bridge.detections_to_circles in die
+          Kreistabelle und durch den DirtyRenderer (headless).
+
+Die Ergebnisse (p50/p95/p99 in ms und Durchsatz) gehen als JSON nach --out.
+Mit --baseline werden sie gegen gespeicherte Werte verglichen: Zeiten, die um
+mehr als --tolerance steigen, und Durchsätze, die um mehr als --tolerance
+fallen, gelten als Regression (Exit-Code 1). --save-baseline schreibt die
+aktuellen Werte als neue Baseline.
+
+  python bench.py --out bench.json --baseline bench_baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+import numpy as np
+
+from metrics import StageStats
+
+# Kennzahlen, die verglichen werden; Zeiten sollen nicht steigen, Durchsätze nicht fallen
+LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms")
+HIGHER_IS_BETTER = ("fps",)
+
+
+def _result(stats: StageStats, elapsed: float, **extra) -> Dict[str, float]:
+    summary = stats.summary()
+    summary.pop("count", None)
+    return {"frames": stats.count, "fps": stats.count / elapsed if elapsed > 0 else 0.0, **summary, **extra}
+
+
+def bench_detect(video: str, model: str, max_frames: Optional[int] = None) -> Dict[str, float]:
+    from detections import load_detector
+    from frame_source import open_source
+    from pipeline import Pipeline
+
+    detector = load_detector(model, track=False)
+    pipeline = Pipeline(open_source(video), detector.detect, lossless=True, max_frames=max_frames)
+    report = pipeline.run()
+    inference = report["stages"]["inference"]
+    return {"frames": inference.get("count", 0), "fps": report["fps"],
+            **{key: inference[key] for key in LOWER_IS_BETTER if key in inference},
+            "latency_p95_ms": report["stages"]["latency"].get("p95_ms", 0.0)}
+
+
+def _synthetic_hands(frames: int, seed: int = 0):
+    """Zwei Hände, die deterministisch über das Bild wandern (30 fps)."""
+    rng = np.random.default_rng(seed)
+    base = rng.uniform(200, 400, (2, 21, 3)).astype(np.float32)
+    base[..., 2] = 0.0
+    for i in range(frames):
+        hands = base + np.float32(40.0 * np.sin(i / 15.0))
+        yield i / 30.0, hands + rng.normal(0, 1.5, hands.shape).astype(np.float32)
+
+
+def bench_hands(recording: Optional[str] = None, frames: int = 3000) -> Dict[str, float]:
+    from gestures import GestureEngine
+
+    if recording:
+        from recording import RecordingReader
+
+        source = ((timestamp, hands) for timestamp, hands, _ in RecordingReader(recording).frames())
+    else:
+        source = _synthetic_hands(frames)
+    engine = GestureEngine()
+    stats = StageStats("hands", window=1 << 20)
+    events = 0
+    start = time.perf_counter()
+    for timestamp, hands in source:
+        frame_start = time.perf_counter()
+        events += len(engine.process(timestamp, hands))
+        stats.add(time.perf_counter() - frame_start)
+    return _result(stats, time.perf_counter() - start, events=events)
+
+
+def _synthetic_detections(frames: int, markers: int = 24, seed: int = 0):
+    """Getrackte Marker, von denen pro Frame ein Teil ein paar Pixel wandert."""
+    from detections import Detections
+
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(50, 600, (markers, 2))
+    size = rng.uniform(20, 40, (markers, 1))
+    cls = (np.arange(markers) % 10).astype(np.int32)
+    ids = np.arange(markers, dtype=np.int32)
+    for _ in range(frames):
+        movers = rng.random(markers) < 0.2
+        centers[movers] += rng.normal(0, 3, (int(movers.sum()), 2))
+        xyxy = np.concatenate([centers - size / 2, centers + size / 2], axis=1).astype(np.float32)
+        yield Detections(xyxy, np.ones(markers, np.float32), cls, ids)
+
+
+def bench_ui(recording: Optional[str] = None, frames: int = 3000, size=(1024, 512)) -> Dict[str, float]:
+    """Erkennungen -> Kreise -> Kreistabelle -> Dirty-Rectangles, ein Schritt pro Frame."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "UI"))
+    import pygame
+
+    from circle_table import CircleSnapshot, CircleTable
+    from renderer import DirtyRenderer
+    from ui_bridge import detections_to_circles
+
+    if recording:
+        from recording import RecordingReader
+
+        source = (detections for _, _, detections in RecordingReader(recording).frames())
+    else:
+        source = _synthetic_detections(frames)
+    pygame.init()
+    screen = pygame.display.set_mode(size)
+    table = CircleTable(capacity=1024)
+    snapshot = CircleSnapshot(table.capacity)
+    renderer = DirtyRenderer(screen, fill=(0, 0, 0))
+    homography = np.eye(3)
+    shown = {}
+    stats = StageStats("ui", window=1 << 20)
+    start = time.perf_counter()
+    try:
+        for detections in source:
+            frame_start = time.perf_counter()
+            circles = detections_to_circles(detections, homography)
+            upsert = [c for name, c in circles.items() if shown.get(name) != c]
+            delete = [name for name in shown if name not in circles]
+            if upsert or delete:
+                table.apply(upsert=[SimpleNamespace(**c) for c in upsert], delete=delete)
+                shown = circles
+            table.snapshot(snapshot)
+            rects = renderer.render(snapshot)
+            if rects:
+                pygame.display.update(rects)
+            stats.add(time.perf_counter() - frame_start)
+        return _result(stats, time.perf_counter() - start)
+    finally:
+        table.close()
+        pygame.quit()
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float):
+    """Gibt (Szenario, Kennzahl, Baseline, aktuell, Änderung) für jede Regression zurück."""
+    regressions = []
+    for scenario, values in results.items():
+        reference = baseline.get(scenario, {})
+        for key in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            if key not in values or not reference.get(key):
+                continue
+            change = values[key] / reference[key] - 1.0
+            worse = change > tolerance if key in LOWER_IS_BETTER else change < -tolerance
+            if worse:
+                regressions.append((scenario, key, reference[key], values[key], change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark über Erkennung, Hand-Tracking und UI-Updates.")
+    parser.add_argument("--scenarios", nargs="+", choices=("detect", "hands", "ui"), default=None,
+                        help="Auszuführende Szenarien (Standard: hands, ui und detect, falls --video/--model)")
+    parser.add_argument("--video", default=None, help="Videodatei oder Bildordner für detect")
+    parser.add_argument("--model", default=None, help="Marker-Modell (.pt oder .onnx) für detect")
+    parser.add_argument("--recording", default=None, help="Aufnahme (.smcrec) mit Landmarken und Erkennungen")
+    parser.add_argument("--frames", type=int, default=3000, help="Frames der erzeugten Eingaben")
+    parser.add_argument("--out", default="bench_results.json", help="Ergebnisdatei (JSON)")
+    parser.add_argument("--baseline", default=None, help="Baseline-Datei zum Vergleich")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Erlaubte Verschlechterung (0.15 = 15 %%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Ergebnisse als neue Baseline speichern")
+    args = parser.parse_args()
+
+    scenarios = args.scenarios or ["hands", "ui"] + (["detect"] if args.video and args.model else [])
+    results = {}
+    for scenario in scenarios:
+        if scenario == "detect":
+            if not (args.video and args.model):
+                parser.error("detect benötigt --video und --model")
+            results[scenario] = bench_detect(args.video, args.model)
+        elif scenario == "hands":
+            results[scenario] = bench_hands(args.recording, args.frames)
+        else:
+            results[scenario] = bench_ui(args.recording, args.frames)
+        r = results[scenario]
+        print(f"{scenario:<7} {r['frames']:>6} Frames {r['fps']:>9.0f} FPS  p50 {r.get('p50_ms', 0):.3f} ms  "
+              f"p95 {r.get('p95_ms', 0):.3f} ms  p99 {r.get('p99_ms', 0):.3f} ms")
+
+    output = {"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                       "machine": platform.machine(), "node": platform.node(),
+                       "inputs": {"video": args.video, "model": args.model, "recording": args.recording,
+                                  "frames": args.frames}},
+              "results": results}
+    with open(args.out, "w") as f:
+        json.dump(output, f, indent=2)
+
+    status = 0
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for scenario, key, before, after, change in regressions:
+            print(f"REGRESSION {scenario}.{key}: {before:.3f} -> {after:.3f} ({100 * change:+.1f} %)")
+        if not regressions:
+            print(f"Keine Regression gegenüber {args.baseline} (Toleranz {100 * args.tolerance:.0f} %)")
+        status = 1 if regressions else 0
+    if args.save_baseline:
+        with open(args.baseline or "bench_baseline.json", "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Baseline gespeichert: {args.baseline or 'bench_baseline.json'}")
+    sys.exit(status)
@@ -0,0 +1,309 @@
+"""
+Kalibrierung Kamera -> Papierbogen per Homographie.
+
+Das Werkzeug sucht einmalig die vier Ecken des Bogens (größtes helles
+Viereck im Bild) oder vier ArUco-Marker in den Ecken (IDs 0-3 im
+Uhrzeigersinn ab oben links) und speichert die Homographie von
+Kamerapixeln auf den Bogen als JSON:
+
+  {"homography": [[...], [...], [...]], "sheet_size": [w, h],
+   "camera_size": [w, h], "corners": [[x, y], ...], "method": "sheet"}
+
+Die Bogengröße ist standardmäßig die Größe des UI-Hintergrunds, sodass die
+Bogenkoordinaten direkt die Koordinaten der Kreise in UI/main.py sind
+(ui_bridge.load_homography liest dieselbe Datei).
+
+Zur Laufzeit gibt es zwei Wege:
+  - Rectifier entzerrt ganze Frames mit vorab berechneten remap-Tabellen
+    (Festkomma, ohne Perspektivrechnung pro Frame) auf das kleinere,
+    normierte Bogenbild; die Inferenz läuft dann direkt auf dem Bogen.
+  - Calibration.to_sheet bildet nur die Koordinaten der Erkennungen ab.
+
+Aufruf:
+  python calibration.py --source 0 --out calibration.json
+  python calibration.py --source foto.jpg --aruco --background UI/background.png
+"""
+import argparse
+import json
+import time
+from dataclasses import dataclass
+from typing import Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+DEFAULT_SHEET_SIZE = (1024, 512)
+
+
+def project(homography: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Bildet (N, 2)-Punkte mit der Homographie ab."""
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    mapped = points @ homography[:, :2].T + homography[:, 2]
+    return mapped[:, :2] / mapped[:, 2:3]
+
+
+def order_corners(points: np.ndarray) -> np.ndarray:
+    """Sortiert vier Punkte als oben links, oben rechts, unten rechts, unten links."""
+    points = np.asarray(points, dtype=np.float32).reshape(4, 2)
+    total = points.sum(axis=1)
+    diff = points[:, 1] - points[:, 0]
+    return np.array([points[np.argmin(total)], points[np.argmin(diff)],
+                     points[np.argmax(total)], points[np.argmax(diff)]], dtype=np.float32)
+
+
+def find_sheet_corners(image: np.ndarray, min_area: float = 0.1) -> Optional[np.ndarray]:
+    """
+    Sucht den Papierbogen als größtes helles Viereck.
+
+    Args:
+        image (np.ndarray): BGR-Kamerabild.
+        min_area (float): Mindestfläche des Bogens als Anteil am Bild.
+
+    Returns:
+        np.ndarray: (4, 2) Ecken (oben links, oben rechts, unten rechts, unten links) oder None.
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    gray = cv2.GaussianBlur(gray, (5, 5), 0)
+    _, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    best, best_area = None, min_area * image.shape[0] * image.shape[1]
+    for contour in contours:
+        area = cv2.contourArea(contour)
+        if area < best_area:
+            continue
+        approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+        if len(approx) == 4 and cv2.isContourConvex(approx):
+            best, best_area = approx, area
+    return None if best is None else order_corners(best)
+
+
+def find_aruco_corners(image: np.ndarray, dictionary: str = "DICT_4X4_50",
+                       ids: Sequence[int] = (0, 1, 2, 3)) -> Optional[np.ndarray]:
+    """
+    Sucht vier ArUco-Marker in den Ecken des Bogens.
+
+    Von jedem Marker wird die äußere Ecke verwendet (Marker ids[0] oben links,
+    ids[1] oben rechts, ids[2] unten rechts, ids[3] unten links, aufrecht
+    gedruckt).
+
+    Returns:
+        np.ndarray: (4, 2) Ecken oder None, wenn nicht alle Marker gefunden wurden.
+    """
+    aruco = cv2.aruco
+    vocabulary = aruco.getPredefinedDictionary(getattr(aruco, dictionary))
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if hasattr(aruco, "ArucoDetector"):
+        found, found_ids, _ = aruco.ArucoDetector(vocabulary, aruco.DetectorParameters()).detectMarkers(gray)
+    else:
+        # OpenCV < 4.7
+        found, found_ids, _ = aruco.detectMarkers(gray, vocabulary)
+    if found_ids is None:
+        return None
+    by_id = {int(i): c.reshape(4, 2) for i, c in zip(found_ids.ravel(), found)}
+    if not all(i in by_id for i in ids):
+        return None
+    return np.array([by_id[marker][corner] for corner, marker in enumerate(ids)], dtype=np.float32)
+
+
+@dataclass
+class Calibration:
+    """Homographie von Kamerapixeln auf den Bogen."""
+    homography: np.ndarray          # (3, 3) Kamera -> Bogen
+    sheet_size: Tuple[int, int]     # (w, h) des entzerrten Bogens
+    camera_size: Tuple[int, int]    # (w, h) der Kamera bei der Kalibrierung
+    corners: Optional[np.ndarray] = None  # (4, 2) gefundene Ecken im Kamerabild
+    method: str = "sheet"
+
+    @classmethod
+    def from_corners(cls, corners: np.ndarray, sheet_size: Tuple[int, int], camera_size: Tuple[int, int],
+                     method: str = "sheet") -> "Calibration":
+        w, h = sheet_size
+        target = np.array([[0, 0], [w - 1, 0], [w - 1, h - 1], [0, h - 1]], dtype=np.float32)
+        homography = cv2.getPerspectiveTransform(np.asarray(corners, np.float32), target)
+        return cls(homography, tuple(sheet_size), tuple(camera_size), np.asarray(corners, np.float32), method)
+
+    @classmethod
+    def load(cls, path: str) -> "Calibration":
+        with open(path, "r") as f:
+            data = json.load(f)
+        corners = data.get("corners")
+        return cls(np.asarray(data["homography"], dtype=np.float64).reshape(3, 3),
+                   tuple(data["sheet_size"]), tuple(data["camera_size"]),
+                   None if corners is None else np.asarray(corners, np.float32), data.get("method", "sheet"))
+
+    def save(self, path: str):
+        data = {"homography": self.homography.tolist(), "sheet_size": list(self.sheet_size),
+                "camera_size": list(self.camera_size), "method": self.method}
+        if self.corners is not None:
+            data["corners"] = self.corners.tolist()
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    def for_frame_size(self, frame_size: Tuple[int, int]) -> "Calibration":
+        """Passt die Homographie an eine andere Kameraauflösung an (gleicher Bildausschnitt)."""
+        frame_size = tuple(frame_size)
+        if frame_size == self.camera_size:
+            return self
+        scale = np.diag([self.camera_size[0] / frame_size[0], self.camera_size[1] / frame_size[1], 1.0])
+        corners = None
+        if self.corners is not None:
+            corners = self.corners / np.array([scale[0, 0], scale[1, 1]], np.float32)
+        return Calibration(self.homography @ scale, self.sheet_size, frame_size, corners, self.method)
+
+    def to_sheet(self, points: np.ndarray) -> np.ndarray:
+        """Bildet (N, 2) Kamerapunkte auf den Bogen ab."""
+        return project(self.homography, points)
+
+    def to_camera(self, points: np.ndarray) -> np.ndarray:
+        """Bildet (N, 2) Bogenpunkte zurück ins Kamerabild ab."""
+        return project(np.linalg.inv(self.homography), points)
+
+
+class Rectifier:
+    """
+    Entzerrt Kamera-Frames auf den Bogen mit vorab berechneten remap-Tabellen.
+
+    Die Tabellen werden pro Kameraauflösung einmal angelegt und als
+    Festkomma-Maps (CV_16SC2) gehalten; rectify() ist danach ein einziger
+    cv2.remap-Aufruf ohne Perspektivrechnung.
+
+    Args:
+        calibration (Calibration): Kalibrierung der Kamera.
+        interpolation (int): cv2.INTER_LINEAR oder cv2.INTER_NEAREST.
+    """
+
+    def __init__(self, calibration: Calibration, interpolation: int = cv2.INTER_LINEAR):
+        self.calibration = calibration
+        self.interpolation = interpolation
+        self.size = calibration.sheet_size
+        self._frame_size = None
+        self._maps = None
+
+    def _build(self, frame_size: Tuple[int, int]):
+        calibration = self.calibration.for_frame_size(frame_size)
+        w, h = self.size
+        grid = np.stack(np.meshgrid(np.arange(w, dtype=np.float64), np.arange(h, dtype=np.float64)), axis=-1)
+        source = calibration.to_camera(grid.reshape(-1, 2)).reshape(h, w, 2).astype(np.float32)
+        self._maps = cv2.convertMaps(source[..., 0], source[..., 1], cv2.CV_16SC2)
+        self._frame_size = frame_size
+
+    def rectify(self, frame: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Entzerrt frame auf die Bogengröße (optional in den Puffer out)."""
+        frame_size = (frame.shape[1], frame.shape[0])
+        if frame_size != self._frame_size:
+            self._build(frame_size)
+        return cv2.remap(frame, self._maps[0], self._maps[1], self.interpolation, dst=out,
+                         borderMode=cv2.BORDER_CONSTANT)
+
+
+class RectifiedSource:
+    """Quelle (read()/release()), die jeden Frame entzerrt zurückgibt."""
+
+    def __init__(self, source, rectifier: Rectifier):
+        self.source = source
+        self.rectifier = rectifier
+
+    def read(self):
+        success, frame = self.source.read()
+        if not success:
+            return success, frame
+        return True, self.rectifier.rectify(frame)
+
+    def release(self):
+        self.source.release()
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
+
+
+def draw_corners(image: np.ndarray, corners: np.ndarray, color=(0, 255, 0)) -> np.ndarray:
+    points = corners.astype(np.int32).reshape(-1, 1, 2)
+    cv2.polylines(image, [points], True, color, 2, cv2.LINE_AA)
+    for label, (x, y) in zip(("TL", "TR", "BR", "BL"), corners.astype(int).tolist()):
+        cv2.putText(image, label, (x + 5, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2, cv2.LINE_AA)
+    return image
+
+
+def _benchmark(calibration: Calibration, frame: np.ndarray, repeats: int = 100):
+    """Vergleicht remap-Tabellen mit warpPerspective pro Frame."""
+    rectifier = Rectifier(calibration)
+    out = rectifier.rectify(frame)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        rectifier.rectify(frame, out=out)
+    remap_ms = 1000 * (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        cv2.warpPerspective(frame, calibration.homography, calibration.sheet_size, dst=out)
+    warp_ms = 1000 * (time.perf_counter() - start) / repeats
+    print(f"Entzerren: remap {remap_ms:.2f} ms/Frame, warpPerspective {warp_ms:.2f} ms/Frame")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kalibriert die Kamera auf den Papierbogen (Homographie).")
+    parser.add_argument("--source", default="0",
+                        help="Kamera-Index, Videodatei, Stream-URL oder Bilddatei (Standard: 0)")
+    parser.add_argument("--out", default="calibration.json", help="Zieldatei der Kalibrierung")
+    parser.add_argument("--aruco", action="store_true",
+                        help="ArUco-Marker 0-3 in den Ecken statt der Bogenkante verwenden")
+    parser.add_argument("--dictionary", default="DICT_4X4_50", help="ArUco-Wörterbuch für --aruco")
+    parser.add_argument("--size", type=int, nargs=2, default=None,
+                        help="Größe w h des entzerrten Bogens (Standard: Größe von --background)")
+    parser.add_argument("--background", default=None,
+                        help="UI-Hintergrund, dessen Größe als Bogengröße verwendet wird")
+    args = parser.parse_args()
+
+    from frame_source import open_source
+
+    if args.size:
+        sheet_size = tuple(args.size)
+    elif args.background:
+        background = cv2.imread(args.background)
+        if background is None:
+            raise SystemExit(f"Hintergrund '{args.background}' konnte nicht gelesen werden")
+        sheet_size = (background.shape[1], background.shape[0])
+    else:
+        sheet_size = DEFAULT_SHEET_SIZE
+
+    def detect(frame):
+        if args.aruco:
+            return find_aruco_corners(frame, args.dictionary)
+        return find_sheet_corners(frame)
+
+    still = cv2.imread(args.source) if not str(args.source).isdigit() else None
+    if still is not None:
+        # Einzelbild: ohne Vorschau direkt kalibrieren
+        corners = detect(still)
+        if corners is None:
+            raise SystemExit("Keine Bogenecken gefunden")
+        calibration = Calibration.from_corners(corners, sheet_size, (still.shape[1], still.shape[0]),
+                                               "aruco" if args.aruco else "sheet")
+        calibration.save(args.out)
+        print(f"Kalibrierung gespeichert: {args.out}")
+        _benchmark(calibration, still)
+        raise SystemExit(0)
+
+    source = open_source(args.source)
+    calibration = None
+    print("Leertaste: speichern, q: beenden")
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        corners = detect(frame)
+        preview = frame.copy()
+        if corners is not None:
+            calibration = Calibration.from_corners(corners, sheet_size, (frame.shape[1], frame.shape[0]),
+                                                   "aruco" if args.aruco else "sheet")
+            draw_corners(preview, corners)
+            cv2.imshow("Bogen", cv2.warpPerspective(frame, calibration.homography, sheet_size))
+        cv2.imshow("Kalibrierung", preview)
+        key = cv2.waitKey(1) & 0xFF
+        if key == ord(' ') and calibration is not None:
+            calibration.save(args.out)
+            print(f"Kalibrierung gespeichert: {args.out}")
+            _benchmark(calibration, frame)
+        elif key == ord('q'):
+            break
+    source.release()
+    cv2.destroyAllWindows()
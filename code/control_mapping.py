@@ -0,0 +1,285 @@
+"""
+Abbildung erkannter Marker auf Synthesizer-Parameter mit OSC-Ausgabe über UDP.
+
+Eine Layout-Datei (JSON) beschreibt die Regler auf dem Papierbogen: Typ
+(knob oder slider), Marker-Klasse, Bereich in Bildkoordinaten und OSC-Adresse.
+Pro Frame werden daraus normierte Werte (0..1) berechnet. Gesendet wird nur,
+wenn sich ein Wert um mehr als die Schwelle des Reglers geändert hat; alle
+Änderungen eines Frames gehen als ein OSC-Bundle in einem Datagramm raus.
+
+Die Erkennungen sind achsparallele Boxen ohne Orientierung. Die "Drehung"
+eines knob ist daher keine Drehung des Markers selbst, sondern der
+Positionswinkel seines Mittelpunkts um die Mitte des Reglerbereichs (0° =
+oben, im Uhrzeigersinn positiv): der Marker wird wie der Zeiger eines
+Drehknopfs im Kreis geschoben.
+
+Als Skript aufgerufen spielt es aufgezeichnete Erkennungen (oder ohne
+Aufnahme synthetische, die jeden Regler einmal über seinen ganzen Bereich
+fahren) gegen einen lokalen UDP-Empfänger ab und prüft, dass genau die
+erwarteten Nachrichten ankommen und das Senden unter 1 ms pro Frame bleibt.
+"""
+import argparse
+import json
+import math
+import socket
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from detections import Detections
+from metrics import StageStats
+
+OSC_BUNDLE_HEADER = b"#bundle\x00" + struct.pack(">Q", 1)  # Zeitmarke 1 = sofort
+
+
+def _osc_string(text: str) -> bytes:
+    """Kodiert einen OSC-String (nullterminiert, auf 4 Byte aufgefüllt)."""
+    data = text.encode("ascii") + b"\x00"
+    return data + b"\x00" * (-len(data) % 4)
+
+
+def encode_message(address: str, value: float) -> bytes:
+    """Kodiert eine OSC-Nachricht mit einem float32-Argument."""
+    return _osc_string(address) + _osc_string(",f") + struct.pack(">f", value)
+
+
+def encode_bundle(messages: List[bytes]) -> bytes:
+    """Fasst mehrere OSC-Nachrichten zu einem Bundle zusammen."""
+    return OSC_BUNDLE_HEADER + b"".join(struct.pack(">i", len(m)) + m for m in messages)
+
+
+def decode_packet(data: bytes) -> List[Tuple[str, float]]:
+    """Dekodiert ein OSC-Paket (Nachricht oder Bundle) mit float-Argumenten."""
+    if data.startswith(b"#bundle\x00"):
+        messages, position = [], 16
+        while position < len(data):
+            size = struct.unpack(">i", data[position:position + 4])[0]
+            messages += decode_packet(data[position + 4:position + 4 + size])
+            position += 4 + size
+        return messages
+    end = data.index(b"\x00")
+    address = data[:end].decode("ascii")
+    position = (end + 4) & ~3
+    tags_end = data.index(b"\x00", position)
+    position = (tags_end + 4) & ~3
+    return [(address, struct.unpack(">f", data[position:position + 4])[0])]
+
+
+@dataclass
+class Control:
+    """Ein Regler auf dem Papierbogen."""
+    name: str
+    kind: str                  # "knob" oder "slider"
+    class_id: int              # Marker-Klasse, die den Regler bedient
+    region: np.ndarray         # x1, y1, x2, y2 in Bildkoordinaten
+    address: str               # OSC-Adresse
+    threshold: float = 0.005   # Mindeständerung für eine neue Nachricht
+    axis: str = "x"            # Schieberichtung bei slider
+    invert: bool = False
+    angle_range: Tuple[float, float] = (-135.0, 135.0)  # Drehbereich bei knob, 0° = oben
+    steps: int = 0             # > 0: Werte MIDI-artig auf diese Stufenzahl quantisieren
+    value: Optional[float] = field(default=None, repr=False)  # zuletzt gesendeter Wert
+    prefix: bytes = field(default=b"", repr=False)             # vorkodierte Adresse + Typ-Tag
+
+    def __post_init__(self):
+        self.region = np.asarray(self.region, dtype=np.float32)
+        self.prefix = _osc_string(self.address) + _osc_string(",f")
+
+    def value_for(self, center: np.ndarray) -> float:
+        """Berechnet den normierten Wert (0..1) aus dem Mittelpunkt des Markers."""
+        x1, y1, x2, y2 = self.region
+        if self.kind == "knob":
+            # Positionswinkel des Markers um die Mitte des Drehreglers, 0° zeigt nach oben;
+            # die Box selbst hat keine Orientierung
+            angle = math.degrees(math.atan2(center[0] - (x1 + x2) / 2, (y1 + y2) / 2 - center[1]))
+            low, high = self.angle_range
+            value = (angle - low) / (high - low)
+        elif self.axis == "y":
+            value = (y2 - center[1]) / (y2 - y1)  # unten = 0, oben = 1
+        else:
+            value = (center[0] - x1) / (x2 - x1)
+        value = min(1.0, max(0.0, value))
+        if self.invert:
+            value = 1.0 - value
+        if self.steps > 0:
+            value = round(value * (self.steps - 1)) / (self.steps - 1)
+        return value
+
+
+def load_layout(path: str):
+    """
+    Lädt eine Layout-Datei.
+
+    Returns:
+        tuple: (Liste der Controls, (host, port) des OSC-Empfängers)
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    controls = [Control(**{("class_id" if k == "class" else k): v for k, v in c.items()})
+                for c in data["controls"]]
+    osc = data.get("osc", {})
+    return controls, (osc.get("host", "127.0.0.1"), int(osc.get("port", 9000)))
+
+
+class ControlMapper:
+    """
+    Berechnet pro Frame die Reglerwerte und sendet Änderungen als OSC über UDP.
+
+    Args:
+        controls (list): Regler aus der Layout-Datei.
+        target (tuple): (host, port) des OSC-Empfängers.
+    """
+
+    def __init__(self, controls: List[Control], target: Tuple[str, int]):
+        self.controls = controls
+        self.target = target
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.classes = np.array([c.class_id for c in controls], dtype=np.int32)
+        self.regions = np.stack([c.region for c in controls]) if controls else np.zeros((0, 4), np.float32)
+        self.stats = StageStats("emit")
+        self.sent = 0
+        self.send_errors = 0
+
+    @classmethod
+    def from_layout(cls, path: str) -> "ControlMapper":
+        controls, target = load_layout(path)
+        return cls(controls, target)
+
+    def update(self, detections: Detections) -> List[Tuple[str, float]]:
+        """Ordnet die Erkennungen den Reglern zu und sendet geänderte Werte."""
+        start = time.perf_counter()
+        changed, messages = [], []
+        if len(detections) and len(self.controls):
+            centers = (detections.xyxy[:, :2] + detections.xyxy[:, 2:]) / 2
+            # (Regler, Erkennung): passende Klasse und Mittelpunkt im Bereich
+            inside = ((centers[None, :, 0] >= self.regions[:, None, 0]) & (centers[None, :, 0] <= self.regions[:, None, 2])
+                      & (centers[None, :, 1] >= self.regions[:, None, 1]) & (centers[None, :, 1] <= self.regions[:, None, 3])
+                      & (detections.cls[None, :] == self.classes[:, None]))
+            scores = np.where(inside, detections.conf[None, :], -1.0)
+            best = scores.argmax(axis=1)
+            for i in np.flatnonzero(scores[np.arange(len(self.controls)), best] >= 0):
+                control = self.controls[i]
+                value = control.value_for(centers[best[i]])
+                if control.value is None or abs(value - control.value) > control.threshold:
+                    control.value = value
+                    changed.append((control.name, value))
+                    messages.append(control.prefix + struct.pack(">f", value))
+        if messages:
+            packet = messages[0] if len(messages) == 1 else encode_bundle(messages)
+            try:
+                self.socket.sendto(packet, self.target)
+                self.sent += len(messages)
+            except OSError:
+                self.send_errors += 1
+        self.stats.add(time.perf_counter() - start)
+        return changed
+
+    def close(self):
+        self.socket.close()
+
+
+def load_recorded_detections(path: str) -> List[Detections]:
+    """Lädt aufgezeichnete Erkennungen (JSON: pro Frame eine Liste [x1, y1, x2, y2, conf, cls])."""
+    with open(path, "r") as f:
+        frames = json.load(f)
+    recorded = []
+    for rows in frames:
+        rows = np.asarray(rows, dtype=np.float32).reshape(-1, 6)
+        recorded.append(Detections(rows[:, :4].copy(), rows[:, 4].copy(), rows[:, 5].astype(np.int32)))
+    return recorded
+
+
+def synthetic_detections(controls: List[Control], frames: int = 120, size: float = 16.0) -> List[Detections]:
+    """
+    Deterministische Erkennungen, die jeden Regler einmal über seinen Bereich fahren.
+
+    In Frame i steht pro Regler ein Marker seiner Klasse an der Stelle, die den
+    Wert t = i / (frames - 1) ergibt (vor invert und steps): bei slider entlang
+    der Achse, bei knob auf einem Kreis um die Mitte beim Winkel
+    angle_range[0] + t * (angle_range[1] - angle_range[0]).
+    """
+    recorded = []
+    for i in range(frames):
+        t = i / max(1, frames - 1)
+        centers = []
+        for control in controls:
+            x1, y1, x2, y2 = control.region.tolist()
+            cx, cy = (x1 + x2) / 2, (y1 + y2) / 2
+            if control.kind == "knob":
+                low, high = control.angle_range
+                angle = math.radians(low + t * (high - low))
+                r = 0.35 * min(x2 - x1, y2 - y1)
+                centers.append((cx + r * math.sin(angle), cy - r * math.cos(angle)))
+            elif control.axis == "y":
+                centers.append((cx, y2 - t * (y2 - y1)))
+            else:
+                centers.append((x1 + t * (x2 - x1), cy))
+        centers = np.array(centers, dtype=np.float32).reshape(-1, 2)
+        xyxy = np.concatenate([centers - size / 2, centers + size / 2], axis=1)
+        recorded.append(Detections(xyxy, np.full(len(controls), 0.9, np.float32),
+                                   np.array([c.class_id for c in controls], dtype=np.int32)))
+    return recorded
+
+
+def check_against_listener(layout_path: str, recorded: List[Detections], budget_ms: float = 1.0) -> bool:
+    """
+    Spielt aufgezeichnete Erkennungen gegen einen lokalen UDP-Empfänger ab.
+
+    Prüft, dass alle gesendeten Werte in der richtigen Reihenfolge ankommen
+    und dass update() im 99. Perzentil unter budget_ms bleibt.
+    """
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.setblocking(False)
+    controls, _ = load_layout(layout_path)
+    mapper = ControlMapper(controls, listener.getsockname())
+    mapper.stats = StageStats("emit", window=max(1, len(recorded)))
+    address_of = {c.name: c.address for c in controls}
+
+    expected, received = [], []
+    for detections in recorded:
+        expected += [(address_of[name], value) for name, value in mapper.update(detections)]
+        # Empfänger nach jedem Frame leeren, damit der Socket-Puffer nicht überläuft
+        while True:
+            try:
+                received += decode_packet(listener.recv(65536))
+            except BlockingIOError:
+                break
+    listener.settimeout(1.0)
+    try:
+        while len(received) < len(expected):
+            received += decode_packet(listener.recv(65536))
+    except socket.timeout:
+        pass
+    mapper.close()
+    listener.close()
+
+    emit_times = np.array(mapper.stats.samples) * 1000.0
+    p99 = float(np.percentile(emit_times, 99)) if len(emit_times) else 0.0
+    values_ok = len(received) == len(expected) and all(
+        a == b and abs(x - y) < 1e-6 for (a, x), (b, y) in zip(expected, received))
+    print(f"{len(recorded)} Frames, {len(expected)} Werte gesendet, {len(received)} empfangen")
+    print(f"Sendezeit pro Frame: p50 {np.percentile(emit_times, 50):.4f} ms, p99 {p99:.4f} ms")
+    return values_ok and p99 < budget_ms
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prüft das Layout-Mapping mit aufgezeichneten Erkennungen.")
+    parser.add_argument("layout", help="Layout-Datei (JSON)")
+    parser.add_argument("recording", nargs="?", default=None,
+                        help="Aufgezeichnete Erkennungen (JSON); ohne Angabe synthetische Erkennungen")
+    parser.add_argument("--frames", type=int, default=120, help="Frames der synthetischen Erkennungen")
+    parser.add_argument("--budget_ms", type=float, default=1.0, help="Zeitbudget pro Frame (Standard: 1 ms)")
+    args = parser.parse_args()
+
+    if args.recording:
+        recorded = load_recorded_detections(args.recording)
+    else:
+        recorded = synthetic_detections(load_layout(args.layout)[0], args.frames)
+    ok = check_against_listener(args.layout, recorded, args.budget_ms)
+    print("OK" if ok else "FEHLER")
+    exit(0 if ok else 1)
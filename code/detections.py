@@ -0,0 +1,105 @@
+"""
+Gemeinsame Darstellung von Marker-Erkennungen.
+
+Alle Backends (Ultralytics .pt, ONNX Runtime) liefern ein Detections-Objekt,
+damit die Live-Schleife das Backend austauschen kann, ohne den Rest zu ändern.
+Ultralytics bzw. ONNX Runtime werden erst beim Laden eines Modells
+importiert; warmup() führt die erste (langsame) Inferenz vorab aus, z.B. im
+Hintergrund, während Kamera und Fenster starten.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+MARKER_CLASSES = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+
+
+@dataclass
+class Detections:
+    """Erkennungen eines Frames in Pixelkoordinaten des Originalbildes."""
+    xyxy: np.ndarray  # (N, 4) float32: x1, y1, x2, y2
+    conf: np.ndarray  # (N,) float32
+    cls: np.ndarray   # (N,) int32
+    ids: Optional[np.ndarray] = None  # (N,) int32 Tracker-IDs, falls vorhanden
+
+    def __len__(self) -> int:
+        return len(self.xyxy)
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32))
+
+    @classmethod
+    def from_ultralytics(cls, result) -> "Detections":
+        """Konvertiert ein ultralytics Results-Objekt."""
+        boxes = result.boxes
+        ids = boxes.id.cpu().numpy().astype(np.int32) if boxes.id is not None else None
+        return cls(
+            boxes.xyxy.cpu().numpy().astype(np.float32),
+            boxes.conf.cpu().numpy().astype(np.float32),
+            boxes.cls.cpu().numpy().astype(np.int32),
+            ids,
+        )
+
+
+def draw_detections(image: np.ndarray, detections: Detections, names: Dict[int, str]) -> np.ndarray:
+    """Zeichnet Boxen und Beschriftungen direkt in image und gibt es zurück."""
+    for i in range(len(detections)):
+        x1, y1, x2, y2 = detections.xyxy[i].astype(int)
+        class_id = int(detections.cls[i])
+        color = ((class_id * 67) % 256, (class_id * 131) % 256, (class_id * 199 + 80) % 256)
+        label = f"{names.get(class_id, class_id)} {detections.conf[i]:.2f}"
+        if detections.ids is not None:
+            label = f"id:{detections.ids[i]} " + label
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, 2)
+        cv2.putText(image, label, (x1, max(y1 - 5, 10)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+    return image
+
+
+class UltralyticsDetector:
+    """Marker-Erkennung über ein Ultralytics-Modell (.pt)."""
+
+    def __init__(self, model_path: str, imgsz: int = 640, conf: float = 0.1, track: bool = True):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.imgsz = imgsz
+        self.conf = conf
+        self.track = track
+
+    def detect(self, frame: np.ndarray) -> Detections:
+        if self.track:
+            results = self.model.track(frame, classes=MARKER_CLASSES, conf=self.conf, imgsz=self.imgsz,
+                                       verbose=False, persist=True)
+        else:
+            results = self.model.predict(frame, classes=MARKER_CLASSES, conf=self.conf, imgsz=self.imgsz,
+                                         verbose=False)
+        return Detections.from_ultralytics(results[0])
+
+    def warmup(self, shape=(480, 640, 3)):
+        """Erste Inferenz auf einem schwarzen Bild (ohne Tracking, der Tracker-Zustand bleibt leer)."""
+        self.model.predict(np.zeros(shape, np.uint8), classes=MARKER_CLASSES, conf=self.conf, imgsz=self.imgsz,
+                           verbose=False)
+
+    def detect_batch(self, frames) -> List[Detections]:
+        """Erkennt Marker in mehreren Frames mit einem gebündelten predict-Aufruf (ohne Tracking)."""
+        results = self.model.predict(list(frames), classes=MARKER_CLASSES, conf=self.conf, imgsz=self.imgsz,
+                                     verbose=False)
+        return [Detections.from_ultralytics(result) for result in results]
+
+
+def load_detector(model_path: str, imgsz: int = 640, conf: float = 0.1, track: bool = True):
+    """
+    Lädt das passende Backend anhand der Dateiendung.
+
+    .onnx-Dateien laufen über ONNX Runtime (ohne torch/ultralytics),
+    alles andere über Ultralytics.
+    """
+    if model_path.lower().endswith(".onnx"):
+        from onnx_detector import OnnxMarkerDetector
+
+        return OnnxMarkerDetector(model_path, imgsz=imgsz, conf=conf)
+    return UltralyticsDetector(model_path, imgsz=imgsz, conf=conf, track=track)
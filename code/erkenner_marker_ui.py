@@ -1,5 +1,14 @@
+import os
+
 from ultralytics import YOLO
 
+from image_pack import packed_trainer
+
+# Pre-decoded training images (python image_pack.py <split folder> packs/<split> --imgsz 640);
+# without them the trainer reads the JPEG folders from marker_ui.yaml every epoch
+PACKS = {"train": "packs/train", "val": "packs/val"}
+use_packs = all(os.path.exists(prefix + ".images.npy") for prefix in PACKS.values())
+
 # Load a pretrained YOLO11n model
 model = YOLO("yolo11n.pt")
 
@@ -7,8 +16,9 @@ model = YOLO("yolo11n.pt")
 train_results = model.train(
     data="marker_ui.yaml",  # Path to dataset configuration file
     epochs=200,  # Number of training epochs
-    imgsz=640,  # Image size for training
+    imgsz=640,  # Image size for training, must match the packs
     device="mps",  # Device to run on (e.g., 'cpu', 0, [0,1,2,3])
+    trainer=packed_trainer(PACKS) if use_packs else None,
 )
 
 # Evaluate the model's performance on the validation set
@@ -19,5 +29,6 @@ metrics = model.val()
 #results[0].show()  # Display results
 
 # Export the model to ONNX format for deployment
+# (INT8/kleinere Varianten mit Vergleichstabelle: python export_profiles.py)
 path = model.export(format="onnx")  # Returns the path to the exported model
 print (path)
\ No newline at end of file
@@ -0,0 +1,165 @@
+"""
+Exportiert das trainierte Marker-Modell in mehreren Varianten und vergleicht sie.
+
+Für jede Kombination aus Eingabegröße (z.B. 640/480/320) und Präzision
+(fp32, int8-dynamic, int8-static) wird ein ONNX-Modell erzeugt. Anschließend
+werden mAP auf dem Validierungs-Split (gesamt und pro Klasse) und die
+CPU-Latenz über ONNX Runtime gemessen und als Tabelle geschrieben.
+"""
+import argparse
+import csv
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+from onnx_detector import Letterbox, OnnxMarkerDetector, benchmark
+from frame_source import IMAGE_EXTENSIONS
+
+PRECISIONS = ("fp32", "int8-dynamic", "int8-static")
+
+
+def validation_images(data_yaml: str):
+    """Gibt die Bildpfade des Validierungs-Splits aus der Datensatz-Konfiguration zurück."""
+    from ultralytics.data.utils import check_det_dataset
+
+    val = check_det_dataset(data_yaml)["val"]
+    paths = []
+    for entry in (val if isinstance(val, list) else [val]):
+        if os.path.isdir(entry):
+            paths += [os.path.join(entry, f) for f in sorted(os.listdir(entry))
+                      if f.lower().endswith(IMAGE_EXTENSIONS)]
+        elif entry.endswith(".txt"):
+            with open(entry) as f:
+                paths += [line.strip() for line in f if line.strip()]
+    return paths
+
+
+class ValidationCalibrationReader:
+    """Liefert letterbox-skalierte Validierungsbilder als Kalibrierdaten für quantize_static."""
+
+    def __init__(self, input_name: str, image_paths, imgsz: int):
+        self.input_name = input_name
+        self.image_paths = iter(image_paths)
+        self.letterbox = Letterbox(imgsz, imgsz)
+
+    def get_next(self):
+        for path in self.image_paths:
+            image = cv2.imread(path)
+            if image is not None:
+                return {self.input_name: self.letterbox(image).copy()}
+        return None
+
+
+def export_fp32(weights: str, imgsz: int, output_dir: str) -> str:
+    """Exportiert das Modell mit fester Eingabegröße nach ONNX (FP32)."""
+    from ultralytics import YOLO
+
+    exported = YOLO(weights).export(format="onnx", imgsz=imgsz, simplify=True)
+    target = os.path.join(output_dir, f"marker_{imgsz}_fp32.onnx")
+    shutil.move(exported, target)
+    return target
+
+
+def quantize(fp32_path: str, precision: str, imgsz: int, calibration_images) -> str:
+    """Erzeugt aus einem FP32-Modell eine dynamisch oder statisch quantisierte INT8-Variante."""
+    import onnxruntime as ort
+    from onnxruntime.quantization import (QuantFormat, QuantType, quant_pre_process,
+                                          quantize_dynamic, quantize_static)
+
+    target = fp32_path.replace("_fp32.onnx", f"_{precision}.onnx")
+    prepared = fp32_path.replace("_fp32.onnx", "_prep.onnx")
+    quant_pre_process(fp32_path, prepared)
+    if precision == "int8-dynamic":
+        quantize_dynamic(prepared, target, weight_type=QuantType.QUInt8)
+    else:
+        input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        reader = ValidationCalibrationReader(input_name, calibration_images, imgsz)
+        quantize_static(prepared, target, reader, quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    os.remove(prepared)
+    _copy_metadata(fp32_path, target)
+    return target
+
+
+def _copy_metadata(source: str, target: str):
+    """Überträgt die Ultralytics-Metadaten (Klassennamen, imgsz, ...) auf das quantisierte Modell."""
+    import onnx
+
+    model = onnx.load(target)
+    source_props = onnx.load(source, load_external_data=False).metadata_props
+    del model.metadata_props[:]
+    model.metadata_props.extend(source_props)
+    onnx.save(model, target)
+
+
+def evaluate(model_path: str, data_yaml: str, imgsz: int, frames):
+    """Misst mAP (gesamt und schlechteste Klasse) und die CPU-Latenz eines ONNX-Modells."""
+    from ultralytics import YOLO
+
+    metrics = YOLO(model_path, task="detect").val(data=data_yaml, imgsz=imgsz, batch=1,
+                                                  device="cpu", verbose=False, plots=False)
+    per_class_ap50 = np.asarray(metrics.box.ap50)
+    timing = benchmark(OnnxMarkerDetector(model_path, imgsz=imgsz), frames)
+    return {
+        "map50": float(metrics.box.map50),
+        "map50_95": float(metrics.box.map),
+        "min_class_ap50": float(per_class_ap50.min()) if per_class_ap50.size else 0.0,
+        "classes_detected": int((per_class_ap50 > 0).sum()),
+        "mean_ms": timing["mean_ms"],
+        "p95_ms": timing["p95_ms"],
+        "size_mb": os.path.getsize(model_path) / 1e6,
+    }
+
+
+def write_report(rows, output_dir: str):
+    """Schreibt die Vergleichstabelle als CSV und als Markdown."""
+    columns = ["model", "imgsz", "precision", "map50", "map50_95", "min_class_ap50",
+               "classes_detected", "mean_ms", "p95_ms", "size_mb"]
+    with open(os.path.join(output_dir, "report.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    lines = ["| " + " | ".join(columns) + " |", "|" + "---|" * len(columns)]
+    for row in sorted(rows, key=lambda r: r["mean_ms"]):
+        lines.append("| " + " | ".join(f"{row[c]:.3f}" if isinstance(row[c], float) else str(row[c])
+                                       for c in columns) + " |")
+    table = "\n".join(lines)
+    with open(os.path.join(output_dir, "report.md"), "w") as f:
+        f.write(table + "\n")
+    print(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exportiert FP32/INT8-Varianten in mehreren Größen und vergleicht sie.")
+    parser.add_argument("--weights", default="marker_ui_best.pt", help="Trainiertes .pt-Modell")
+    parser.add_argument("--data", default="marker_ui.yaml", help="Datensatz-Konfiguration")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[640, 480, 320], help="Eingabegrößen")
+    parser.add_argument("--precisions", nargs="+", default=list(PRECISIONS), choices=PRECISIONS)
+    parser.add_argument("--calibration", type=int, default=200,
+                        help="Anzahl Validierungsbilder für die statische Kalibrierung")
+    parser.add_argument("--latency-frames", type=int, default=100,
+                        help="Anzahl Validierungsbilder für die Latenzmessung")
+    parser.add_argument("--output_dir", default="export_profiles", help="Zielordner für Modelle und Bericht")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    images = validation_images(args.data)
+    if not images:
+        print(f"Fehler: Keine Validierungsbilder in '{args.data}' gefunden.")
+        exit(1)
+    frames = [image for image in (cv2.imread(p) for p in images[:args.latency_frames]) if image is not None]
+
+    rows = []
+    for imgsz in args.sizes:
+        fp32_path = export_fp32(args.weights, imgsz, args.output_dir)
+        for precision in args.precisions:
+            model_path = fp32_path if precision == "fp32" else quantize(
+                fp32_path, precision, imgsz, images[:args.calibration])
+            print(f"Bewerte {model_path} ...")
+            rows.append({"model": os.path.basename(model_path), "imgsz": imgsz, "precision": precision,
+                         **evaluate(model_path, args.data, imgsz, frames)})
+
+    write_report(rows, args.output_dir)
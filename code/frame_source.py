@@ -0,0 +1,338 @@
+"""
+Gemeinsame Bildquellen für alle Einstiegspunkte.
+
+Alle Quellen haben die Schnittstelle von cv2.VideoCapture (read()/isOpened()/
+release()), sodass Pipeline, take_photos.py, track_hands.py und test_live_cam.py
+sie austauschbar nutzen können:
+
+  - CameraSource: Kamera oder Stream. Auflösung, Bildrate und Pixelformat
+    (MJPG oder YUYV) werden vor dem ersten Frame ausgehandelt; negotiated
+    enthält die Werte, die der Treiber tatsächlich eingestellt hat. Vor jedem
+    Frame werden veraltete Frames aus dem Treiberpuffer per grab() verworfen.
+  - CaptureSource: Videodatei (jeder Frame, keine Verwerfung).
+  - ImageFolderSource: Bilder eines Ordners, sortiert.
+  - SyntheticSource: erzeugte Testbilder, für Tests ohne Hardware.
+
+Kamera, Videodatei und synthetische Quelle dekodieren in einen Ring
+vorab angelegter NumPy-Puffer (retrieve(image=...)), statt pro Frame ein neues
+Array anzulegen. Ein Frame bleibt gültig, bis ring weitere Frames gelesen
+wurden. Wer Frames länger aufhebt, meldet sie mit hold_frame() an und gibt sie
+mit free_frame() wieder frei; solange wird ihr Puffer nicht neu beschrieben
+(sind alle Puffer belegt, bekommt der nächste Frame ein eigenes Array). Die
+Pipeline tut das für jeden Frame, bis er gezeichnet oder verworfen ist.
+Alternativ kopieren oder die Quelle mit ring=0 öffnen (neues Array pro Frame).
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# Frames, die gerade weiterverarbeitet werden, sind über hold_frame() geschützt;
+# die Ringgröße bestimmt nur, wie viele Frames ohne neues Array auskommen
+DEFAULT_RING = 8
+
+
+def _address(frame: np.ndarray) -> int:
+    return frame.__array_interface__["data"][0]
+
+
+class FrameRing:
+    """
+    Feste Anzahl vorab angelegter Bildpuffer, die reihum vergeben werden.
+
+    Mit hold() angemeldete Puffer werden übersprungen, bis free() sie freigibt.
+    """
+
+    def __init__(self, slots: int = DEFAULT_RING):
+        self.slots = slots
+        self.shape: Optional[Tuple[int, ...]] = None
+        self._buffers = []
+        self._index: Dict[int, int] = {}  # Adresse eines Puffers -> Position im Ring
+        self._held: Dict[int, int] = {}   # Position -> Anzahl offener hold()
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def next(self, shape: Optional[Tuple[int, ...]]) -> Optional[np.ndarray]:
+        """
+        Gibt den nächsten freien Puffer der Form shape zurück (None ohne Ring,
+        bei unbekannter Form oder wenn alle Puffer gehalten werden).
+        """
+        if self.slots <= 0 or shape is None:
+            return None
+        with self._lock:
+            if shape != self.shape:
+                self.shape = shape
+                self._buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.slots)]
+                self._index = {_address(buffer): i for i, buffer in enumerate(self._buffers)}
+                self._held = {}
+            for _ in range(self.slots):
+                i = self._next
+                self._next = (self._next + 1) % self.slots
+                if i not in self._held:
+                    return self._buffers[i]
+        return None
+
+    def hold(self, frame: Optional[np.ndarray]):
+        """Schützt den Puffer von frame vor dem Überschreiben (Frames außerhalb des Rings: nichts zu tun)."""
+        if frame is None:
+            return
+        with self._lock:
+            i = self._index.get(_address(frame))
+            if i is not None:
+                self._held[i] = self._held.get(i, 0) + 1
+
+    def free(self, frame: Optional[np.ndarray]):
+        """Gibt einen mit hold() geschützten Puffer wieder frei."""
+        if frame is None:
+            return
+        with self._lock:
+            i = self._index.get(_address(frame))
+            if i in self._held:
+                self._held[i] -= 1
+                if not self._held[i]:
+                    del self._held[i]
+
+
+def fourcc_to_str(value: float) -> str:
+    code = int(value)
+    return "".join(chr((code >> (8 * i)) & 0xFF) for i in range(4)).strip("\0")
+
+
+class CaptureSource:
+    """
+    cv2.VideoCapture, deren Frames per grab()/retrieve() in einen Ring vorab
+    angelegter Puffer dekodiert werden (für Videodateien unverändert jeder Frame).
+
+    Args:
+        capture (cv2.VideoCapture): Geöffnete Quelle.
+        ring (int): Anzahl Puffer im Ring; 0 legt pro Frame ein neues Array an.
+    """
+
+    def __init__(self, capture: cv2.VideoCapture, ring: int = DEFAULT_RING):
+        self.capture = capture
+        self.ring = FrameRing(ring)
+        self.frames = 0
+        self.dropped = 0
+
+    def isOpened(self) -> bool:
+        return self.capture.isOpened()
+
+    def _grab(self) -> bool:
+        return self.capture.grab()
+
+    def read(self):
+        if not self._grab():
+            return False, None
+        out = self.ring.next(self.ring.shape)
+        success, frame = self.capture.retrieve(out)
+        if success and (out is None or frame.shape != out.shape):
+            # Erster Frame oder geänderte Größe: Ring auf die Frame-Form einrichten
+            out = self.ring.next(frame.shape)
+            if out is not None:
+                np.copyto(out, frame)
+                frame = out
+        if success:
+            self.frames += 1
+        return success, frame
+
+    def hold_frame(self, frame: np.ndarray):
+        self.ring.hold(frame)
+
+    def free_frame(self, frame: np.ndarray):
+        self.ring.free(frame)
+
+    def get(self, prop: int) -> float:
+        return self.capture.get(prop)
+
+    def set(self, prop: int, value: float) -> bool:
+        return self.capture.set(prop, value)
+
+    def release(self):
+        self.capture.release()
+
+
+class CameraSource(CaptureSource):
+    """
+    Kamera oder Netzwerk-Stream mit ausgehandeltem Format.
+
+    Die Eigenschaften werden in der Reihenfolge gesetzt, die V4L2/DirectShow
+    erwarten: erst das Pixelformat (MJPG schaltet bei USB-2-Kameras die hohen
+    Auflösungen mit voller Bildrate frei, YUYV spart das Dekodieren), dann
+    Auflösung, dann Bildrate. Danach wird zurückgelesen, was tatsächlich gilt.
+
+    Args:
+        device (int or str): Kamera-Index oder Stream-URL.
+        width, height (int): Gewünschte Auflösung (None: Treiberstandard).
+        fps (float): Gewünschte Bildrate (None: Treiberstandard).
+        fourcc (str): Pixelformat, z.B. "MJPG" oder "YUYV" (None: Treiberstandard).
+        buffer_size (int): Frames im Treiberpuffer (CAP_PROP_BUFFERSIZE, nicht jedes Backend).
+        ring (int): Anzahl Puffer im Ring (siehe CaptureSource).
+        drain (bool): Vor jedem Frame veraltete Frames aus dem Treiberpuffer verwerfen.
+        max_drain (int): Höchstens so viele Frames pro read() verwerfen.
+    """
+
+    def __init__(self, device, width: Optional[int] = None, height: Optional[int] = None,
+                 fps: Optional[float] = None, fourcc: Optional[str] = None, buffer_size: int = 1,
+                 ring: int = DEFAULT_RING, drain: bool = True, max_drain: int = 4):
+        super().__init__(cv2.VideoCapture(device), ring)
+        self.device = device
+        self.drain = drain
+        self.max_drain = max_drain
+        self.requested = {"width": width, "height": height, "fps": fps, "fourcc": fourcc}
+        self.negotiated: Dict[str, object] = {}
+        if self.capture.isOpened():
+            self.negotiate(width, height, fps, fourcc, buffer_size)
+
+    def negotiate(self, width=None, height=None, fps=None, fourcc=None, buffer_size=1) -> Dict[str, object]:
+        """Setzt Format, Auflösung und Bildrate und gibt die tatsächlich eingestellten Werte zurück."""
+        if fourcc:
+            self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc.upper()))
+        if width:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.capture.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size:
+            self.capture.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+        self.negotiated = {
+            "width": int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            "fps": self.capture.get(cv2.CAP_PROP_FPS),
+            "fourcc": fourcc_to_str(self.capture.get(cv2.CAP_PROP_FOURCC)),
+        }
+        mismatch = [f"{key} {wanted} -> {self.negotiated[key]}" for key, wanted in
+                    (("width", width), ("height", height), ("fps", fps), ("fourcc", fourcc and fourcc.upper()))
+                    if wanted and self.negotiated[key] != wanted]
+        if mismatch:
+            print(f"Kamera {self.device}: Format nicht wie angefordert ({', '.join(mismatch)})")
+        if self.negotiated["width"] and self.negotiated["height"]:
+            # Ring schon vor dem ersten Frame anlegen
+            self.ring.next((self.negotiated["height"], self.negotiated["width"], 3))
+        return self.negotiated
+
+    def _grab(self) -> bool:
+        if not self.drain:
+            return self.capture.grab()
+        # Ein grab(), das sofort zurückkommt, hat einen gepufferten (alten) Frame geholt;
+        # erst ein grab(), das auf die Kamera warten musste, liefert einen frischen.
+        fps = self.negotiated.get("fps") or 30.0
+        fresh_after = 0.5 / fps
+        for attempt in range(self.max_drain + 1):
+            start = time.perf_counter()
+            if not self.capture.grab():
+                return False
+            if time.perf_counter() - start >= fresh_after:
+                break
+            if attempt < self.max_drain:
+                self.dropped += 1
+        return True
+
+
+class ImageFolderSource:
+    """Liefert die Bilder eines Ordners (sortiert) wie eine cv2.VideoCapture."""
+
+    def __init__(self, folder: str):
+        self.files = sorted(
+            os.path.join(folder, f) for f in os.listdir(folder)
+            if f.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.position = 0
+
+    def isOpened(self) -> bool:
+        return True
+
+    def read(self):
+        while self.position < len(self.files):
+            image = cv2.imread(self.files[self.position])
+            self.position += 1
+            if image is not None:
+                return True, image
+        return False, None
+
+    def release(self):
+        self.position = len(self.files)
+
+
+class SyntheticSource:
+    """Erzeugt Testbilder mit Rauschen (für Tests und Durchsatzmessungen ohne Kamera)."""
+
+    def __init__(self, width=1280, height=720, fps=None, frames=None, ring=DEFAULT_RING):
+        rng = np.random.default_rng(0)
+        self.base = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+        self.fps = fps
+        self.frames = frames
+        self.index = 0
+        self.ring = FrameRing(ring)
+        self._next = time.perf_counter()
+
+    def isOpened(self):
+        return self.frames is None or self.index < self.frames
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+        if self.fps:
+            self._next += 1.0 / self.fps
+            delay = self._next - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        frame = self.ring.next(self.base.shape)
+        if frame is None:
+            frame = np.empty_like(self.base)
+        # Wie np.roll(base, shift, axis=1), aber direkt in den Puffer
+        width = self.base.shape[1]
+        shift = (self.index * 8) % width
+        frame[:, shift:] = self.base[:, :width - shift]
+        frame[:, :shift] = self.base[:, width - shift:]
+        cv2.putText(frame, str(self.index), (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        self.index += 1
+        return True, frame
+
+    def hold_frame(self, frame: np.ndarray):
+        self.ring.hold(frame)
+
+    def free_frame(self, frame: np.ndarray):
+        self.ring.free(frame)
+
+    def release(self):
+        self.frames = self.index
+
+
+def is_live_source(spec) -> bool:
+    """True für Kamera-Indizes und Netzwerk-Streams, False für Dateien/Ordner."""
+    spec = str(spec)
+    return spec.isdigit() or "://" in spec
+
+
+def open_source(spec, width: Optional[int] = None, height: Optional[int] = None, fps: Optional[float] = None,
+                fourcc: Optional[str] = None, ring: int = DEFAULT_RING, drain: bool = True):
+    """
+    Öffnet eine Bildquelle.
+
+    Args:
+        spec (int or str): Kamera-Index (z.B. 0 oder "0"), Pfad zu einer
+                           Videodatei, Stream-URL, Pfad zu einem Bildordner
+                           oder "synthetic".
+        width, height (int): Gewünschte Auflösung (Kamera, synthetische Quelle).
+        fps (float): Gewünschte Bildrate (Kamera; synthetische Quelle wird darauf gebremst).
+        fourcc (str): Pixelformat der Kamera, z.B. "MJPG" oder "YUYV".
+        ring (int): Anzahl wiederverwendeter Frame-Puffer; 0 legt pro Frame ein neues Array an.
+        drain (bool): Bei Live-Quellen veraltete gepufferte Frames verwerfen.
+
+    Returns:
+        Ein Objekt mit read()/isOpened()/release() wie cv2.VideoCapture.
+    """
+    if str(spec) == "synthetic":
+        return SyntheticSource(width or 1280, height or 720, fps=fps, ring=ring)
+    if is_live_source(spec):
+        device = int(spec) if str(spec).isdigit() else spec
+        return CameraSource(device, width, height, fps, fourcc, ring=ring, drain=drain)
+    if os.path.isdir(spec):
+        return ImageFolderSource(spec)
+    return CaptureSource(cv2.VideoCapture(spec), ring)
@@ -0,0 +1,361 @@
+"""
+Marker- und Hand-Tracking aus einer gemeinsamen Kameraaufnahme.
+
+track_hands.py und test_live_cam.py öffnen jeweils eine eigene Aufnahme
+derselben Kamera, konvertieren selbst und lassen ihr Modell mit voller Rate
+laufen. Hier wird jeder Frame einmal gelesen und einmal konvertiert (Entzerren
+bzw. Kopieren und BGR->RGB in die Puffer des Hand-Trackers); beide Modelle
+arbeiten auf denselben Puffern, die Koordinaten passen also zueinander. Ein
+Scheduler teilt die Rechenzeit auf:
+
+  - Landmarken laufen jeden Frame, solange eine Hand im Bild ist, sonst nur
+    jeden search_every-ten Frame, um neue Hände zu finden.
+  - Die Marker-Erkennung läuft, wenn sich der von Händen verdeckte Bereich
+    ändert (Hand erscheint, verschwindet oder bewegt sich deutlich), und
+    spätestens alle refresh Sekunden.
+  - Zusammen dürfen beide Modelle höchstens budget Sekunden Rechenzeit pro
+    Sekunde verbrauchen (Token-Bucket über die gemessene Laufzeit der
+    Aufrufe). Landmarken haben Vorrang, die Marker-Erkennung wartet, bis ihre
+    geschätzte Laufzeit ins Budget passt.
+
+Die Ergebnisse kommen als ein zeitgestempelter Ereignisstrom (FusedEvent mit
+kind "hands", "gesture" oder "markers") in Frame-Reihenfolge. report() nennt
+die erreichten Raten beider Modelle unter dem Budget.
+
+  python fused_tracker.py --model marker_ui_best.onnx --hand-model hand_landmarker.task --budget 0.5
+"""
+import argparse
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detections import Detections
+from gestures import GestureEngine
+from metrics import StageStats
+from pipeline import FramePacket
+
+
+@dataclass
+class FusedEvent:
+    """Ein Ergebnis im gemeinsamen Ereignisstrom."""
+    timestamp: float  # Capture-Zeitstempel des Frames (time.perf_counter())
+    kind: str         # hands, gesture, markers
+    data: Any         # (H, 21, 3) Landmarken, GestureEvent bzw. Detections
+
+
+@dataclass
+class FusedResult:
+    """Stand nach einem Frame; hands/detections sind die jeweils neuesten Ergebnisse."""
+    timestamp: float
+    image: np.ndarray        # konvertiertes BGR-Bild (Pufferslot des Hand-Trackers)
+    hands: np.ndarray        # (H, 21, 3)
+    detections: Detections
+    ran_hands: bool
+    ran_markers: bool
+    events: List[FusedEvent]
+
+
+def hand_region(hands: np.ndarray, pad: int = 24) -> Optional[Tuple[float, float, float, float]]:
+    """Umschließendes Rechteck aller Hände (x1, y1, x2, y2) plus pad Pixel, None ohne Hand."""
+    if len(hands) == 0:
+        return None
+    points = hands[..., :2].reshape(-1, 2)
+    x1, y1 = points.min(axis=0) - pad
+    x2, y2 = points.max(axis=0) + pad
+    return float(x1), float(y1), float(x2), float(y2)
+
+
+def region_iou(a, b) -> float:
+    """IoU zweier Rechtecke; 1.0, wenn beide None sind."""
+    if a is None or b is None:
+        return 1.0 if a is b else 0.0
+    w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class _ModelSchedule:
+    """Läufe, Verschiebungen und Laufzeiten eines Modells."""
+
+    def __init__(self, name: str):
+        self.stats = StageStats(name)
+        self.runs = 0
+        self.deferred = 0
+        self.estimate = 0.0  # gleitender Mittelwert der Laufzeit in Sekunden
+
+    def run(self, call: Callable[[], Any]) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        result = call()
+        cost = time.perf_counter() - start
+        self.stats.add(cost)
+        self.runs += 1
+        self.estimate = cost if self.runs == 1 else 0.8 * self.estimate + 0.2 * cost
+        return result, cost
+
+
+class FusedScheduler:
+    """
+    Plant Landmarken und Marker-Erkennung pro Frame unter einem Rechenzeit-Budget.
+
+    Args:
+        tracker: Blockierender Hand-Tracker (VideoHandTracker oder LegacyHandTracker),
+                 dessen on_result noch innerhalb von landmark() aufgerufen wird.
+        detect (callable): detect(bgr) -> Detections, z.B. Detektor plus IouTracker.
+        budget (float): Rechenzeit beider Modelle in Sekunden pro Sekunde (1.0 = ein Kern).
+        burst (float): Höchstens so viel ungenutztes Budget (Sekunden) wird angespart.
+        search_every (int): Ohne Hand nur jeden n-ten Frame nach Händen suchen.
+        refresh (float): Marker spätestens nach so vielen Sekunden neu erkennen.
+        min_iou (float): Unter dieser Überlappung gilt der Handbereich als verändert.
+        pad (int): Rand in Pixeln um die Hände für den verdeckten Bereich.
+        engine (GestureEngine): Für Gesten-Ereignisse (Standard: neue GestureEngine).
+        on_event (callable): on_event(FusedEvent), im Thread, der step() aufruft.
+    """
+
+    def __init__(self, tracker, detect: Callable[[np.ndarray], Detections], budget: float = 1.0,
+                 burst: float = 0.1, search_every: int = 3, refresh: float = 1.0, min_iou: float = 0.7,
+                 pad: int = 24, engine: Optional[GestureEngine] = None,
+                 on_event: Optional[Callable[[FusedEvent], None]] = None):
+        self.tracker = tracker
+        self.detect = detect
+        self.budget = budget
+        self.burst = burst
+        self.search_every = max(1, search_every)
+        self.refresh = refresh
+        self.min_iou = min_iou
+        self.pad = pad
+        self.engine = engine if engine is not None else GestureEngine()
+        self.on_event = on_event
+        self.hands_model = _ModelSchedule("landmarks")
+        self.markers_model = _ModelSchedule("markers")
+        self.convert_stats = StageStats("convert")
+        self.triggers = {"region": 0, "refresh": 0}
+        self.hands = np.zeros((0, 21, 3), np.float32)
+        self.detections = Detections.empty()
+        self.frames = 0
+        self.tokens = burst
+        self._hand_result = None
+        self._pending: Optional[str] = None
+        self._marker_region = None
+        self._marker_time = float("-inf")
+        self._last_refill: Optional[float] = None
+        self._started: Optional[float] = None
+        self._finished = 0.0
+        tracker.on_result = self._on_hands
+
+    def _on_hands(self, result):
+        self._hand_result = result
+
+    def _refill(self, now: float):
+        if self._last_refill is not None:
+            # Eine Marker-Erkennung, die länger als burst dauert, muss trotzdem irgendwann passen
+            cap = max(self.burst, self.markers_model.estimate)
+            self.tokens = min(cap, self.tokens + (now - self._last_refill) * self.budget)
+        self._last_refill = now
+
+    def step(self, packet: FramePacket) -> FusedResult:
+        """Verarbeitet einen Frame: einmal konvertieren, dann die fälligen Modelle im Budget."""
+        now = time.perf_counter()
+        if self._started is None:
+            self._started = now
+        self._refill(now)
+        timestamp = packet.timestamp
+        events: List[FusedEvent] = []
+
+        with self.convert_stats.time():
+            bgr, rgb = self.tracker.buffers.convert(packet.image)
+
+        ran_hands = False
+        if len(self.hands) or self.frames % self.search_every == 0:
+            if self.tokens > 0:
+                self._hand_result = None
+                _, cost = self.hands_model.run(lambda: self.tracker.landmark(rgb, timestamp))
+                self.tokens -= cost
+                ran_hands = True
+                if self._hand_result is not None:
+                    self.hands = self._hand_result.hands
+                events.append(FusedEvent(timestamp, "hands", self.hands))
+                events += [FusedEvent(timestamp, "gesture", e) for e in self.engine.process(timestamp, self.hands)]
+            else:
+                self.hands_model.deferred += 1
+
+        region = hand_region(self.hands, self.pad)
+        if self._pending is None:
+            if region_iou(region, self._marker_region) < self.min_iou:
+                self._pending = "region"
+            elif timestamp - self._marker_time >= self.refresh:
+                self._pending = "refresh"
+        ran_markers = False
+        if self._pending is not None:
+            if self.tokens >= self.markers_model.estimate:
+                self.detections, cost = self.markers_model.run(lambda: self.detect(bgr))
+                self.tokens -= cost
+                ran_markers = True
+                self.triggers[self._pending] += 1
+                self._pending = None
+                self._marker_region = region
+                self._marker_time = timestamp
+                events.append(FusedEvent(timestamp, "markers", self.detections))
+            else:
+                self.markers_model.deferred += 1
+
+        self.frames += 1
+        self._finished = time.perf_counter()
+        if self.on_event:
+            for event in events:
+                self.on_event(event)
+        return FusedResult(timestamp, bgr, self.hands, self.detections, ran_hands, ran_markers, events)
+
+    def report(self) -> Dict[str, Any]:
+        """Erreichte Raten und Laufzeiten beider Modelle und die Auslastung des Budgets."""
+        elapsed = self._finished - self._started if self._started is not None else 0.0
+        result = {"frames": self.frames, "elapsed_s": elapsed, "budget": self.budget,
+                  "fps": self.frames / elapsed if elapsed > 0 else 0.0,
+                  "convert": self.convert_stats.summary()}
+        used = 0.0
+        for name, model in (("hands", self.hands_model), ("markers", self.markers_model)):
+            used += model.stats.total
+            result[name] = {"runs": model.runs, "deferred": model.deferred,
+                            "rate_hz": model.runs / elapsed if elapsed > 0 else 0.0, **model.stats.summary()}
+        result["markers"]["triggers"] = dict(self.triggers)
+        result["used"] = used / elapsed if elapsed > 0 else 0.0
+        return result
+
+
+def format_fused_report(report: Dict[str, Any]) -> str:
+    lines = [f"{report['frames']} Frames in {report['elapsed_s']:.1f} s ({report['fps']:.1f} FPS), "
+             f"Budget {report['budget']:.2f}, genutzt {report['used']:.2f} s/s"]
+    for name in ("hands", "markers"):
+        r = report[name]
+        timing = f", Laufzeit p50 {r['p50_ms']:.1f} ms, p95 {r['p95_ms']:.1f} ms" if r.get("count") else ""
+        lines.append(f"{name:<8} {r['runs']:>6} Läufe ({r['rate_hz']:.1f} Hz), "
+                     f"{r['deferred']} wegen Budget verschoben{timing}")
+    triggers = report["markers"]["triggers"]
+    lines.append(f"Marker-Anlässe: {triggers['region']} Handbereich geändert, {triggers['refresh']} Auffrischung")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Marker- und Hand-Tracking aus einer Kameraaufnahme.")
+    parser.add_argument("--source", default="0",
+                        help="Kamera-Index, Videodatei, Stream-URL oder Bildordner (Standard: 0)")
+    parser.add_argument("--model", default="marker_ui_best.pt",
+                        help="Marker-Modell (.pt über Ultralytics, .onnx über ONNX Runtime)")
+    parser.add_argument("--hand-model", default="hand_landmarker.task",
+                        help="MediaPipe-HandLandmarker (.task); ohne Datei die Solutions-API")
+    parser.add_argument("--budget", type=float, default=1.0,
+                        help="Rechenzeit beider Modelle in Sekunden pro Sekunde (Standard: 1.0 = ein Kern)")
+    parser.add_argument("--refresh", type=float, default=1.0,
+                        help="Marker spätestens nach so vielen Sekunden neu erkennen (Standard: 1.0)")
+    parser.add_argument("--search-every", type=int, default=3,
+                        help="Ohne Hand nur jeden n-ten Frame nach Händen suchen (Standard: 3)")
+    parser.add_argument("--calibration", default=None,
+                        help="Kalibrierung aus calibration.py: beide Modelle arbeiten auf dem entzerrten Bogen")
+    parser.add_argument("--record", default=None,
+                        help="Landmarken und Erkennungen mit Zeitstempel aufzeichnen (.smcrec)")
+    parser.add_argument("--ui", default=None,
+                        help="Marker als Kreise an die UI senden, z.B. ws://127.0.0.1:8000/ws/circles "
+                             "(benötigt --calibration)")
+    parser.add_argument("--width", type=int, default=None, help="Gewünschte Kamerabreite in Pixeln")
+    parser.add_argument("--height", type=int, default=None, help="Gewünschte Kamerahöhe in Pixeln")
+    parser.add_argument("--fps", type=float, default=None, help="Gewünschte Bildrate")
+    parser.add_argument("--fourcc", choices=("MJPG", "YUYV"), default=None, help="Pixelformat der Kamera")
+    parser.add_argument("--headless", action="store_true", help="Kein Fenster öffnen")
+    parser.add_argument("--max-frames", type=int, default=None, help="Nach dieser Anzahl Frames beenden")
+    args = parser.parse_args()
+    if args.ui and not args.calibration:
+        # Ohne Kalibrierung wären die Koordinaten Kamerapixel statt Pixel des UI-Hintergrunds
+        parser.error("--ui benötigt --calibration")
+
+    from detections import draw_detections, load_detector
+    from frame_source import open_source
+    from hand_tracker import LegacyHandTracker, VideoHandTracker, draw_hand
+    from metrics import mark_first_frame
+    from pipeline import Pipeline, format_report, in_background
+    from tracker import IouTracker
+
+    rectifier = None
+    if args.calibration:
+        from calibration import Calibration, Rectifier
+
+        rectifier = Rectifier(Calibration.load(args.calibration))
+
+    def load_hands():
+        # Ungespiegelt, damit die Marker so aussehen wie in den Trainingsbildern
+        if os.path.exists(args.hand_model):
+            created = VideoHandTracker(args.hand_model, rectifier=rectifier, mirror=False)
+        else:
+            created = LegacyHandTracker(rectifier=rectifier, mirror=False, buffers=4)
+        created.warmup()
+        return created
+
+    def load_markers():
+        created = load_detector(args.model, track=False)
+        created.warmup()
+        return created
+
+    # Beide Modelle laden und aufwärmen sich parallel, während die Kamera öffnet
+    loading_hands = in_background(load_hands, name="load-hands")
+    loading_markers = in_background(load_markers, name="load-markers")
+    source = open_source(args.source, args.width, args.height, args.fps, args.fourcc)
+    hand_tracker = loading_hands.result()
+    detector = loading_markers.result()
+    # Die Marker laufen nicht jeden Frame, daher das IoU-Tracking statt des Ultralytics-Trackers
+    marker_tracker = IouTracker()
+
+    recorder = None
+    if args.record:
+        from recording import Recorder
+
+        recorder = Recorder(args.record)
+    bridge = None
+    if args.ui:
+        from ui_bridge import UiBridge
+
+        # Beide Modelle arbeiten auf dem entzerrten Bogen: die Koordinaten sind schon UI-Koordinaten
+        bridge = UiBridge(args.ui)
+
+    def on_event(event: FusedEvent):
+        if event.kind == "gesture":
+            g = event.data
+            print(f"{g.timestamp:10.3f}  hand {g.hand_id}  {g.kind:<12} {g.value:.2f}")
+        elif event.kind == "markers" and bridge:
+            bridge.update(event.data, event.timestamp)
+
+    scheduler = FusedScheduler(hand_tracker, lambda bgr: marker_tracker.update(detector.detect(bgr)),
+                               budget=args.budget, search_every=args.search_every, refresh=args.refresh,
+                               on_event=on_event)
+
+    def render(packet, result: FusedResult):
+        if recorder:
+            # Der aktuelle Stand pro Frame, wie ihn auch die Gesten-Engine und die UI sehen
+            recorder.add(result.timestamp, hands=result.hands, detections=result.detections)
+        if args.headless:
+            mark_first_frame("fused")
+            return True
+        image = draw_detections(result.image.copy(), result.detections, detector.names)
+        for hand in result.hands:
+            draw_hand(image, hand)
+        region = hand_region(result.hands, scheduler.pad)
+        if region:
+            cv2.rectangle(image, (int(region[0]), int(region[1])), (int(region[2]), int(region[3])), (0, 255, 255), 1)
+        cv2.imshow("Marker und Hände", image)
+        mark_first_frame("fused")
+        return cv2.waitKey(1) != ord('q')
+
+    pipeline = Pipeline(source, scheduler.step, render, max_frames=args.max_frames, with_packet=True)
+    print(format_report(pipeline.run()))
+    print(format_fused_report(scheduler.report()))
+    source.release()
+    hand_tracker.close()
+    if bridge:
+        bridge.close()
+    if recorder:
+        recorder.close()
+    if not args.headless:
+        cv2.destroyAllWindows()
@@ -0,0 +1,261 @@
+"""
+Gesten-Zustandsautomat für mehrere Hände mit Glättung und Entprellung.
+
+Jede erkannte Hand wird über die Frames hinweg einer festen ID zugeordnet und
+ihre Landmarken mit einem One-Euro-Filter geglättet. Übergänge (Griff,
+Gestensteuerung an/aus, Lautstärke-Pose, Mute/Unmute) haben getrennte Ein- und
+Ausschaltschwellen (Hysterese) und müssen eine Mindestdauer anliegen, bevor sie
+als GestureEvent ausgegeben werden. Der Aufwand pro Hand ist konstant.
+
+Als Skript aufgerufen verarbeitet es eine Aufnahme (.smcrec, recording.py)
+offline und gibt den Ereignisstrom aus.
+"""
+import argparse
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from hand_landmarks import analyze
+
+# Referenzpunkte für die Zuordnung: Handgelenk und Basis des Mittelfingers
+_ANCHORS = [0, 9]
+
+
+@dataclass
+class GestureEvent:
+    """Ein Zustandswechsel einer Geste."""
+    timestamp: float
+    hand_id: int
+    kind: str  # hand_found, hand_lost, grip_on, grip_off, control_on, control_off, volume, mute, unmute
+    value: float = 0.0
+
+
+def _alpha(dt: float, cutoff):
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """
+    One-Euro-Filter für ein ganzes Landmarken-Array (z.B. (21, 2)).
+
+    Langsame Bewegungen werden stark geglättet (kein Zittern), schnelle kaum
+    verzögert, da die Grenzfrequenz mit der Geschwindigkeit steigt.
+    """
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.05, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self._x: Optional[np.ndarray] = None
+        self._dx: Optional[np.ndarray] = None
+        self._t = 0.0
+
+    def __call__(self, timestamp: float, x: np.ndarray) -> np.ndarray:
+        if self._x is None:
+            self._x = x.astype(np.float32)
+            self._dx = np.zeros_like(self._x)
+            self._t = timestamp
+            return self._x
+        dt = max(timestamp - self._t, 1e-6)
+        self._t = timestamp
+        a_d = _alpha(dt, self.d_cutoff)
+        self._dx = a_d * (x - self._x) / dt + (1.0 - a_d) * self._dx
+        a = _alpha(dt, self.min_cutoff + self.beta * np.abs(self._dx))
+        self._x = a * x + (1.0 - a) * self._x
+        return self._x
+
+
+class HysteresisSwitch:
+    """
+    Boolescher Zustand mit getrennten Ein-/Ausschaltbedingungen und Mindestdauer.
+
+    Args:
+        hold (float): Sekunden, die eine Bedingung ununterbrochen anliegen muss.
+    """
+
+    def __init__(self, hold: float):
+        self.hold = hold
+        self.state = False
+        self._since: Optional[float] = None
+
+    def update(self, timestamp: float, turn_on: bool, turn_off: bool) -> Optional[bool]:
+        """Gibt den neuen Zustand zurück, wenn er gewechselt hat, sonst None."""
+        wants_change = turn_off if self.state else turn_on
+        if not wants_change:
+            self._since = None
+            return None
+        if self._since is None:
+            self._since = timestamp
+        if timestamp - self._since >= self.hold:
+            self.state = not self.state
+            self._since = None
+            return self.state
+        return None
+
+
+@dataclass
+class HandState:
+    """Zustand einer verfolgten Hand."""
+    id: int
+    filter: OneEuroFilter
+    last_seen: float
+    grip: HysteresisSwitch
+    control: HysteresisSwitch
+    volume_pose: HysteresisSwitch
+    mute_pose: HysteresisSwitch
+    unmute_pose: HysteresisSwitch
+    points: np.ndarray = field(default=None, repr=False)  # geglättete (21, 2)-Landmarken
+    box: np.ndarray = field(default=None, repr=False)
+    area: float = 0.0
+    pinch: float = 0.0
+
+
+class GestureEngine:
+    """
+    Verarbeitet pro Frame die Landmarken aller Hände zu Gesten-Ereignissen.
+
+    Args:
+        hold (float): Mindestdauer in Sekunden für jeden Zustandswechsel.
+        min_cutoff, beta (float): Parameter des One-Euro-Filters (Pixel/Sekunde).
+        match_distance (float): Maximale Verschiebung in Pixeln, um eine Hand wiederzuerkennen.
+        lost_after (float): Sekunden ohne Erkennung, nach denen eine Hand entfernt wird.
+        volume_step (float): Mindeständerung der Lautstärke in Prozent für ein neues Ereignis.
+    """
+
+    # Schwellen wie in track_hands.py, mit Abstand zwischen Ein- und Ausschalten
+    GRIP_ON, GRIP_OFF = 0.2, 0.28
+    AREA_ON, AREA_OFF = (300, 1000), (270, 1100)
+    PINCH_RANGE, VOLUME_RANGE = (50, 200), (0, 100)
+
+    def __init__(self, hold: float = 0.1, min_cutoff: float = 1.0, beta: float = 0.05,
+                 match_distance: float = 120.0, lost_after: float = 0.3, volume_step: float = 2.0):
+        self.hold = hold
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.match_distance = match_distance
+        self.lost_after = lost_after
+        self.volume_step = volume_step
+        self.hands: Dict[int, HandState] = {}
+        self.next_id = 1
+        self.muted = False
+        self.volume = 100.0
+        self._emitted_volume: Optional[float] = None
+
+    def _new_hand(self, timestamp: float) -> HandState:
+        hand = HandState(self.next_id, OneEuroFilter(self.min_cutoff, self.beta), timestamp,
+                         *(HysteresisSwitch(self.hold) for _ in range(5)))
+        self.next_id += 1
+        self.hands[hand.id] = hand
+        return hand
+
+    def _match(self, anchors: np.ndarray) -> List[Optional[HandState]]:
+        """Ordnet die Hände des Frames gierig nach kleinstem Abstand bekannten Händen zu."""
+        known = list(self.hands.values())
+        matched: List[Optional[HandState]] = [None] * len(anchors)
+        if not known or not len(anchors):
+            return matched
+        previous = np.stack([h.points[_ANCHORS].mean(axis=0) for h in known])
+        distances = np.linalg.norm(anchors[:, None] - previous[None], axis=-1)
+        used = set()
+        for flat in np.argsort(distances, axis=None):
+            i, k = divmod(int(flat), len(known))
+            if distances[i, k] > self.match_distance:
+                break
+            if matched[i] is None and k not in used:
+                matched[i] = known[k]
+                used.add(k)
+        return matched
+
+    def process(self, timestamp: float, hands: np.ndarray) -> List[GestureEvent]:
+        """
+        Verarbeitet einen Frame.
+
+        Args:
+            timestamp (float): Aufnahmezeitpunkt in Sekunden.
+            hands (np.ndarray): (H, 21, 2 oder 3) Landmarken in Pixeln, H darf 0 sein.
+
+        Returns:
+            list: Die in diesem Frame ausgelösten GestureEvents.
+        """
+        events: List[GestureEvent] = []
+        hands = np.asarray(hands, dtype=np.float32)
+        hands = hands[..., :2].reshape(-1, 21, 2) if hands.size else np.zeros((0, 21, 2), np.float32)
+        states = self._match(hands[:, _ANCHORS].mean(axis=1))
+        for i, state in enumerate(states):
+            if state is None:
+                state = states[i] = self._new_hand(timestamp)
+                events.append(GestureEvent(timestamp, state.id, "hand_found"))
+            state.points = state.filter(timestamp, hands[i])
+            state.last_seen = timestamp
+
+        for hand_id in [h.id for h in self.hands.values() if timestamp - h.last_seen > self.lost_after]:
+            del self.hands[hand_id]
+            events.append(GestureEvent(timestamp, hand_id, "hand_lost"))
+
+        if not states:
+            return events
+        geometry = analyze(np.stack([s.points for s in states]))
+        for i, state in enumerate(states):
+            self._update_hand(timestamp, state, geometry, i, events)
+        return events
+
+    def _update_hand(self, timestamp: float, state: HandState, geometry, i: int, events: List[GestureEvent]):
+        state.box, state.area, state.pinch = geometry.box[i], float(geometry.area[i]), float(geometry.pinch[i])
+        angle = geometry.thumb_angle[i]
+        if state.grip.update(timestamp, angle < self.GRIP_ON, angle > self.GRIP_OFF) is not None:
+            events.append(GestureEvent(timestamp, state.id, "grip_on" if state.grip.state else "grip_off", angle))
+
+        area = state.area
+        in_range = self.AREA_ON[0] < area < self.AREA_ON[1]
+        out_of_range = not (self.AREA_OFF[0] < area < self.AREA_OFF[1])
+        if state.control.update(timestamp, in_range, out_of_range) is not None:
+            events.append(GestureEvent(timestamp, state.id, "control_on" if state.control.state else "control_off", area))
+        if not state.control.state:
+            return
+
+        index, middle, ring, pinky = geometry.fingers_up[i]
+        volume_pose = index and middle and ring and not pinky
+        mute_pose = pinky and not ring and not middle
+        unmute_pose = not pinky and not ring and not middle
+        state.volume_pose.update(timestamp, volume_pose, not volume_pose)
+        if state.mute_pose.update(timestamp, mute_pose, not mute_pose) and not self.muted:
+            self.muted = True
+            events.append(GestureEvent(timestamp, state.id, "mute"))
+        if state.unmute_pose.update(timestamp, unmute_pose, not unmute_pose) and self.muted:
+            self.muted = False
+            events.append(GestureEvent(timestamp, state.id, "unmute"))
+
+        if state.volume_pose.state:
+            self.volume = float(np.interp(state.pinch, self.PINCH_RANGE, self.VOLUME_RANGE))
+            if self._emitted_volume is None or abs(self.volume - self._emitted_volume) >= self.volume_step:
+                self._emitted_volume = self.volume
+                events.append(GestureEvent(timestamp, state.id, "volume", self.volume))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verarbeitet eine Landmarken-Aufnahme offline zu Gesten-Ereignissen.")
+    parser.add_argument("recording", help="Aufnahme (.smcrec) aus recording.Recorder, z.B. von fused_tracker.py --record")
+    parser.add_argument("--quiet", action="store_true", help="Ereignisse nicht einzeln ausgeben")
+    args = parser.parse_args()
+
+    from recording import RecordingReader
+
+    reader = RecordingReader(args.recording)
+    engine = GestureEngine()
+    frames = total_hands = total_events = 0
+    start = time.perf_counter()
+    for timestamp, hands, _ in reader.frames():
+        events = engine.process(timestamp, hands)
+        frames += 1
+        total_hands += len(hands)
+        total_events += len(events)
+        if not args.quiet:
+            for event in events:
+                print(f"{event.timestamp:10.3f}  Hand {event.hand_id}  {event.kind:<12} {event.value:.2f}")
+    elapsed = time.perf_counter() - start
+    print(f"{frames} Frames, {total_hands} Hände, {total_events} Ereignisse; "
+          f"{1e6 * elapsed / max(1, frames):.1f} µs/Frame, {1e6 * elapsed / max(1, total_hands):.1f} µs/Hand")
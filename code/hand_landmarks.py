@@ -0,0 +1,172 @@
+"""
+Vektorisierte Geometrie für MediaPipe-Handlandmarken.
+
+Jede Hand wird als (21, 2)- oder (21, 3)-Array gehalten, mehrere Hände als
+(H, 21, D). Gelenkwinkel, Daumenwinkel, Pinch-Abstände, Bounding Box/Fläche
+und gestreckte Finger werden für alle Hände in einem Durchgang berechnet.
+Für genau eine Hand ist der NumPy-Aufwand pro Aufruf größer als die Rechnung
+selbst; dann rechnet analyze() mit Python-Floats (gleiche Ergebnisse).
+
+Als Skript aufgerufen vergleicht es die Laufzeit mit der bisherigen
+Einzelberechnung aus track_hands.py (die Übereinstimmung prüft
+tests/test_hand_landmarks.py).
+"""
+import argparse
+import math
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+WRIST = 0
+THUMB_TIP = 4
+INDEX_MCP = 5
+INDEX_TIP = 8
+
+# Fingerspitzen (Zeige- bis kleiner Finger) und die jeweils zwei Punkte tiefer liegenden Gelenke
+FINGER_TIPS = np.array([8, 12, 16, 20])
+FINGER_PIPS = FINGER_TIPS - 2
+
+# Ketten vom Handgelenk zu den Fingerspitzen; daraus ergeben sich 15 Gelenkwinkel
+_CHAINS = [[0, 1, 2, 3, 4], [0, 5, 6, 7, 8], [0, 9, 10, 11, 12], [0, 13, 14, 15, 16], [0, 17, 18, 19, 20]]
+JOINTS = np.array([(c[i - 1], c[i], c[i + 1]) for c in _CHAINS for i in range(1, 4)])
+
+# Verbindungen zum Zeichnen (wie mp.solutions.hands.HAND_CONNECTIONS, ohne MediaPipe-Import)
+HAND_CONNECTIONS = [(0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 6), (6, 7), (7, 8), (5, 9), (9, 10), (10, 11),
+                    (11, 12), (9, 13), (13, 14), (14, 15), (15, 16), (13, 17), (0, 17), (17, 18), (18, 19), (19, 20)]
+
+# Alle benötigten Vektoren (Start, Ende) in einer Tabelle, damit ein einziger Gather reicht:
+# 30 Gelenkvektoren (a->b, b->c je Gelenk), 2 Daumenwinkel-Vektoren, 2 Pinch-Vektoren
+_VECTOR_START = np.concatenate([JOINTS[:, [0, 1]].ravel(), [WRIST, WRIST, THUMB_TIP, THUMB_TIP]])
+_VECTOR_END = np.concatenate([JOINTS[:, [1, 2]].ravel(), [THUMB_TIP, INDEX_MCP, INDEX_MCP, INDEX_TIP]])
+_ANGLE_FIRST = np.arange(0, 32, 2)   # 15 Gelenkwinkel + Daumenwinkel
+_ANGLE_SECOND = _ANGLE_FIRST + 1
+_VECTORS = list(zip(_VECTOR_START.tolist(), _VECTOR_END.tolist()))
+
+# Rückgabewert von calcAngle in track_hands.py für Nullvektoren
+ZERO_VECTOR_ANGLE = 1.552
+
+
+@dataclass
+class HandGeometry:
+    """Geometrische Merkmale für H Hände."""
+    joint_angles: np.ndarray  # (H, 15) Beugewinkel in Radiant (0 = gestreckt)
+    thumb_angle: np.ndarray   # (H,) Winkel zwischen Handgelenk->Daumenspitze und Handgelenk->Zeigefingerbasis
+    pinch: np.ndarray         # (H,) Abstand Daumenspitze - Zeigefingerbasis (Lautstärkegeste)
+    pinch_tip: np.ndarray     # (H,) Abstand Daumenspitze - Zeigefingerspitze
+    box: np.ndarray           # (H, 4) xmin, ymin, xmax, ymax
+    area: np.ndarray          # (H,) Boxfläche / 100 wie in track_hands.py
+    fingers_up: np.ndarray    # (H, 4) bool, Zeige- bis kleiner Finger gestreckt
+
+
+def landmarks_to_array(multi_hand_landmarks, width: int, height: int, dims: int = 2) -> np.ndarray:
+    """
+    Wandelt MediaPipe-Landmarken aller Hände in ein (H, 21, dims)-Array in Pixeln um.
+
+    Akzeptiert die Ergebnisse der Solutions-API (multi_hand_landmarks, je Hand mit
+    .landmark) und der Tasks-API (hand_landmarks, je Hand eine Liste).
+    z wird wie bei MediaPipe üblich mit der Bildbreite skaliert.
+    """
+    scale = np.array([width, height, width][:dims], dtype=np.float32)
+    hands = np.array([[(lm.x, lm.y, lm.z)[:dims] for lm in getattr(hand, "landmark", hand)]
+                      for hand in multi_hand_landmarks],
+                     dtype=np.float32).reshape(-1, 21, dims)
+    return hands * scale
+
+
+def analyze(hands: np.ndarray) -> HandGeometry:
+    """
+    Berechnet alle Merkmale für ein (H, 21, D)-Array (D = 2 oder 3) in einem Durchgang.
+
+    Winkel und Abstände werden wie bisher in track_hands.py in der Bildebene (x, y)
+    berechnet. Nullvektoren ergeben wie bei calcAngle den Winkel ZERO_VECTOR_ANGLE.
+    """
+    hands = np.asarray(hands, dtype=np.float32)
+    if hands.ndim == 2:
+        hands = hands[None]
+    if len(hands) == 1:
+        return _analyze_one(hands[0])
+    xy = hands[..., :2]
+
+    vectors = xy[:, _VECTOR_END] - xy[:, _VECTOR_START]
+    lengths = np.sqrt(np.einsum("hvi,hvi->hv", vectors, vectors))
+    first, second = vectors[:, _ANGLE_FIRST], vectors[:, _ANGLE_SECOND]
+    norms = lengths[:, _ANGLE_FIRST] * lengths[:, _ANGLE_SECOND]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        angles = np.arccos(np.clip(np.einsum("hvi,hvi->hv", first, second) / norms, -1.0, 1.0))
+    angles[norms == 0] = ZERO_VECTOR_ANGLE
+
+    box = np.concatenate([xy.min(axis=1), xy.max(axis=1)], axis=1)
+    area = (box[:, 2] - box[:, 0]) * (box[:, 3] - box[:, 1]) / 100
+    fingers_up = xy[:, FINGER_TIPS, 1] < xy[:, FINGER_PIPS, 1]
+    return HandGeometry(angles[:, :15], angles[:, 15], lengths[:, 32], lengths[:, 33], box, area, fingers_up)
+
+
+def _analyze_one(hand: np.ndarray) -> HandGeometry:
+    """analyze() für eine einzelne (21, D)-Hand mit Python-Floats statt NumPy-Operationen."""
+    points = hand[:, :2].tolist()
+    vx = [points[end][0] - points[start][0] for start, end in _VECTORS]
+    vy = [points[end][1] - points[start][1] for start, end in _VECTORS]
+    lengths = [math.sqrt(x * x + y * y) for x, y in zip(vx, vy)]
+    angles = []
+    for i in range(0, 32, 2):
+        norm = lengths[i] * lengths[i + 1]
+        if norm == 0:
+            angles.append(ZERO_VECTOR_ANGLE)
+        else:
+            angles.append(math.acos(max(-1.0, min(1.0, (vx[i] * vx[i + 1] + vy[i] * vy[i + 1]) / norm))))
+    xs, ys = [p[0] for p in points], [p[1] for p in points]
+    box = [min(xs), min(ys), max(xs), max(ys)]
+    # Ein Array für alle Float-Merkmale, die Felder sind Sichten darauf
+    values = np.array(angles + [lengths[32], lengths[33]] + box, dtype=np.float32)
+    box = values[None, 18:22]
+    area = (box[:, 2] - box[:, 0]) * (box[:, 3] - box[:, 1]) / 100
+    fingers_up = np.array([[ys[tip] < ys[tip - 2] for tip in FINGER_TIPS.tolist()]])
+    return HandGeometry(values[None, :15], values[15:16], values[16:17], values[17:18], box, area, fingers_up)
+
+
+def _scalar_reference(hand):
+    """Bisherige Berechnung aus track_hands.py (Listen und Einzelaufrufe) für eine Hand."""
+    lml, xl, yl = [], [], []
+    for id, (x, y) in enumerate(hand):
+        xc, yc = int(x), int(y)
+        lml.append([id, xc, yc])
+        xl.append(xc)
+        yl.append(yc)
+
+    v1 = (lml[4][1] - lml[0][1], lml[4][2] - lml[0][2])
+    v2 = (lml[5][1] - lml[0][1], lml[5][2] - lml[0][2])
+    m1, m2 = math.sqrt(v1[0] ** 2 + v1[1] ** 2), math.sqrt(v2[0] ** 2 + v2[1] ** 2)
+    if m1 == 0 or m2 == 0:
+        angle = ZERO_VECTOR_ANGLE
+    else:
+        angle = math.acos(max(-1.0, min(1.0, (v1[0] * v2[0] + v1[1] * v2[1]) / (m1 * m2))))
+    distance = math.hypot(lml[5][1] - lml[4][1], lml[5][2] - lml[4][2])
+    box = min(xl), min(yl), max(xl), max(yl)
+    area = (box[2] - box[0]) * (box[3] - box[1]) // 100
+    fingers = [1 if lml[fid][2] < lml[fid - 2][2] else 0 for fid in range(8, 21, 4)]
+    return angle, distance, box, area, fingers
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prüft und misst die vektorisierte Landmarken-Geometrie.")
+    parser.add_argument("--hands", type=int, default=2, help="Anzahl Hände pro Frame")
+    parser.add_argument("--frames", type=int, default=5000, help="Anzahl Frames")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    frames = rng.integers(0, 640, size=(args.frames, args.hands, 21, 2)).astype(np.float32)
+
+    start = time.perf_counter()
+    for hands in frames:
+        for hand in hands:
+            _scalar_reference(hand)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    for hands in frames:
+        analyze(hands)
+    vectorized = time.perf_counter() - start
+    print(f"{args.frames} Frames mit {args.hands} Händen: bisher {1e6 * scalar / args.frames:.1f} µs/Frame "
+          f"(nur Hand 0 ausgewertet: {1e6 * scalar / args.frames / args.hands:.1f} µs), "
+          f"{'einzeln' if args.hands == 1 else 'vektorisiert'} {1e6 * vectorized / args.frames:.1f} µs/Frame "
+          f"inkl. 15 Gelenkwinkel")
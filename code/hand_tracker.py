@@ -0,0 +1,255 @@
+"""
+Asynchrones Hand-Tracking mit der MediaPipe Tasks-API (RunningMode.LIVE_STREAM).
+
+Der HandLandmarker erhält jeden Frame über detect_async() und meldet die
+Landmarken später über einen Callback aus seinem eigenen Thread. Jedes
+Ergebnis trägt den Capture-Zeitstempel seines Frames, sodass die Latenz von
+der Aufnahme bis zum Ergebnis gemessen werden kann. Spiegeln und
+Farbkonvertierung schreiben in vorab angelegte Puffer (ein kleiner Ring,
+damit ein noch laufender Frame nicht überschrieben wird). Mit einem
+Rectifier (calibration.py) wird statt gespiegelt auf den Papierbogen
+entzerrt; die Landmarken liegen dann in Bogenkoordinaten.
+
+LegacyHandTracker bietet dieselbe Schnittstelle für die blockierende
+Solutions-API (mp.solutions.hands), z.B. wenn keine .task-Datei vorliegt,
+VideoHandTracker für den blockierenden VIDEO-Modus der Tasks-API (für
+Scheduler, die die Rechenzeit jedes Aufrufs selbst messen, siehe
+fused_tracker.py). submit() spiegelt/konvertiert und landmarkt in einem
+Schritt; landmark() arbeitet auf einem schon konvertierten RGB-Bild.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from hand_landmarks import HAND_CONNECTIONS, landmarks_to_array
+from metrics import StageStats
+
+MODEL_URL = ("https://storage.googleapis.com/mediapipe-models/hand_landmarker/"
+             "hand_landmarker/float16/latest/hand_landmarker.task")
+
+
+@dataclass
+class HandResult:
+    """Landmarken eines Frames."""
+    timestamp: float        # Capture-Zeitstempel des Frames (time.perf_counter())
+    hands: np.ndarray       # (H, 21, 3) Landmarken in Pixeln des gespiegelten (bzw. entzerrten) Bildes
+    handedness: List[str]   # "Left"/"Right" je Hand
+    latency: float          # Sekunden von der Aufnahme bis zum Ergebnis
+
+
+class _FrameBuffers:
+    """Ring aus vorab angelegten Puffern für das gespiegelte (oder entzerrte) BGR- und das RGB-Bild."""
+
+    def __init__(self, size: int, rectifier=None, mirror: bool = True):
+        self.size = size
+        self.rectifier = rectifier
+        self.mirror = mirror
+        self.flipped: List[np.ndarray] = []
+        self.rgb: List[np.ndarray] = []
+        self._next = 0
+
+    def convert(self, frame: np.ndarray):
+        """Spiegelt (bzw. entzerrt) und konvertiert frame in den nächsten Slot; gibt (bgr, rgb) zurück."""
+        if self.rectifier is not None:
+            width, height = self.rectifier.size
+            shape = (height, width) + frame.shape[2:]
+        else:
+            shape = frame.shape
+        if not self.flipped or self.flipped[0].shape != shape:
+            self.flipped = [np.empty(shape, frame.dtype) for _ in range(self.size)]
+            self.rgb = [np.empty(shape, frame.dtype) for _ in range(self.size)]
+        slot = self._next
+        self._next = (slot + 1) % self.size
+        if self.rectifier is not None:
+            self.rectifier.rectify(frame, out=self.flipped[slot])
+        elif self.mirror:
+            cv2.flip(frame, 1, dst=self.flipped[slot])
+        else:
+            np.copyto(self.flipped[slot], frame)
+        cv2.cvtColor(self.flipped[slot], cv2.COLOR_BGR2RGB, dst=self.rgb[slot])
+        return self.flipped[slot], self.rgb[slot]
+
+
+class _TrackerBase:
+    def __init__(self, on_result: Optional[Callable[[HandResult], None]], buffers: int, rectifier=None,
+                 mirror: bool = True):
+        self.on_result = on_result
+        self.buffers = _FrameBuffers(buffers, rectifier, mirror)
+        self.stats = StageStats("landmarks")
+        self.frame_size = (0, 0)
+
+    def submit(self, frame: np.ndarray, timestamp: float) -> np.ndarray:
+        """
+        Spiegelt bzw. entzerrt und konvertiert einen Frame und landmarkt ihn.
+
+        Args:
+            frame (np.ndarray): BGR-Kamerabild.
+            timestamp (float): Capture-Zeitstempel (time.perf_counter()).
+
+        Returns:
+            np.ndarray: Das gespiegelte bzw. entzerrte BGR-Bild (Pufferslot, nur bis zum nächsten Umlauf gültig).
+        """
+        flipped, rgb = self.buffers.convert(frame)
+        self.landmark(rgb, timestamp)
+        return flipped
+
+    def landmark(self, rgb: np.ndarray, timestamp: float):
+        raise NotImplementedError
+
+    def warmup(self, shape=(480, 640, 3)):
+        """Erste Inferenz auf einem schwarzen Bild, ohne on_result und ohne Statistik."""
+        on_result, stats = self.on_result, self.stats
+        self.on_result, self.stats = None, StageStats("warmup")
+        try:
+            self.landmark(np.zeros(shape, np.uint8), time.perf_counter())
+        finally:
+            self.on_result, self.stats = on_result, stats
+
+    def _emit(self, timestamp: float, hand_landmarks, handedness: List[str]):
+        latency = time.perf_counter() - timestamp
+        self.stats.add(latency)
+        width, height = self.frame_size
+        hands = (landmarks_to_array(hand_landmarks, width, height, dims=3) if hand_landmarks
+                 else np.zeros((0, 21, 3), np.float32))
+        if self.on_result:
+            self.on_result(HandResult(timestamp, hands, handedness, latency))
+
+
+class LiveHandTracker(_TrackerBase):
+    """
+    HandLandmarker im LIVE_STREAM-Modus.
+
+    Args:
+        model_path (str): Pfad zur hand_landmarker.task (siehe MODEL_URL).
+        on_result (callable): on_result(HandResult), wird im MediaPipe-Thread aufgerufen.
+        num_hands (int): Maximale Anzahl Hände.
+        min_confidence (float): Mindestkonfidenz für Erkennung, Präsenz und Tracking.
+        buffers (int): Anzahl Pufferslots für Frames, die noch in MediaPipe stecken.
+        rectifier (calibration.Rectifier): Optional, entzerrt auf den Bogen statt zu spiegeln.
+        mirror (bool): Ohne rectifier spiegeln (Selfie-Ansicht); False lässt das Bild wie aufgenommen.
+    """
+
+    def __init__(self, model_path: str, on_result: Optional[Callable[[HandResult], None]] = None,
+                 num_hands: int = 2, min_confidence: float = 0.5, buffers: int = 4, rectifier=None,
+                 mirror: bool = True):
+        super().__init__(on_result, buffers, rectifier, mirror)
+        import mediapipe as mp
+        from mediapipe.tasks.python import BaseOptions
+        from mediapipe.tasks.python.vision import HandLandmarker, HandLandmarkerOptions, RunningMode
+
+        self._mp = mp
+        self._pending: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        options = HandLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=model_path),
+            running_mode=RunningMode.LIVE_STREAM,
+            num_hands=num_hands,
+            min_hand_detection_confidence=min_confidence,
+            min_hand_presence_confidence=min_confidence,
+            min_tracking_confidence=min_confidence,
+            result_callback=self._on_result)
+        self.landmarker = HandLandmarker.create_from_options(options)
+
+    def landmark(self, rgb: np.ndarray, timestamp: float):
+        """Übergibt ein RGB-Bild an MediaPipe und kehrt sofort zurück."""
+        self.frame_size = (rgb.shape[1], rgb.shape[0])
+        # MediaPipe verlangt streng steigende Millisekunden-Zeitstempel
+        timestamp_ms = max(int(timestamp * 1000), self._last_ms + 1)
+        self._last_ms = timestamp_ms
+        with self._lock:
+            self._pending[timestamp_ms] = timestamp
+        self.landmarker.detect_async(self._mp.Image(image_format=self._mp.ImageFormat.SRGB, data=rgb), timestamp_ms)
+
+    def warmup(self, shape=(480, 640, 3)):
+        # detect_async blockiert nicht; der erste echte Frame wärmt im MediaPipe-Thread auf
+        pass
+
+    def _on_result(self, result, output_image, timestamp_ms: int):
+        with self._lock:
+            timestamp = self._pending.pop(timestamp_ms, None)
+            # Frames, die MediaPipe unter Last verworfen hat, bekommen nie ein Ergebnis
+            for stale in [t for t in self._pending if t < timestamp_ms]:
+                del self._pending[stale]
+        if timestamp is None:
+            return
+        handedness = [categories[0].category_name for categories in result.handedness]
+        self._emit(timestamp, result.hand_landmarks, handedness)
+
+    def close(self):
+        self.landmarker.close()
+
+
+class VideoHandTracker(_TrackerBase):
+    """
+    HandLandmarker im VIDEO-Modus: blockierend, aber mit Tracking zwischen den
+    Frames. on_result wird noch innerhalb von landmark() aufgerufen.
+    """
+
+    def __init__(self, model_path: str, on_result: Optional[Callable[[HandResult], None]] = None,
+                 num_hands: int = 2, min_confidence: float = 0.5, buffers: int = 4, rectifier=None,
+                 mirror: bool = True):
+        super().__init__(on_result, buffers, rectifier, mirror)
+        import mediapipe as mp
+        from mediapipe.tasks.python import BaseOptions
+        from mediapipe.tasks.python.vision import HandLandmarker, HandLandmarkerOptions, RunningMode
+
+        self._mp = mp
+        self._last_ms = -1
+        options = HandLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=model_path),
+            running_mode=RunningMode.VIDEO,
+            num_hands=num_hands,
+            min_hand_detection_confidence=min_confidence,
+            min_hand_presence_confidence=min_confidence,
+            min_tracking_confidence=min_confidence)
+        self.landmarker = HandLandmarker.create_from_options(options)
+
+    def landmark(self, rgb: np.ndarray, timestamp: float):
+        self.frame_size = (rgb.shape[1], rgb.shape[0])
+        timestamp_ms = max(int(timestamp * 1000), self._last_ms + 1)
+        self._last_ms = timestamp_ms
+        result = self.landmarker.detect_for_video(
+            self._mp.Image(image_format=self._mp.ImageFormat.SRGB, data=rgb), timestamp_ms)
+        handedness = [categories[0].category_name for categories in result.handedness]
+        self._emit(timestamp, result.hand_landmarks, handedness)
+
+    def close(self):
+        self.landmarker.close()
+
+
+class LegacyHandTracker(_TrackerBase):
+    """Blockierende Solutions-API mit derselben Schnittstelle wie LiveHandTracker."""
+
+    def __init__(self, on_result: Optional[Callable[[HandResult], None]] = None,
+                 num_hands: int = 2, min_confidence: float = 0.5, buffers: int = 2, rectifier=None,
+                 mirror: bool = True):
+        super().__init__(on_result, buffers, rectifier, mirror)
+        import mediapipe as mp
+
+        self.hands = mp.solutions.hands.Hands(max_num_hands=num_hands, min_detection_confidence=min_confidence,
+                                              min_tracking_confidence=min_confidence)
+
+    def landmark(self, rgb: np.ndarray, timestamp: float):
+        self.frame_size = (rgb.shape[1], rgb.shape[0])
+        rgb.flags.writeable = False
+        results = self.hands.process(rgb)
+        rgb.flags.writeable = True
+        handedness = [h.classification[0].label for h in results.multi_handedness or []]
+        self._emit(timestamp, results.multi_hand_landmarks, handedness)
+
+    def close(self):
+        self.hands.close()
+
+
+def draw_hand(image: np.ndarray, points: np.ndarray, color=(255, 255, 255), joint_color=(0, 0, 255)):
+    """Zeichnet die Landmarken einer Hand ((21, 2+) in Pixeln) mit ihren Verbindungen."""
+    points = points[:, :2].astype(np.int32)
+    for a, b in HAND_CONNECTIONS:
+        cv2.line(image, tuple(points[a].tolist()), tuple(points[b].tolist()), color, 2)
+    for x, y in points.tolist():
+        cv2.circle(image, (x, y), 4, joint_color, cv2.FILLED)
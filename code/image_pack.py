@@ -0,0 +1,265 @@
+"""
+Vorab dekodierter, memory-mapped Bildspeicher für das Training.
+
+Das Training in erkenner_marker_ui.py liest sonst in jeder Epoche alle JPEGs
+neu und skaliert sie. pack_dataset() dekodiert die Bilder eines Splits (Ordner
+aus split_train_val.py oder Liste train.txt/val.txt) einmal, skaliert sie per
+Letterbox auf imgsz x imgsz und legt sie in einem einzigen uint8-Array
+(<prefix>.images.npy, N x imgsz x imgsz x 3, BGR) ab. Die Labels kommen
+kompakt in <prefix>.labels.npz: alle Boxen hintereinander (Klasse, cx, cy, w, h,
+normiert auf das Letterbox-Bild) mit Offsets pro Bild.
+
+PackedDataset öffnet das Array per np.load(mmap_mode="r"): ein Bild ist eine
+Sicht in den Page-Cache, ohne Dekodieren und ohne Kopie. packed_trainer()
+liefert einen Ultralytics-DetectionTrainer, der seine Datensätze aus den Packs
+statt aus den Bildordnern lädt; dort wird jedes Bild einmal aus dem Pack
+kopiert, weil die Augmentierungen in das Bild schreiben.
+
+Aufruf:
+  python image_pack.py dataset/train packs/train --imgsz 640
+  python image_pack.py dataset/train packs/train --bench   # Epochenzeit Ordner gegen Pack
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from frame_source import IMAGE_EXTENSIONS
+
+PAD_VALUE = 114  # Grauwert der Letterbox-Ränder wie bei Ultralytics
+
+
+def list_images(source: str) -> List[str]:
+    """Bilder eines Ordners oder einer Listendatei (eine Bildzeile pro Pfad, wie bei Ultralytics)."""
+    if os.path.isdir(source):
+        return sorted(os.path.join(source, f) for f in os.listdir(source) if f.lower().endswith(IMAGE_EXTENSIONS))
+    folder = os.path.dirname(os.path.abspath(source))
+    with open(source, "r") as f:
+        return [os.path.join(folder, line.strip()) for line in f if line.strip()]
+
+
+def label_path(image_path: str) -> str:
+    """YOLO-Labeldatei eines Bildes: daneben oder unter .../labels/ statt .../images/."""
+    images, labels = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    if images in image_path:
+        image_path = labels.join(image_path.rsplit(images, 1))
+    return os.path.splitext(image_path)[0] + ".txt"
+
+
+def read_labels(path: str) -> np.ndarray:
+    """Liest eine YOLO-Labeldatei als (N, 5) float32 (Klasse, cx, cy, w, h)."""
+    if not os.path.exists(path):
+        return np.zeros((0, 5), np.float32)
+    rows = [line.split()[:5] for line in open(path, "r") if line.strip()]
+    return np.array(rows, dtype=np.float32).reshape(-1, 5)
+
+
+def letterbox(image: np.ndarray, out: np.ndarray) -> Tuple[float, int, int]:
+    """Skaliert image mit gleichem Seitenverhältnis mittig in out; gibt (ratio, left, top) zurück."""
+    height, width = out.shape[:2]
+    ratio = min(height / image.shape[0], width / image.shape[1])
+    new_w, new_h = int(round(image.shape[1] * ratio)), int(round(image.shape[0] * ratio))
+    left, top = (width - new_w) // 2, (height - new_h) // 2
+    out[:] = PAD_VALUE
+    out[top:top + new_h, left:left + new_w] = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    return ratio, left, top
+
+
+def pack_dataset(source: str, prefix: str, imgsz: int = 640, workers: int = 8) -> int:
+    """
+    Dekodiert und letterboxt alle Bilder eines Splits einmal in ein memory-mapped Array.
+
+    Args:
+        source (str): Bildordner oder Listendatei (train.txt/val.txt).
+        prefix (str): Zielpräfix, geschrieben werden <prefix>.images.npy und <prefix>.labels.npz.
+        imgsz (int): Trainingsgröße (quadratisch, wie imgsz in erkenner_marker_ui.py).
+        workers (int): Threads zum Dekodieren und Skalieren (cv2 gibt den GIL frei).
+
+    Returns:
+        int: Anzahl gepackter Bilder.
+    """
+    files = list_images(source)
+    if not files:
+        raise FileNotFoundError(f"Keine Bilder in '{source}'")
+    folder = os.path.dirname(os.path.abspath(prefix))
+    os.makedirs(folder, exist_ok=True)
+    images = np.lib.format.open_memmap(prefix + ".images.npy", mode="w+", dtype=np.uint8,
+                                       shape=(len(files), imgsz, imgsz, 3))
+    shapes = np.zeros((len(files), 2), np.int32)
+    boxes: List[np.ndarray] = [None] * len(files)
+
+    def pack(i):
+        image = cv2.imread(files[i])
+        if image is None:
+            raise OSError(f"Bild '{files[i]}' konnte nicht gelesen werden")
+        h, w = image.shape[:2]
+        ratio, left, top = letterbox(image, images[i])
+        labels = read_labels(label_path(files[i]))
+        # Normierte Boxen vom Originalbild auf das Letterbox-Bild umrechnen
+        labels[:, [1, 3]] = (labels[:, [1, 3]] * w * ratio + [left, 0]) / imgsz
+        labels[:, [2, 4]] = (labels[:, [2, 4]] * h * ratio + [top, 0]) / imgsz
+        shapes[i] = (h, w)
+        boxes[i] = labels
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(pack, range(len(files))))
+    images.flush()
+
+    counts = np.array([len(b) for b in boxes], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    np.savez(prefix + ".labels.npz", files=np.array(files), shapes=shapes, offsets=offsets,
+             boxes=np.concatenate(boxes) if offsets[-1] else np.zeros((0, 5), np.float32), imgsz=imgsz)
+    return len(files)
+
+
+class PackedDataset:
+    """
+    Liest ein Pack aus pack_dataset().
+
+    Bilder sind schreibgeschützte Sichten in das memory-mapped Array; die
+    Labels eines Bildes sind eine Sicht in das gemeinsame Box-Array.
+    """
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self.images = np.load(prefix + ".images.npy", mmap_mode="r")
+        with np.load(prefix + ".labels.npz") as index:
+            self.files = index["files"].tolist()
+            self.shapes = index["shapes"]
+            self.offsets = index["offsets"]
+            self.boxes = index["boxes"]
+            self.imgsz = int(index["imgsz"])
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def labels(self, i: int) -> np.ndarray:
+        """(N, 5) Klasse, cx, cy, w, h (normiert auf das Letterbox-Bild)."""
+        return self.boxes[self.offsets[i]:self.offsets[i + 1]]
+
+    def __getitem__(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.images[i], self.labels(i)
+
+
+def packed_trainer(packs: Dict[str, str]):
+    """
+    Gibt eine DetectionTrainer-Klasse zurück, die aus Packs statt aus Bildordnern lädt.
+
+    Args:
+        packs (dict): Modus ("train", "val") -> Pack-Präfix.
+
+    Verwendung: model.train(..., trainer=packed_trainer({"train": ..., "val": ...}))
+    """
+    from ultralytics.data.dataset import YOLODataset
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    class PackedYOLODataset(YOLODataset):
+        """YOLODataset mit Bildern und Labels aus einem Pack (bereits auf imgsz gebracht)."""
+
+        def __init__(self, pack: PackedDataset, *args, **kwargs):
+            self.pack = pack
+            super().__init__(*args, **kwargs)
+
+        def get_img_files(self, img_path):
+            return list(self.pack.files)
+
+        def get_labels(self):
+            size = self.pack.imgsz
+            labels = []
+            for i, im_file in enumerate(self.pack.files):
+                boxes = self.pack.labels(i)
+                labels.append({"im_file": im_file, "shape": (size, size), "cls": boxes[:, :1],
+                               "bboxes": boxes[:, 1:], "segments": [], "keypoints": None,
+                               "normalized": True, "bbox_format": "xywh"})
+            return labels
+
+        def load_image(self, i, rect_mode=True, resize_short=False):
+            if self.ims[i] is not None:
+                return self.ims[i], self.im_hw0[i], self.im_hw[i]
+            # Kopie aus dem memory-mapped Array: kein Dekodieren und Skalieren, aber
+            # beschreibbar, weil die Augmentierungen das Bild an Ort und Stelle ändern
+            image = np.array(self.pack.images[i])
+            hw = image.shape[:2]
+            # Wie BaseDataset.load_image: Mosaic wählt seine Partnerbilder aus self.buffer
+            if self.augment and self.cache != "ram":
+                self.ims[i], self.im_hw0[i], self.im_hw[i] = image, hw, hw
+                self.buffer.append(i)
+                if 1 < len(self.buffer) >= self.max_buffer_length:
+                    j = self.buffer.pop(0)
+                    self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+            return image, hw, hw
+
+    class PackedTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode="train", batch=None):
+            # DataParallel/DDP-Hülle entfernen (de_parallel bzw. unwrap_model, je nach Ultralytics-Version)
+            model = getattr(self.model, "module", self.model)
+            stride = max(int(model.stride.max() if model else 0), 32)
+            return PackedYOLODataset(
+                PackedDataset(packs[mode]), img_path=img_path, imgsz=self.args.imgsz, batch_size=batch,
+                augment=mode == "train", hyp=self.args, rect=mode == "val", cache=None,
+                single_cls=self.args.single_cls or False, stride=stride, pad=0.0 if mode == "train" else 0.5,
+                prefix=f"{mode}: ", task=self.args.task, classes=self.args.classes, data=self.data,
+                fraction=self.args.fraction if mode == "train" else 1.0)
+
+    return PackedTrainer
+
+
+def benchmark(source: str, prefix: str, batch: int = 16, epochs: int = 2) -> Dict[str, float]:
+    """
+    Vergleicht die Epochenzeit des Ordner-Loaders mit dem Pack.
+
+    Beide Wege liefern Batches (B, imgsz, imgsz, 3) mit Labels; der Ordner-Loader
+    dekodiert, skaliert und parst dabei jedes Bild neu.
+    """
+    pack = PackedDataset(prefix)
+    files = list_images(source)
+    canvas = np.empty((batch, pack.imgsz, pack.imgsz, 3), np.uint8)
+
+    def folder_epoch():
+        for start in range(0, len(files), batch):
+            chunk = files[start:start + batch]
+            for k, path in enumerate(chunk):
+                letterbox(cv2.imread(path), canvas[k])
+                read_labels(label_path(path))
+
+    def pack_epoch():
+        for start in range(0, len(pack), batch):
+            stop = min(start + batch, len(pack))
+            np.copyto(canvas[:stop - start], pack.images[start:stop])
+            for i in range(start, stop):
+                pack.labels(i)
+
+    result = {"images": len(files)}
+    for name, epoch in (("folder", folder_epoch), ("pack", pack_epoch)):
+        times = []
+        for _ in range(epochs):
+            start = time.perf_counter()
+            epoch()
+            times.append(time.perf_counter() - start)
+        result[f"{name}_s"] = min(times)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Packt einen Trainingssplit in ein memory-mapped Bild-Array.")
+    parser.add_argument("source", help="Bildordner (z.B. aus split_train_val.py) oder train.txt/val.txt")
+    parser.add_argument("prefix", help="Zielpräfix, z.B. packs/train")
+    parser.add_argument("--imgsz", type=int, default=640, help="Trainingsgröße (Standard: 640)")
+    parser.add_argument("--workers", type=int, default=8, help="Threads zum Dekodieren")
+    parser.add_argument("--bench", action="store_true",
+                        help="Epochenzeit Ordner-Loader gegen Pack messen (packt vorher, falls nötig)")
+    parser.add_argument("--epochs", type=int, default=2, help="Epochen pro Loader für --bench")
+    args = parser.parse_args()
+
+    if not args.bench or not os.path.exists(args.prefix + ".images.npy"):
+        start = time.perf_counter()
+        count = pack_dataset(args.source, args.prefix, args.imgsz, args.workers)
+        print(f"{count} Bilder in {time.perf_counter() - start:.1f} s gepackt: {args.prefix}.images.npy")
+    if args.bench:
+        r = benchmark(args.source, args.prefix, epochs=args.epochs)
+        print(f"Epoche mit {r['images']} Bildern: Ordner {r['folder_s']:.2f} s, Pack {r['pack_s']:.2f} s "
+              f"({r['folder_s'] / max(r['pack_s'], 1e-9):.1f}x)")
@@ -0,0 +1,181 @@
+"""
+Gemeinsame Messwerkzeuge für alle Einstiegspunkte.
+
+  - StageStats: Laufzeiten einer Stufe über ein gleitendes Fenster mit
+    Perzentilen p50/p95/p99 (pro Messung nur ein append unter einem Lock).
+  - Counter: threadsicherer Zähler, z.B. für verworfene Frames.
+  - Registry: sammelt Stufen, Zähler und Messgrößen (Gauges) unter Namen und
+    gibt sie als Dictionary (JSON) oder im Prometheus-Textformat aus, z.B.
+    für GET /metrics in UI/server.py.
+  - mark_first_frame: meldet das erste gezeichnete Bild eines Werkzeugs, für
+    die Startzeitmessung in startup_bench.py.
+
+Bestehende Statistiken (tracker.stats, LatestQueue.dropped, ...) werden nicht
+umgebaut, sondern per register()/gauge() eingehängt.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+import numpy as np
+
+
+class StageStats:
+    """Laufzeitstatistik einer Stufe über ein gleitendes Fenster."""
+
+    def __init__(self, name: str, window: int = 300):
+        self.name = name
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Misst die Laufzeit des with-Blocks."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, float]:
+        """Gibt Anzahl, Mittelwert und Perzentile (in ms) zurück."""
+        with self._lock:
+            samples = np.array(self.samples, dtype=np.float64) * 1000.0
+            count, total = self.count, self.total
+        if count == 0:
+            return {"count": 0}
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+        return {
+            "count": count,
+            "mean_ms": total * 1000.0 / count,
+            "p50_ms": float(p50),
+            "p95_ms": float(p95),
+            "p99_ms": float(p99),
+            "max_ms": float(samples.max()),
+        }
+
+
+class Counter:
+    """Threadsicherer, monoton steigender Zähler."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Registry:
+    """Benannte Stufen, Zähler und Messgrößen eines Prozesses."""
+
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = {}
+        self.counters: Dict[str, Counter] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.collectors: Dict[str, Callable[[], Dict[str, float]]] = {}
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, window: int = 300) -> StageStats:
+        """Gibt die Stufe name zurück und legt sie bei Bedarf an."""
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = StageStats(name, window)
+            return self.stages[name]
+
+    def register(self, stats: StageStats, name: Optional[str] = None) -> StageStats:
+        """Hängt eine bestehende StageStats unter name (Standard: stats.name) ein."""
+        with self._lock:
+            self.stages[name or stats.name] = stats
+        return stats
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            if name not in self.counters:
+                self.counters[name] = Counter(name)
+            return self.counters[name]
+
+    def gauge(self, name: str, read: Callable[[], float]):
+        """Messgröße, die beim Auslesen über read() abgefragt wird."""
+        with self._lock:
+            self.gauges[name] = read
+
+    def collect(self, name: str, summary: Callable[[], Dict[str, float]]):
+        """Stufe, deren Zusammenfassung von außen kommt (z.B. Latenzen aus Shared Memory)."""
+        with self._lock:
+            self.collectors[name] = summary
+
+    def time(self, name: str):
+        """Kontextmanager: misst den with-Block als Stufe name."""
+        return self.stage(name).time()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            stages, counters = dict(self.stages), dict(self.counters)
+            gauges, collectors = dict(self.gauges), dict(self.collectors)
+        result = {name: stats.summary() for name, stats in stages.items()}
+        result.update({name: summary() for name, summary in collectors.items()})
+        return {
+            "stages": result,
+            "counters": {name: counter.value for name, counter in counters.items()},
+            "gauges": {name: float(read()) for name, read in gauges.items()},
+        }
+
+    def prometheus(self, prefix: str = "smc") -> str:
+        """Gibt den Snapshot im Prometheus-Textformat aus (Stufen als summary in Sekunden)."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, s in snapshot["stages"].items():
+            metric = f"{prefix}_{_sanitize(name)}_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for quantile in ("p50", "p95", "p99"):
+                if f"{quantile}_ms" in s:
+                    lines.append(f'{metric}{{quantile="0.{quantile[1:]}"}} {s[quantile + "_ms"] / 1000.0:.9f}')
+            count = s.get("count", 0)
+            lines.append(f"{metric}_count {count}")
+            lines.append(f"{metric}_sum {s.get('mean_ms', 0.0) * count / 1000.0:.9f}")
+        for name, value in snapshot["counters"].items():
+            metric = f"{prefix}_{_sanitize(name)}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        for name, value in snapshot["gauges"].items():
+            metric = f"{prefix}_{_sanitize(name)}"
+            lines += [f"# TYPE {metric} gauge", f"{metric} {value:g}"]
+        return "\n".join(lines) + "\n"
+
+
+def _sanitize(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name).lower()
+
+
+# Standard-Registry des Prozesses
+REGISTRY = Registry()
+
+# Ist die Umgebungsvariable gesetzt, schreibt mark_first_frame eine Zeile
+# "<FIRST_FRAME_TAG> <name> <Unix-Zeit>" nach stdout (ausgewertet von startup_bench.py)
+STARTUP_PROBE = "SMC_STARTUP_PROBE"
+FIRST_FRAME_TAG = "smc-first-frame"
+_first_frames = set()
+
+
+def mark_first_frame(name: str):
+    """Merkt sich den Zeitpunkt des ersten gezeichneten Bildes von name (nur beim ersten Aufruf)."""
+    if name in _first_frames:
+        return
+    _first_frames.add(name)
+    now = time.time()
+    REGISTRY.gauge(f"{name}_first_frame_unix", lambda: now)
+    if os.environ.get(STARTUP_PROBE):
+        print(f"{FIRST_FRAME_TAG} {name} {now:.6f}", flush=True)
@@ -0,0 +1,234 @@
+"""
+Bewegungsgesteuerte Inferenz für den meist unbewegten Papierbogen.
+
+Die MotionGate vergleicht ein stark verkleinertes Graubild des Interface-
+Bereichs kachelweise mit dem Stand der letzten Inferenz. Ohne Änderung werden
+die vorherigen Erkennungen wiederverwendet, bei Änderungen läuft das Modell
+nur auf dem Ausschnitt der geänderten Kacheln (oder bei großen Änderungen auf
+dem ganzen Bereich).
+
+Als Skript aufgerufen vergleicht es die Erkennungen mit voller Inferenz pro
+Frame auf einer Aufnahme.
+"""
+import argparse
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detections import Detections
+from tracker import iou_matrix
+
+
+class MotionGate:
+    """
+    Erkennt geänderte Kacheln im Interface-Bereich.
+
+    Args:
+        roi (tuple): Optional, x1, y1, x2, y2 des Interface-Bereichs im Frame.
+        grid (tuple): Anzahl Kacheln (Spalten, Zeilen).
+        cell (int): Kantenlänge einer Kachel im verkleinerten Bild in Pixeln.
+        threshold (int): Mindestdifferenz eines Pixels (Graustufen), um als geändert zu gelten.
+        min_fraction (float): Anteil geänderter Pixel, ab dem eine Kachel als geändert gilt.
+    """
+
+    def __init__(self, roi: Optional[Tuple[int, int, int, int]] = None, grid: Tuple[int, int] = (8, 6),
+                 cell: int = 12, threshold: int = 18, min_fraction: float = 0.02):
+        self.roi = roi
+        self.grid = grid
+        self.cell = cell
+        self.threshold = threshold
+        self.min_fraction = min_fraction
+        size = (grid[0] * cell, grid[1] * cell)
+        self._small = np.empty((size[1], size[0], 3), dtype=np.uint8)
+        self._gray = np.empty((size[1], size[0]), dtype=np.uint8)
+        self._diff = np.empty_like(self._gray)
+        self._reference: Optional[np.ndarray] = None
+
+    def region(self, frame_shape) -> Tuple[int, int, int, int]:
+        """Der überwachte Bereich in Frame-Pixeln."""
+        if self.roi is None:
+            return 0, 0, frame_shape[1], frame_shape[0]
+        return self.roi
+
+    def update(self, frame: np.ndarray) -> np.ndarray:
+        """Gibt eine (Zeilen, Spalten)-Maske der seit der letzten Inferenz geänderten Kacheln zurück."""
+        x1, y1, x2, y2 = self.region(frame.shape)
+        cv2.resize(frame[y1:y2, x1:x2], self._small.shape[1::-1], dst=self._small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        columns, rows = self.grid
+        if self._reference is None:
+            return np.ones((rows, columns), dtype=bool)
+        cv2.absdiff(self._gray, self._reference, dst=self._diff)
+        changed = (self._diff > self.threshold).reshape(rows, self.cell, columns, self.cell)
+        return changed.mean(axis=(1, 3)) > self.min_fraction
+
+    def accept(self, mask: np.ndarray):
+        """Übernimmt die Kacheln, auf denen inferiert wurde, als neue Referenz."""
+        if self._reference is None:
+            self._reference = self._gray.copy()
+            return
+        pixel_mask = np.repeat(np.repeat(mask, self.cell, axis=0), self.cell, axis=1)
+        self._reference[pixel_mask] = self._gray[pixel_mask]
+
+    def bounds(self, mask: np.ndarray, frame_shape, pad: int) -> Tuple[int, int, int, int]:
+        """Umschließendes Rechteck der markierten Kacheln in Frame-Pixeln, um pad erweitert."""
+        x1, y1, x2, y2 = self.region(frame_shape)
+        rows, columns = np.nonzero(mask)
+        tile_w = (x2 - x1) / self.grid[0]
+        tile_h = (y2 - y1) / self.grid[1]
+        return (max(x1, int(x1 + columns.min() * tile_w) - pad),
+                max(y1, int(y1 + rows.min() * tile_h) - pad),
+                min(x2, int(x1 + (columns.max() + 1) * tile_w) + pad),
+                min(y2, int(y1 + (rows.max() + 1) * tile_h) + pad))
+
+
+def _centers_inside(detections: Detections, rect) -> np.ndarray:
+    centers = (detections.xyxy[:, :2] + detections.xyxy[:, 2:]) / 2
+    return ((centers[:, 0] >= rect[0]) & (centers[:, 0] < rect[2])
+            & (centers[:, 1] >= rect[1]) & (centers[:, 1] < rect[3]))
+
+
+def _concat(a: Detections, b: Detections) -> Detections:
+    return Detections(np.concatenate([a.xyxy, b.xyxy]), np.concatenate([a.conf, b.conf]),
+                      np.concatenate([a.cls, b.cls]))
+
+
+class GatedDetector:
+    """
+    Umhüllt einen Detektor (detect(frame) -> Detections) mit der MotionGate.
+
+    Args:
+        detector: Detektor ohne eigenes Tracking (Ausschnitte verschieben die Koordinaten).
+        gate (MotionGate): Bewegungserkennung.
+        full_fraction (float): Ab diesem Anteil geänderter Kacheln wird der ganze Bereich inferiert.
+        pad (int): Rand um den geänderten Ausschnitt in Pixeln, damit Marker an der Kante nicht abgeschnitten werden.
+        refresh (int): Spätestens nach so vielen Frames wird der ganze Bereich neu inferiert (0 = nie).
+    """
+
+    def __init__(self, detector, gate: MotionGate, full_fraction: float = 0.5, pad: int = 48, refresh: int = 0):
+        self.detector = detector
+        self.names = detector.names
+        self.gate = gate
+        self.full_fraction = full_fraction
+        self.pad = pad
+        self.refresh = refresh
+        self.last = Detections.empty()
+        self.frames = 0
+        self.skipped = 0
+        self.partial = 0
+        self.full = 0
+        self._since_full = 0
+        self._cpu_start = time.process_time()
+        self._wall_start = time.perf_counter()
+
+    def detect(self, frame: np.ndarray) -> Detections:
+        self.frames += 1
+        self._since_full += 1
+        mask = self.gate.update(frame)
+        if self.refresh and self._since_full >= self.refresh:
+            mask[:] = True
+        if not mask.any():
+            self.skipped += 1
+            return self.last
+
+        if mask.mean() >= self.full_fraction:
+            self.full += 1
+            self._since_full = 0
+            mask[:] = True
+            rect = self.gate.region(frame.shape)
+        else:
+            self.partial += 1
+            rect = self.gate.bounds(mask, frame.shape, self.pad)
+        x1, y1, x2, y2 = rect
+        detections = self.detector.detect(np.ascontiguousarray(frame[y1:y2, x1:x2]))
+        detections.xyxy[:, [0, 2]] += x1
+        detections.xyxy[:, [1, 3]] += y1
+        # Erkennungen außerhalb des neu inferierten Ausschnitts bleiben erhalten
+        kept = ~_centers_inside(self.last, rect)
+        self.last = _concat(Detections(self.last.xyxy[kept], self.last.conf[kept], self.last.cls[kept]),
+                            detections)
+        self.gate.accept(mask)
+        return self.last
+
+    def report(self) -> dict:
+        """Effektive Inferenzrate und CPU-Auslastung seit dem Start."""
+        wall = time.perf_counter() - self._wall_start
+        frames = max(1, self.frames)
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "partial": self.partial,
+            "full": self.full,
+            "inference_rate": (self.partial + self.full) / frames,
+            "cpu_percent": 100.0 * (time.process_time() - self._cpu_start) / wall if wall > 0 else 0.0,
+        }
+
+
+def format_gate_report(report: dict) -> str:
+    return (f"Gate: {report['frames']} Frames, {report['full']} voll, {report['partial']} Ausschnitt, "
+            f"{report['skipped']} übersprungen -> effektive Inferenzrate {100 * report['inference_rate']:.1f} %, "
+            f"CPU {report['cpu_percent']:.0f} %")
+
+
+def match_detections(reference: Detections, candidate: Detections, iou_threshold: float = 0.5) -> Tuple[int, int, int]:
+    """Zählt (Treffer, fehlende, zusätzliche) Erkennungen gleicher Klasse mit IoU >= iou_threshold."""
+    if not len(reference) or not len(candidate):
+        return 0, len(reference), len(candidate)
+    iou = iou_matrix(reference.xyxy, candidate.xyxy)
+    iou[reference.cls[:, None] != candidate.cls[None, :]] = 0.0
+    matched_ref, matched_cand = set(), set()
+    for flat in np.argsort(iou, axis=None)[::-1]:
+        r, c = divmod(int(flat), iou.shape[1])
+        if iou[r, c] < iou_threshold:
+            break
+        if r not in matched_ref and c not in matched_cand:
+            matched_ref.add(r)
+            matched_cand.add(c)
+    hits = len(matched_ref)
+    return hits, len(reference) - hits, len(candidate) - hits
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vergleicht gesteuerte Inferenz mit voller Inferenz pro Frame.")
+    parser.add_argument("--source", required=True, help="Videodatei oder Bildordner")
+    parser.add_argument("--model", default="marker_ui_best.pt", help="Pfad zum Modell")
+    parser.add_argument("--roi", type=int, nargs=4, default=None, help="Interface-Bereich x1 y1 x2 y2")
+    parser.add_argument("--min_recall", type=float, default=0.98,
+                        help="Mindestanteil der vollen Erkennungen, die auch gesteuert gefunden werden")
+    args = parser.parse_args()
+
+    from detections import load_detector
+    from frame_source import open_source
+
+    detector = load_detector(args.model, track=False)
+    gated = GatedDetector(detector, MotionGate(roi=tuple(args.roi) if args.roi else None))
+    source = open_source(args.source)
+    hits = missing = extra = 0
+    full_time = gated_time = 0.0
+    while True:
+        success, frame = source.read()
+        if not success:
+            break
+        start = time.perf_counter()
+        reference = detector.detect(frame)
+        full_time += time.perf_counter() - start
+        start = time.perf_counter()
+        candidate = gated.detect(frame)
+        gated_time += time.perf_counter() - start
+        if args.roi:
+            reference = Detections(*(a[_centers_inside(reference, args.roi)]
+                                     for a in (reference.xyxy, reference.conf, reference.cls)))
+        h, m, e = match_detections(reference, candidate)
+        hits, missing, extra = hits + h, missing + m, extra + e
+    source.release()
+
+    report = gated.report()
+    recall = hits / max(1, hits + missing)
+    precision = hits / max(1, hits + extra)
+    print(format_gate_report(report))
+    print(f"Zeit: voll {1000 * full_time / max(1, report['frames']):.2f} ms/Frame, "
+          f"gesteuert {1000 * gated_time / max(1, report['frames']):.2f} ms/Frame")
+    print(f"Übereinstimmung mit voller Inferenz: Recall {recall:.3f}, Precision {precision:.3f}")
+    exit(0 if recall >= args.min_recall else 1)
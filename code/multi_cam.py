@@ -0,0 +1,192 @@
+"""
+Marker-Tracking für mehrere Kameras in einem Prozess mit einem Modell.
+
+Jede Quelle (Kamera-Index, Videodatei oder Stream) hat einen eigenen
+Capture-Thread, der nur den neuesten Frame bereithält. Die Inferenz sammelt
+die frischen Frames aller Quellen, verarbeitet sie in einem gebündelten
+Aufruf und führt pro Quelle einen eigenen Tracker.
+"""
+import argparse
+import threading
+import time
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from detections import draw_detections, load_detector
+from frame_source import open_source
+from metrics import StageStats
+from pipeline import FramePacket, Pipeline, format_report
+from tracker import IouTracker
+
+
+class SourceReader:
+    """Liest eine Quelle in einem eigenen Thread und hält nur den neuesten Frame."""
+
+    def __init__(self, index: int, spec, condition: threading.Condition):
+        self.index = index
+        self.capture = open_source(spec)
+        self.condition = condition
+        self.latest: Optional[FramePacket] = None
+        self.fresh = False
+        self.finished = False
+        self.frames = 0
+        self.dropped = 0
+        self.stats = StageStats(f"capture[{index}]")
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"capture-{index}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            success, image = self.capture.read()
+            now = time.perf_counter()
+            with self.condition:
+                if not success:
+                    self.finished = True
+                    self.condition.notify_all()
+                    break
+                if self.fresh:
+                    self.dropped += 1
+                self.latest = FramePacket(self.frames, now, image)
+                self.fresh = True
+                self.frames += 1
+                self.condition.notify_all()
+            self.stats.add(now - start)
+
+    def take(self) -> Optional[FramePacket]:
+        """
+        Gibt den neuesten, noch nicht abgeholten Frame zurück (Aufruf unter condition).
+        Sein Puffer bleibt gehalten, bis free() ihn freigibt.
+        """
+        if not self.fresh:
+            return None
+        self.fresh = False
+        hold = getattr(self.capture, "hold_frame", None)
+        if hold is not None:
+            hold(self.latest.image)
+        return self.latest
+
+    def free(self, packet: FramePacket):
+        free = getattr(self.capture, "free_frame", None)
+        if free is not None:
+            free(packet.image)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=2.0)
+        self.capture.release()
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+
+class MultiSource:
+    """
+    Fasst mehrere Quellen zu einer zusammen, deren read() die jeweils
+    neuesten Frames aller Quellen als Liste liefert (None für Quellen ohne
+    neuen Frame). So kann die bestehende Pipeline unverändert genutzt werden.
+    """
+
+    def __init__(self, specs):
+        self.condition = threading.Condition()
+        self.readers = [SourceReader(i, spec, self.condition) for i, spec in enumerate(specs)]
+        for reader in self.readers:
+            reader.start()
+
+    def read(self):
+        with self.condition:
+            self.condition.wait_for(lambda: any(r.fresh for r in self.readers)
+                                    or all(r.finished for r in self.readers))
+            batch = [reader.take() for reader in self.readers]
+        if all(packet is None for packet in batch):
+            return False, None
+        return True, batch
+
+    def free_frame(self, batch: List[Optional[FramePacket]]):
+        """Gibt die in take() gehaltenen Frames frei, sobald die Pipeline sie nicht mehr braucht."""
+        for reader, packet in zip(self.readers, batch):
+            if packet is not None:
+                reader.free(packet)
+
+    def release(self):
+        for reader in self.readers:
+            reader.stop()
+
+
+class BatchedTracker:
+    """Führt ein Modell gebündelt über alle Quellen aus, mit eigenem Tracker je Quelle."""
+
+    def __init__(self, detector, num_sources: int):
+        self.detector = detector
+        self.trackers = [IouTracker() for _ in range(num_sources)]
+        self.batch_sizes = []
+
+    def __call__(self, batch: List[Optional[FramePacket]]):
+        indices = [i for i, packet in enumerate(batch) if packet is not None]
+        detections = self.detector.detect_batch([batch[i].image for i in indices])
+        self.batch_sizes.append(len(indices))
+        results = [None] * len(batch)
+        for i, dets in zip(indices, detections):
+            results[i] = self.trackers[i].update(dets)
+        return results
+
+
+def mosaic(images, tile_size=(640, 360)) -> np.ndarray:
+    """Ordnet die Bilder aller Quellen in einem Raster an."""
+    columns = int(np.ceil(np.sqrt(len(images))))
+    rows = int(np.ceil(len(images) / columns))
+    width, height = tile_size
+    canvas = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+    for i, image in enumerate(images):
+        if image is None:
+            continue
+        r, c = divmod(i, columns)
+        canvas[r * height:(r + 1) * height, c * width:(c + 1) * width] = cv2.resize(image, tile_size)
+    return canvas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Marker-Tracking für mehrere Kameras mit einem gemeinsamen Modell.")
+    parser.add_argument("sources", nargs="+", help="Kamera-Indizes, Videodateien, Stream-URLs oder Bildordner")
+    parser.add_argument("--model", default="marker_ui_best.pt",
+                        help="Pfad zum Modell (.onnx mit dynamischer Batch-Achse für echte Batches)")
+    parser.add_argument("--headless", action="store_true", help="Kein Fenster öffnen (für Benchmarks)")
+    parser.add_argument("--max-frames", type=int, default=None, help="Nach dieser Anzahl Batches beenden")
+    args = parser.parse_args()
+
+    detector = load_detector(args.model, track=False)
+    source = MultiSource(args.sources)
+    infer = BatchedTracker(detector, len(args.sources))
+    # Eigene Zeichenfläche pro Kamera: die Frames gehen nach render() an den Pufferring zurück,
+    # eine Kamera ohne neuen Frame zeigt aber weiter ihr letztes Bild
+    last_images = [None] * len(args.sources)
+
+    def render(packet, results):
+        for i, (frame, detections) in enumerate(zip(packet.image, results)):
+            if frame is not None:
+                if last_images[i] is None or last_images[i].shape != frame.image.shape:
+                    last_images[i] = np.empty_like(frame.image)
+                np.copyto(last_images[i], frame.image)
+                draw_detections(last_images[i], detections, detector.names)
+        if args.headless:
+            return True
+        cv2.imshow("Live Cameras", mosaic(last_images))
+        return cv2.waitKey(1) != ord('q')
+
+    pipeline = Pipeline(source, infer, render, max_frames=args.max_frames)
+    report = pipeline.run()
+    source.release()
+
+    print(format_report(report))
+    print(f"Mittlere Batchgröße: {np.mean(infer.batch_sizes) if infer.batch_sizes else 0:.2f}")
+    for reader in source.readers:
+        s = reader.stats.summary()
+        print(f"Quelle {reader.index}: {reader.frames} Frames gelesen, {reader.dropped} verworfen"
+              + (f", Lesen {s['mean_ms']:.2f} ms" if s.get("count") else ""))
+    if not args.headless:
+        cv2.destroyAllWindows()
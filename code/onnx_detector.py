@@ -0,0 +1,238 @@
+"""
+Marker-Erkennung direkt über ONNX Runtime (CPU), ohne torch/ultralytics.
+
+Das von erkenner_marker_ui.py exportierte Modell wird mit eigenem Letterbox-
+Preprocessing in einen wiederverwendeten Eingabepuffer und mit NMS in NumPy
+ausgeführt. Als Skript aufgerufen vergleicht es die Laufzeit mit dem .pt-Modell
+auf denselben Frames.
+"""
+import argparse
+import ast
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detections import MARKER_CLASSES, Detections
+
+PAD_VALUE = 114
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Non-Maximum-Suppression über xyxy-Boxen.
+
+    Args:
+        boxes (np.ndarray): (N, 4) Boxen als x1, y1, x2, y2.
+        scores (np.ndarray): (N,) Konfidenzen.
+        iou_threshold (float): Boxen mit höherer IoU zu einer besseren Box werden verworfen.
+
+    Returns:
+        np.ndarray: Indizes der behaltenen Boxen, absteigend nach Score.
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        w = np.maximum(0.0, np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]))
+        h = np.maximum(0.0, np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]))
+        inter = w * h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class Letterbox:
+    """
+    Letterbox-Skalierung von BGR-Frames in einen wiederverwendeten Eingabepuffer.
+
+    Leinwand (uint8, HWC) und Modelleingabe (float32, NCHW) werden einmal
+    angelegt; die Geometrie wird nur bei einer neuen Bildgröße neu berechnet.
+    Über buffer kann ein (1, 3, H, W)-Ausschnitt eines Batch-Puffers als
+    Ziel übergeben werden.
+    """
+
+    def __init__(self, height: int, width: int, buffer: Optional[np.ndarray] = None):
+        self.input_size = (height, width)
+        self._canvas = np.full((height, width, 3), PAD_VALUE, dtype=np.uint8)
+        self._input = buffer if buffer is not None else np.empty((1, 3, height, width), dtype=np.float32)
+        self._resized: Optional[np.ndarray] = None
+        self._shape: Optional[Tuple[int, int]] = None
+        self.ratio, self.left, self.top = 1.0, 0, 0
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        if self._shape != frame.shape[:2]:
+            height, width = self.input_size
+            self._shape = frame.shape[:2]
+            self.ratio = min(height / frame.shape[0], width / frame.shape[1])
+            new_w, new_h = int(round(frame.shape[1] * self.ratio)), int(round(frame.shape[0] * self.ratio))
+            self.left, self.top = (width - new_w) // 2, (height - new_h) // 2
+            self._resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+            self._canvas[:] = PAD_VALUE
+        new_h, new_w = self._resized.shape[:2]
+        cv2.resize(frame, (new_w, new_h), dst=self._resized, interpolation=cv2.INTER_LINEAR)
+        self._canvas[self.top:self.top + new_h, self.left:self.left + new_w] = self._resized
+        # BGR -> RGB, HWC -> CHW und Normierung auf [0, 1] in einem Schritt
+        np.multiply(self._canvas[..., ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=self._input[0], casting="unsafe")
+        return self._input
+
+    def to_original(self, xyxy: np.ndarray) -> np.ndarray:
+        """Rechnet Boxen aus Modellkoordinaten in Pixel des zuletzt verarbeiteten Frames um."""
+        xyxy[:, [0, 2]] = ((xyxy[:, [0, 2]] - self.left) / self.ratio).clip(0, self._shape[1])
+        xyxy[:, [1, 3]] = ((xyxy[:, [1, 3]] - self.top) / self.ratio).clip(0, self._shape[0])
+        return xyxy
+
+
+class OnnxMarkerDetector:
+    """
+    Führt ein YOLO-ONNX-Modell auf dem CPU-Provider von ONNX Runtime aus.
+
+    Args:
+        model_path (str): Pfad zur exportierten .onnx-Datei.
+        imgsz (int): Eingabegröße, falls das Modell keine feste Größe vorgibt.
+        conf (float): Mindestkonfidenz.
+        iou (float): IoU-Schwelle für die NMS.
+        classes (list): Erlaubte Klassen-IDs.
+        threads (int): Anzahl Threads für ONNX Runtime (0 = automatisch).
+        max_det (int): Maximale Anzahl Erkennungen pro Frame.
+    """
+
+    def __init__(self, model_path: str, imgsz: int = 640, conf: float = 0.1, iou: float = 0.7,
+                 classes=MARKER_CLASSES, threads: int = 0, max_det: int = 300):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names: Dict[int, str] = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        height, width = model_input.shape[2], model_input.shape[3]
+        if not isinstance(height, int) or not isinstance(width, int):
+            height = width = imgsz
+        self.letterbox = Letterbox(height, width)
+        # Nur Modelle mit dynamischer Batch-Achse (export(..., dynamic=True)) verarbeiten echte Batches
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self._batch = np.empty((0, 3, height, width), dtype=np.float32)
+        self._batch_letterboxes = []
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.classes = np.asarray(classes)
+
+    def preprocess(self, frame: np.ndarray) -> np.ndarray:
+        """Letterbox-Skalierung des BGR-Frames in den vorab angelegten Eingabepuffer."""
+        return self.letterbox(frame)
+
+    def postprocess(self, output: np.ndarray, letterbox: Optional[Letterbox] = None) -> Detections:
+        """Wandelt die Rohausgabe (1, 4 + Klassen, Anker) in Detections um."""
+        predictions = output[0].T  # (Anker, 4 + Klassen)
+        scores = predictions[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        mask = confidences >= self.conf
+        mask &= np.isin(class_ids, self.classes)
+        if not mask.any():
+            return Detections.empty()
+        boxes = predictions[mask, :4]
+        confidences, class_ids = confidences[mask], class_ids[mask]
+
+        xyxy = np.empty_like(boxes)
+        xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+        xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+
+        # Klassenweise NMS durch Verschieben der Boxen je Klasse
+        offsets = class_ids[:, None].astype(np.float32) * 4096.0
+        keep = nms(xyxy + offsets, confidences, self.iou)[:self.max_det]
+
+        xyxy = (letterbox or self.letterbox).to_original(xyxy[keep])
+        return Detections(xyxy.astype(np.float32), confidences[keep].astype(np.float32),
+                          class_ids[keep].astype(np.int32))
+
+    def detect(self, frame: np.ndarray) -> Detections:
+        blob = self.preprocess(frame)
+        output = self.session.run([self.output_name], {self.input_name: blob})[0]
+        return self.postprocess(output)
+
+    def warmup(self, shape=(480, 640, 3)):
+        """Erste Inferenz auf einem schwarzen Bild (ONNX Runtime legt dabei seine Puffer an)."""
+        self.detect(np.zeros(shape, np.uint8))
+
+    def detect_batch(self, frames) -> List[Detections]:
+        """
+        Erkennt Marker in mehreren Frames mit einem Aufruf von ONNX Runtime.
+
+        Jeder Batch-Platz hat seine eigene Letterbox, sodass Quellen mit
+        unterschiedlicher Auflösung gemischt werden können.
+        """
+        if not self.dynamic_batch:
+            return [self.detect(frame) for frame in frames]
+        if len(frames) > len(self._batch):
+            height, width = self.letterbox.input_size
+            self._batch = np.empty((len(frames), 3, height, width), dtype=np.float32)
+            self._batch_letterboxes = [Letterbox(height, width, self._batch[i:i + 1]) for i in range(len(frames))]
+        for letterbox, frame in zip(self._batch_letterboxes, frames):
+            letterbox(frame)
+        output = self.session.run([self.output_name], {self.input_name: self._batch[:len(frames)]})[0]
+        return [self.postprocess(output[i:i + 1], self._batch_letterboxes[i]) for i in range(len(frames))]
+
+
+def benchmark(detector, frames, warmup: int = 5) -> Dict[str, float]:
+    """Misst die Laufzeit von detector.detect über eine feste Liste von Frames."""
+    from metrics import StageStats
+
+    for frame in frames[:warmup]:
+        detector.detect(frame)
+    stats = StageStats("detect", window=len(frames))
+    total_detections = 0
+    for frame in frames:
+        start = time.perf_counter()
+        total_detections += len(detector.detect(frame))
+        stats.add(time.perf_counter() - start)
+    summary = stats.summary()
+    summary["fps"] = 1000.0 / summary["mean_ms"]
+    summary["detections_per_frame"] = total_detections / len(frames)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vergleicht ONNX Runtime mit dem .pt-Modell auf denselben Frames.")
+    parser.add_argument("--onnx", default="marker_ui_best.onnx", help="Pfad zum ONNX-Modell")
+    parser.add_argument("--pt", default="marker_ui_best.pt", help="Pfad zum .pt-Modell (leer = überspringen)")
+    parser.add_argument("--source", required=True, help="Videodatei, Bildordner oder Kamera-Index")
+    parser.add_argument("--frames", type=int, default=200, help="Anzahl Frames für den Vergleich")
+    parser.add_argument("--threads", type=int, default=0, help="Threads für ONNX Runtime (0 = automatisch)")
+    args = parser.parse_args()
+
+    from frame_source import open_source
+
+    # Die Frames werden gesammelt, daher ohne Pufferring (eigenes Array pro Frame)
+    source = open_source(args.source, ring=0)
+    frames = []
+    while len(frames) < args.frames:
+        success, frame = source.read()
+        if not success:
+            break
+        frames.append(frame)
+    source.release()
+    print(f"{len(frames)} Frames geladen.")
+
+    results = {"onnx": benchmark(OnnxMarkerDetector(args.onnx, threads=args.threads), frames)}
+    if args.pt:
+        from detections import UltralyticsDetector
+
+        results["pt"] = benchmark(UltralyticsDetector(args.pt, track=False), frames)
+
+    print(f"{'Backend':<8} {'mean':>8} {'p50':>8} {'p95':>8} {'FPS':>8} {'Det/Frame':>10}")
+    for name, s in results.items():
+        print(f"{name:<8} {s['mean_ms']:>8.2f} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} "
+              f"{s['fps']:>8.1f} {s['detections_per_frame']:>10.2f}")
@@ -0,0 +1,272 @@
+"""
+Gestufte Capture/Inferenz/Render-Pipeline für den Live-Marker-Tracker.
+
+Kamera, Modell und Anzeige laufen in eigenen Stufen, die über begrenzte
+"latest-frame-wins"-Queues verbunden sind. Ist eine Stufe langsamer als die
+vorherige, wird der älteste wartende Frame verworfen, statt dass sich Latenz
+aufstaut. Jede Stufe misst ihre Laufzeit.
+
+Quellen mit Pufferring (frame_source) beschreiben Frames wieder, sobald der
+Ring herum ist. Die Pipeline meldet deshalb jeden Frame mit hold_frame() an und
+gibt ihn erst frei, wenn er gezeichnet oder verworfen wurde.
+"""
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from metrics import StageStats
+
+
+@dataclass
+class FramePacket:
+    """Ein aufgenommener Frame mit laufender Nummer und Capture-Zeitstempel."""
+    index: int
+    timestamp: float  # time.perf_counter() direkt nach dem Einlesen
+    image: np.ndarray
+
+
+def in_background(fn: Callable[..., Any], *args, name: str = "background") -> Future:
+    """
+    Führt fn(*args) in einem Daemon-Thread aus, z.B. Modell laden und aufwärmen,
+    während Kamera und Fenster schon starten. Ergebnis oder Ausnahme kommen über
+    das Future.
+    """
+    future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return future
+
+
+class LatestQueue:
+    """
+    Begrenzte Queue zwischen zwei Stufen.
+
+    Im Standardmodus verdrängt ein neues Element das älteste, wenn die Queue
+    voll ist (latest-frame-wins). Mit drop=False blockiert put() stattdessen,
+    sodass für Benchmarks kein Frame verloren geht. on_drop(item) wird für jedes
+    verdrängte Element aufgerufen.
+    """
+
+    def __init__(self, maxsize: int = 1, drop: bool = True, on_drop: Optional[Callable[[Any], None]] = None):
+        self.maxsize = maxsize
+        self.drop = drop
+        self.on_drop = on_drop
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item) -> bool:
+        """Legt ein Element ab. Gibt False zurück, wenn die Queue geschlossen ist."""
+        with self._cond:
+            if self.drop:
+                while len(self._items) >= self.maxsize:
+                    dropped = self._items.popleft()
+                    self.dropped += 1
+                    if self.on_drop is not None:
+                        self.on_drop(dropped)
+            else:
+                while len(self._items) >= self.maxsize and not self.closed:
+                    self._cond.wait()
+            if self.closed:
+                return False
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout: Optional[float] = None):
+        """
+        Holt das nächste Element.
+
+        Gibt None zurück, sobald die Queue geschlossen und leer ist, und wirft
+        queue.Empty, wenn innerhalb von timeout nichts ankommt.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout):
+                raise queue.Empty
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def drain(self) -> list:
+        """Entnimmt alle noch wartenden Elemente (nach close())."""
+        with self._cond:
+            items = list(self._items)
+            self._items.clear()
+            return items
+
+
+class Pipeline:
+    """
+    Verbindet Capture-Thread, Inferenz-Worker und Render-Stufe.
+
+    Args:
+        source: Objekt mit read()/release() (siehe frame_source.open_source).
+        infer (callable): infer(image) -> Ergebnis, läuft im Worker-Thread.
+        render (callable): render(packet, result) -> bool, läuft im Thread, der
+                           run() aufruft (für cv2.imshow der Hauptthread).
+                           Gibt render False zurück, wird die Pipeline beendet.
+        sink (callable): Optional, sink(packet, result) direkt nach der Inferenz im
+                         Worker-Thread, für Ausgaben, die nicht auf die Anzeige warten sollen.
+        queue_size (int): Kapazität der Queues zwischen den Stufen.
+        lossless (bool): Blockieren statt Verwerfen (für Benchmarks mit Dateien).
+        max_frames (int): Optional, Anzahl Frames nach der die Aufnahme endet.
+        with_packet (bool): infer erhält das ganze FramePacket statt nur das Bild
+                            (für Stufen, die den Capture-Zeitstempel brauchen).
+    """
+
+    def __init__(self, source, infer: Callable[[np.ndarray], Any],
+                 render: Optional[Callable[[FramePacket, Any], bool]] = None,
+                 queue_size: int = 1, lossless: bool = False,
+                 max_frames: Optional[int] = None,
+                 sink: Optional[Callable[[FramePacket, Any], None]] = None,
+                 with_packet: bool = False):
+        self.source = source
+        self.infer = infer
+        self.with_packet = with_packet
+        self.render = render
+        self.sink = sink
+        self.max_frames = max_frames
+        # Frames im Pufferring der Quelle bleiben gehalten, bis sie gezeichnet oder verworfen sind
+        self._hold = getattr(source, "hold_frame", None)
+        self._free = getattr(source, "free_frame", None)
+        self.frames = LatestQueue(queue_size, drop=not lossless, on_drop=self._release)
+        self.results = LatestQueue(queue_size, drop=not lossless, on_drop=lambda item: self._release(item[0]))
+        self.stats = {name: StageStats(name) for name in ("capture", "inference", "render", "latency")}
+        self._stop = threading.Event()
+        self._threads = []
+        self._started = 0.0
+        self._finished = 0.0
+
+    def _release(self, packet: FramePacket):
+        if self._free is not None:
+            self._free(packet.image)
+
+    def _capture_loop(self):
+        index = 0
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                success, image = self.source.read()
+                now = time.perf_counter()
+                if not success:
+                    break
+                self.stats["capture"].add(now - start)
+                if self._hold is not None:
+                    self._hold(image)
+                packet = FramePacket(index, now, image)
+                if not self.frames.put(packet):
+                    self._release(packet)
+                    break
+                index += 1
+                if self.max_frames is not None and index >= self.max_frames:
+                    break
+        finally:
+            self.frames.close()
+
+    def _inference_loop(self):
+        # Auch bei einer Ausnahme in infer schließen, sonst wartet run() für immer
+        try:
+            while True:
+                packet = self.frames.get()
+                if packet is None:
+                    break
+                start = time.perf_counter()
+                result = self.infer(packet if self.with_packet else packet.image)
+                self.stats["inference"].add(time.perf_counter() - start)
+                if self.sink is not None:
+                    self.sink(packet, result)
+                if not self.results.put((packet, result)):
+                    self._release(packet)
+                    break
+        finally:
+            self.results.close()
+            self.frames.close()
+
+    def start(self):
+        self._started = time.perf_counter()
+        for target, name in ((self._capture_loop, "capture"), (self._inference_loop, "inference")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self.frames.close()
+        self.results.close()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        for packet in self.frames.drain():
+            self._release(packet)
+        for packet, _ in self.results.drain():
+            self._release(packet)
+        self._finished = time.perf_counter()
+
+    def run(self) -> Dict[str, Any]:
+        """Führt die Pipeline bis zum Ende der Quelle oder bis render False liefert aus."""
+        self.start()
+        try:
+            while True:
+                item = self.results.get()
+                if item is None:
+                    break
+                packet, result = item
+                start = time.perf_counter()
+                try:
+                    keep_running = self.render(packet, result) if self.render else True
+                finally:
+                    self._release(packet)
+                now = time.perf_counter()
+                self.stats["render"].add(now - start)
+                self.stats["latency"].add(now - packet.timestamp)
+                if keep_running is False:
+                    break
+        finally:
+            self.stop()
+        return self.report()
+
+    def report(self) -> Dict[str, Any]:
+        """Fasst Stufenzeiten, verworfene Frames und Durchsatz zusammen."""
+        elapsed = (self._finished or time.perf_counter()) - self._started
+        rendered = self.stats["render"].count
+        return {
+            "stages": {name: stats.summary() for name, stats in self.stats.items()},
+            "dropped": {"frames": self.frames.dropped, "results": self.results.dropped},
+            "elapsed_s": elapsed,
+            "fps": rendered / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Formatiert einen Pipeline-Report als lesbare Tabelle."""
+    lines = [f"{'Stufe':<10} {'n':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}  (ms)"]
+    for name, s in report["stages"].items():
+        if s.get("count"):
+            lines.append(f"{name:<10} {s['count']:>6} {s['mean_ms']:>8.2f} {s['p50_ms']:>8.2f} "
+                         f"{s['p95_ms']:>8.2f} {s.get('p99_ms', s['p95_ms']):>8.2f} {s['max_ms']:>8.2f}")
+    dropped = report["dropped"]
+    lines.append(f"Verworfen: {dropped['frames']} Frames vor der Inferenz, "
+                 f"{dropped['results']} Ergebnisse vor dem Rendern")
+    lines.append(f"Dauer: {report['elapsed_s']:.2f} s, {report['fps']:.1f} FPS")
+    return "\n".join(lines)
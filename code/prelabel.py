@@ -0,0 +1,218 @@
+"""
+Vorab-Beschriftung neuer Fotos mit dem trainierten Marker-Modell.
+
+Läuft das Modell über einen Bildordner (z.B. aus take_photos.py) und schreibt
+zu jedem Bild eine YOLO-Labeldatei (<name>.txt, "klasse cx cy w h" normiert),
+die danach nur noch geprüft statt von Hand erstellt werden muss.
+
+  - JPEG-Dekodierung in Worker-Threads (cv2.imdecode gibt den GIL frei),
+    vorausgelesen in begrenzter Tiefe.
+  - Inferenz in Batches über detect_batch (Ultralytics oder ONNX Runtime).
+  - Ein Cache (.prelabel_cache.jsonl im Ordner) merkt sich pro SHA-1 des
+    Bildinhalts die Labelzeilen. Ein abgebrochener Lauf setzt dort fort;
+    bekannte Bilder werden ohne Inferenz übernommen. Die erste Zeile des
+    Caches hält SHA-1 des Modells, conf und imgsz; passen sie nicht zum
+    aktuellen Lauf, wird der Cache verworfen und neu angelegt.
+  - Vorhandene Labeldateien (von Hand beschriftet) werden nur mit
+    --overwrite ersetzt.
+
+Aufruf:
+  python prelabel.py output_images --model marker_ui_best.onnx --conf 0.4 --batch 16
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from detections import Detections, load_detector
+from frame_source import IMAGE_EXTENSIONS
+
+CACHE_NAME = ".prelabel_cache.jsonl"
+
+
+def yolo_lines(detections: Detections, width: int, height: int) -> List[str]:
+    """Wandelt Erkennungen in YOLO-Labelzeilen (normierte Mittelpunkte und Größen) um."""
+    lines = []
+    scale = np.array([width, height, width, height], dtype=np.float64)
+    for (x1, y1, x2, y2), c in zip((detections.xyxy / scale).tolist(), detections.cls.tolist()):
+        x1, y1, x2, y2 = (min(max(v, 0.0), 1.0) for v in (x1, y1, x2, y2))
+        lines.append(f"{c} {(x1 + x2) / 2:.6f} {(y1 + y2) / 2:.6f} {x2 - x1:.6f} {y2 - y1:.6f}")
+    return lines
+
+
+def cache_header(model_path: str, conf: float, imgsz: int) -> Dict:
+    """Einstellungen, von denen die Labels abhängen; Kopfzeile des Caches."""
+    digest = hashlib.sha1()
+    if os.path.isfile(model_path):
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    else:
+        # Kein lokales File (z.B. ein Modellname, den Ultralytics herunterlädt)
+        digest.update(model_path.encode("utf-8"))
+    return {"model_sha1": digest.hexdigest(), "conf": conf, "imgsz": imgsz}
+
+
+def load_cache(path: str, header: Dict) -> Optional[Dict[str, List[str]]]:
+    """
+    Liest den Cache und schneidet eine abgebrochene letzte Zeile ab.
+
+    Nach einem abgebrochenen Lauf endet die Datei oft mitten in einer Zeile.
+    Die Datei wird hinter der letzten vollständigen Zeile abgeschnitten, damit
+    die Einträge, die der nächste Lauf anhängt, wieder gelesen werden.
+
+    Returns:
+        Labelzeilen pro SHA-1, oder None, wenn der Cache fehlt oder seine
+        Kopfzeile nicht zu header passt (anderes Modell, conf oder imgsz).
+    """
+    if not os.path.exists(path):
+        return None
+    cache = {}
+    with open(path, "rb") as f:
+        first = f.readline()
+        try:
+            if not first.endswith(b"\n") or json.loads(first) != {"header": header}:
+                return None
+        except json.JSONDecodeError:
+            return None
+        end = f.tell()
+        for line in f:
+            # Nur Zeilen mit Zeilenende sind vollständig geschrieben
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            cache[record["sha1"]] = record["labels"]
+            end = f.tell()
+        size = f.seek(0, os.SEEK_END)
+    if end < size:
+        os.truncate(path, end)
+    return cache
+
+
+def _read(path: str, cache: Dict[str, List[str]]) -> Tuple[str, str, Optional[np.ndarray]]:
+    """Liest und hasht ein Bild; dekodiert nur, wenn der Inhalt noch nicht im Cache ist."""
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    if digest in cache:
+        return path, digest, None
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return path, digest, image
+
+
+def _prefetch(pool: ThreadPoolExecutor, paths: List[str], cache, depth: int) -> Iterator:
+    """Liefert die Ergebnisse von _read in Reihenfolge, mit höchstens depth Bildern im Voraus."""
+    pending = deque()
+    for path in paths:
+        pending.append(pool.submit(_read, path, cache))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def prelabel(folder: str, model_path: str, conf: float = 0.25, imgsz: int = 640, batch: int = 16,
+             workers: int = 4, overwrite: bool = False) -> Dict[str, float]:
+    """
+    Beschriftet alle Bilder eines Ordners vorab.
+
+    Args:
+        folder (str): Bildordner; die Labels werden daneben geschrieben.
+        model_path (str): Marker-Modell (.pt oder .onnx).
+        conf (float): Mindestkonfidenz einer Erkennung.
+        imgsz (int): Eingabegröße des Modells.
+        batch (int): Bilder pro Inferenzaufruf.
+        workers (int): Threads für Lesen, Hashen und Dekodieren.
+        overwrite (bool): Vorhandene Labeldateien ersetzen.
+
+    Returns:
+        dict: Anzahl Bilder, davon aus dem Cache, beschriftet, Boxen und Bilder/s.
+    """
+    paths = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+    skipped = 0
+    if not overwrite:
+        todo = [p for p in paths if not os.path.exists(os.path.splitext(p)[0] + ".txt")]
+        skipped = len(paths) - len(todo)
+        paths = todo
+    cache_path = os.path.join(folder, CACHE_NAME)
+    header = cache_header(model_path, conf, imgsz)
+    cache = load_cache(cache_path, header)
+    if cache is None:
+        # Neuer oder veralteter Cache: mit passender Kopfzeile neu anlegen
+        cache = {}
+        with open(cache_path, "w") as f:
+            f.write(json.dumps({"header": header}) + "\n")
+    detector = load_detector(model_path, imgsz=imgsz, conf=conf, track=False)
+
+    report = {"images": len(paths), "skipped": skipped, "cached": 0, "labelled": 0, "unreadable": 0, "boxes": 0}
+
+    def write_labels(path, lines):
+        with open(os.path.splitext(path)[0] + ".txt", "w") as f:
+            f.write("".join(line + "\n" for line in lines))
+        report["boxes"] += len(lines)
+
+    started = time.perf_counter()
+    with open(cache_path, "a") as cache_file, ThreadPoolExecutor(max_workers=workers) as pool:
+        def flush(items):
+            results = detector.detect_batch([image for _, _, image in items])
+            for (path, digest, image), detections in zip(items, results):
+                keep = detections.conf >= conf
+                detections = Detections(detections.xyxy[keep], detections.conf[keep], detections.cls[keep])
+                lines = yolo_lines(detections, image.shape[1], image.shape[0])
+                write_labels(path, lines)
+                cache[digest] = lines
+                cache_file.write(json.dumps({"sha1": digest, "labels": lines}) + "\n")
+            # Nach jedem Batch sichern, damit ein Abbruch höchstens einen Batch kostet
+            cache_file.flush()
+            report["labelled"] += len(items)
+
+        items = []
+        for path, digest, image in _prefetch(pool, paths, cache, depth=2 * batch + workers):
+            if image is None:
+                if digest in cache:
+                    write_labels(path, cache[digest])
+                    report["cached"] += 1
+                else:
+                    print(f"Bild '{path}' konnte nicht gelesen werden")
+                    report["unreadable"] += 1
+                continue
+            items.append((path, digest, image))
+            if len(items) >= batch:
+                flush(items)
+                items = []
+        if items:
+            flush(items)
+
+    elapsed = time.perf_counter() - started
+    report["elapsed_s"] = elapsed
+    report["images_per_s"] = len(paths) / elapsed if elapsed > 0 else 0.0
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Beschriftet neue Fotos vorab mit dem Marker-Modell (YOLO-Labels).")
+    parser.add_argument("folder", help="Bildordner, z.B. aus take_photos.py")
+    parser.add_argument("--model", default="marker_ui_best.pt",
+                        help="Pfad zum Modell (.pt über Ultralytics, .onnx über ONNX Runtime)")
+    parser.add_argument("--conf", type=float, default=0.25, help="Mindestkonfidenz einer Erkennung")
+    parser.add_argument("--imgsz", type=int, default=640, help="Eingabegröße des Modells")
+    parser.add_argument("--batch", type=int, default=16, help="Bilder pro Inferenzaufruf")
+    parser.add_argument("--workers", type=int, default=4, help="Threads zum Lesen und Dekodieren")
+    parser.add_argument("--overwrite", action="store_true", help="Vorhandene Labeldateien ersetzen")
+    args = parser.parse_args()
+
+    r = prelabel(args.folder, args.model, args.conf, args.imgsz, args.batch, args.workers, args.overwrite)
+    print(f"{r['images']} Bilder ({r['skipped']} mit vorhandenem Label übersprungen): "
+          f"{r['labelled']} beschriftet, {r['cached']} aus dem Cache, {r['unreadable']} unlesbar, "
+          f"{r['boxes']} Boxen")
+    print(f"Durchsatz: {r['images_per_s']:.1f} Bilder/s ({r['elapsed_s']:.1f} s)")
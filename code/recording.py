@@ -0,0 +1,252 @@
+"""
+Binäres Aufnahmeformat für Handlandmarken und YOLO-Erkennungen.
+
+Eine Aufnahme besteht aus einem Dateikopf und angehängten Blöcken (Chunks)
+mit je mehreren Frames. Jeder Block enthält drei Arrays mit festen Datentypen
+(Frame-Index, Landmarken, Erkennungen), ausgerichtet auf 8 Byte, sodass der
+Reader die Datei per np.memmap ohne Kopien lesen kann. Ein abgebrochener
+letzter Block wird beim Lesen ignoriert und beim Anhängen abgeschnitten, damit
+neue Blöcke direkt hinter dem letzten vollständigen Block stehen.
+
+Als Skript aufgerufen spielt es eine Aufnahme in der Gesten-Engine und im
+Regler-Mapping ab (in Aufnahmegeschwindigkeit oder so schnell wie möglich)
+und misst Latenz und Durchsatz, ganz ohne Kamera oder MediaPipe.
+"""
+import argparse
+import os
+import struct
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from detections import Detections
+from metrics import StageStats
+
+MAGIC = b"SMCREC01"
+CHUNK_MAGIC = b"CHNK"
+CHUNK_HEADER = struct.Struct("<4sIII")  # Magic, Frames, Hände, Erkennungen
+
+FRAME_DTYPE = np.dtype([("timestamp", "<f8"), ("hand_start", "<u4"), ("hand_count", "<u4"),
+                        ("det_start", "<u4"), ("det_count", "<u4")])
+HAND_DTYPE = np.dtype(("<f4", (21, 3)))
+DETECTION_DTYPE = np.dtype([("xyxy", "<f4", 4), ("conf", "<f4"), ("cls", "<i4"), ("id", "<i4"), ("pad", "<i4")])
+# id ungetrackter Erkennungen; Tracker vergeben nur positive IDs
+NO_ID = -1
+
+
+def _padding(size: int) -> bytes:
+    return b"\x00" * (-size % 8)
+
+
+def _scan(data: np.ndarray) -> Tuple[List[Tuple[np.ndarray, np.ndarray, np.ndarray]], int]:
+    """
+    Findet die vollständigen Blöcke hinter dem Dateikopf.
+
+    Returns:
+        (chunks, end): Arrays je Block (Sichten auf data) und das Byte-Ende des
+        letzten vollständigen Blocks.
+    """
+    chunks = []
+    position = end = len(MAGIC)
+    while position + CHUNK_HEADER.size <= len(data):
+        magic, frame_count, hand_count, det_count = CHUNK_HEADER.unpack_from(data, position)
+        if magic != CHUNK_MAGIC:
+            break
+        position += CHUNK_HEADER.size
+        arrays = []
+        for dtype, count in ((FRAME_DTYPE, frame_count), (HAND_DTYPE, hand_count), (DETECTION_DTYPE, det_count)):
+            size = dtype.itemsize * count
+            if position + size > len(data):
+                return chunks, end  # abgebrochener letzter Block
+            arrays.append(np.ndarray((count,), dtype=dtype, buffer=data, offset=position))
+            position += size + (-size % 8)
+        chunks.append(tuple(arrays))
+        end = position
+    return chunks, end
+
+
+class Recorder:
+    """
+    Schreibt Frames blockweise an eine Aufnahmedatei an.
+
+    Args:
+        path (str): Zieldatei; existiert sie, wird angehängt.
+        chunk_frames (int): Anzahl Frames pro Block.
+
+    Raises:
+        ValueError: Die vorhandene Datei ist keine Aufnahmedatei.
+    """
+
+    def __init__(self, path: str, chunk_frames: int = 256):
+        end = self._append_position(path)
+        self.file = open(path, "ab")
+        if end == 0:
+            self.file.write(MAGIC)
+        self.chunk_frames = chunk_frames
+        self._frames = []
+        self._hands = []
+        self._detections = []
+        self._hand_total = 0
+        self._det_total = 0
+
+    @staticmethod
+    def _append_position(path: str) -> int:
+        """Prüft den Kopf einer vorhandenen Datei und schneidet sie hinter dem letzten vollständigen Block ab."""
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        if size < len(MAGIC):
+            head = b""
+            if size:
+                with open(path, "rb") as f:
+                    head = f.read()
+            if not MAGIC.startswith(head):
+                raise ValueError(f"'{path}' ist keine Aufnahmedatei.")
+            end = 0  # leer oder beim Schreiben des Kopfs abgebrochen
+        else:
+            data = np.memmap(path, dtype=np.uint8, mode="r")
+            if bytes(data[:len(MAGIC)]) != MAGIC:
+                raise ValueError(f"'{path}' ist keine Aufnahmedatei.")
+            end = _scan(data)[1]
+            del data
+        if end < size:
+            os.truncate(path, end)
+        return end
+
+    def add(self, timestamp: float, hands: Optional[np.ndarray] = None, detections: Optional[Detections] = None):
+        """
+        Fügt einen Frame hinzu.
+
+        Args:
+            timestamp (float): Aufnahmezeitpunkt in Sekunden.
+            hands (np.ndarray): (H, 21, 2 oder 3) Landmarken in Pixeln.
+            detections (Detections): YOLO-Erkennungen des Frames.
+        """
+        hand_count = det_count = 0
+        if hands is not None and len(hands):
+            hands = np.asarray(hands, dtype=np.float32).reshape(len(hands), 21, -1)
+            block = np.zeros((len(hands), 21, 3), dtype=np.float32)
+            block[..., :hands.shape[2]] = hands
+            self._hands.append(block)
+            hand_count = len(hands)
+        if detections is not None and len(detections):
+            block = np.zeros(len(detections), dtype=DETECTION_DTYPE)
+            block["xyxy"] = detections.xyxy
+            block["conf"] = detections.conf
+            block["cls"] = detections.cls
+            block["id"] = detections.ids if detections.ids is not None else NO_ID
+            self._detections.append(block)
+            det_count = len(detections)
+        self._frames.append((timestamp, self._hand_total, hand_count, self._det_total, det_count))
+        self._hand_total += hand_count
+        self._det_total += det_count
+        if len(self._frames) >= self.chunk_frames:
+            self.flush()
+
+    def flush(self):
+        """Schreibt die gepufferten Frames als einen Block."""
+        if not self._frames:
+            return
+        frames = np.array(self._frames, dtype=FRAME_DTYPE)
+        hands = np.concatenate(self._hands) if self._hands else np.zeros((0, 21, 3), np.float32)
+        detections = np.concatenate(self._detections) if self._detections else np.zeros(0, DETECTION_DTYPE)
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, len(frames), len(hands), len(detections)))
+        for array in (frames, hands, detections):
+            data = array.tobytes()
+            self.file.write(data + _padding(len(data)))
+        self.file.flush()
+        self._frames, self._hands, self._detections = [], [], []
+        self._hand_total = self._det_total = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class RecordingReader:
+    """Liest eine Aufnahme per memmap; alle zurückgegebenen Arrays sind Sichten auf die Datei."""
+
+    def __init__(self, path: str):
+        self.data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"'{path}' ist keine Aufnahmedatei.")
+        self.chunks: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = _scan(self.data)[0]
+
+    def __len__(self) -> int:
+        return sum(len(frames) for frames, _, _ in self.chunks)
+
+    def frames(self) -> Iterator[Tuple[float, np.ndarray, Detections]]:
+        """
+        Liefert (timestamp, hands (H, 21, 3), Detections) für jeden Frame.
+
+        Ungetrackte Erkennungen kommen wie bei der Aufnahme mit ids=None zurück,
+        nicht als lauter NO_ID (sonst fielen sie z.B. in der UI-Brücke zu einem
+        Kreis zusammen).
+        """
+        for frames, hands, detections in self.chunks:
+            for frame in frames:
+                h0, hn = int(frame["hand_start"]), int(frame["hand_count"])
+                d0, dn = int(frame["det_start"]), int(frame["det_count"])
+                block = detections[d0:d0 + dn]
+                ids = block["id"]
+                if not len(ids) or (ids == NO_ID).all():
+                    ids = None
+                yield float(frame["timestamp"]), hands[h0:h0 + hn], Detections(
+                    block["xyxy"], block["conf"], block["cls"], ids)
+
+
+def replay(reader: RecordingReader, engine=None, mapper=None, realtime: bool = False) -> dict:
+    """
+    Spielt eine Aufnahme in der Gesten-Engine und/oder im Regler-Mapping ab.
+
+    Args:
+        reader (RecordingReader): Die Aufnahme.
+        engine (GestureEngine): Optional, erhält die Landmarken.
+        mapper (ControlMapper): Optional, erhält die Erkennungen.
+        realtime (bool): In Aufnahmegeschwindigkeit statt so schnell wie möglich abspielen.
+
+    Returns:
+        dict: Verarbeitungszeit pro Frame, Durchsatz und Anzahl Ereignisse.
+    """
+    stats = StageStats("replay", window=max(1, len(reader)))
+    events = 0
+    first_timestamp = None
+    start = time.perf_counter()
+    for timestamp, hands, detections in reader.frames():
+        if realtime:
+            if first_timestamp is None:
+                first_timestamp = timestamp
+            delay = (timestamp - first_timestamp) - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        frame_start = time.perf_counter()
+        if engine is not None:
+            events += len(engine.process(timestamp, hands))
+        if mapper is not None:
+            events += len(mapper.update(detections))
+        stats.add(time.perf_counter() - frame_start)
+    elapsed = time.perf_counter() - start
+    return {"frames": stats.count, "events": events, "elapsed_s": elapsed,
+            "fps": stats.count / elapsed if elapsed > 0 else 0.0, **stats.summary()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spielt eine Landmarken/Erkennungs-Aufnahme ohne Kamera ab.")
+    parser.add_argument("recording", help="Aufnahmedatei (.smcrec)")
+    parser.add_argument("--layout", default=None, help="Layout-Datei für das Regler-Mapping")
+    parser.add_argument("--realtime", action="store_true", help="In Aufnahmegeschwindigkeit abspielen")
+    args = parser.parse_args()
+
+    from gestures import GestureEngine
+
+    reader = RecordingReader(args.recording)
+    mapper = None
+    if args.layout:
+        from control_mapping import ControlMapper
+
+        mapper = ControlMapper.from_layout(args.layout)
+    result = replay(reader, GestureEngine(), mapper, realtime=args.realtime)
+    print(f"{result['frames']} Frames in {result['elapsed_s']:.2f} s ({result['fps']:.0f} FPS), "
+          f"{result['events']} Ereignisse")
+    if result.get("count"):
+        print(f"Verarbeitung pro Frame: mean {result['mean_ms']:.3f} ms, p50 {result['p50_ms']:.3f} ms, "
+              f"p95 {result['p95_ms']:.3f} ms, max {result['max_ms']:.3f} ms")
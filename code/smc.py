@@ -0,0 +1,75 @@
+"""
+Gemeinsamer Einstiegspunkt für alle Werkzeuge.
+
+  smc <werkzeug> [argumente]   bzw. direkt smc-<werkzeug> [argumente]
+
+Nach pip install -e . (pyproject.toml in diesem Ordner) gibt es für jedes
+Werkzeug ein eigenes Kommando (smc-live, smc-ui, ...). Die Kommandos laden
+nur dieses Modul und starten dann das Skript des Werkzeugs wie
+python <skript>.py; schwere Pakete (Ultralytics, ONNX Runtime, MediaPipe,
+FastAPI) importiert erst das Werkzeug selbst. Die UI liegt als Ordner von
+Skripten neben diesem Modul und braucht daher die editierbare Installation.
+"""
+import os
+import runpy
+import sys
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Werkzeug -> Modul in diesem Ordner
+TOOLS = {
+    "live": "test_live_cam",
+    "hands": "track_hands",
+    "fused": "fused_tracker",
+    "photos": "take_photos",
+    "calibrate": "calibration",
+    "multi": "multi_cam",
+    "prelabel": "prelabel",
+    "split": "split_train_val",
+    "pack": "image_pack",
+    "train": "erkenner_marker_ui",
+    "export": "export_profiles",
+    "bench": "bench",
+    "startup": "startup_bench",
+}
+
+
+def run_tool(tool: str, argv=None):
+    """Startet das Werkzeug tool, als wäre es mit python <skript>.py [argv] aufgerufen."""
+    argv = sys.argv[1:] if argv is None else argv
+    if tool == "ui":
+        ui_dir = os.path.join(CODE_DIR, "UI")
+        sys.path.insert(0, ui_dir)
+        path = os.path.join(ui_dir, "main.py")
+        sys.argv = [path, *argv]
+        runpy.run_path(path, run_name="__main__")
+        return
+    sys.argv = [os.path.join(CODE_DIR, TOOLS[tool] + ".py"), *argv]
+    runpy.run_module(TOOLS[tool], run_name="__main__", alter_sys=True)
+
+
+def _entry(tool: str):
+    def entry():
+        run_tool(tool)
+
+    entry.__name__ = f"{tool}_main"
+    entry.__doc__ = f"Kommando smc-{tool}."
+    return entry
+
+
+# Ein Einstiegspunkt pro Werkzeug für [project.scripts]
+ui = _entry("ui")
+for _tool in TOOLS:
+    globals()[_tool] = _entry(_tool)
+
+
+def main():
+    tools = sorted([*TOOLS, "ui"])
+    if len(sys.argv) < 2 or sys.argv[1] not in tools:
+        print(f"Aufruf: smc <werkzeug> [argumente]\nWerkzeuge: {', '.join(tools)}")
+        sys.exit(0 if len(sys.argv) >= 2 and sys.argv[1] in ("-h", "--help") else 2)
+    run_tool(sys.argv[1], sys.argv[2:])
+
+
+if __name__ == "__main__":
+    main()
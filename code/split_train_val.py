@@ -1,67 +1,271 @@
 import os
 import shutil
 import argparse
+import hashlib
+import json
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
-def split_data(source_folder, train_ratio=0.7):
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+MANIFEST_NAME = 'split_manifest.json'
+MODES = ('copy', 'hardlink', 'symlink', 'reflink', 'list')
+
+# ioctl FICLONE (Linux): teilt die Datenblöcke auf Btrfs/XFS, ohne sie zu kopieren
+FICLONE = 0x40049409
+
+
+def _file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_samples(source_folder):
+    """
+    Paart Bilder mit ihren YOLO-Labeldateien (gleicher Dateiname, Endung .txt).
+
+    Returns:
+        dict: Name ohne Endung -> Liste der Dateinamen (Bild zuerst, dann Label, falls vorhanden).
+    """
+    files = [f for f in os.listdir(source_folder) if os.path.isfile(os.path.join(source_folder, f))]
+    images = {}
+    labels = set()
+    for f in files:
+        stem, ext = os.path.splitext(f)
+        if ext.lower() in IMAGE_EXTENSIONS:
+            images[stem] = f
+        elif ext.lower() == '.txt':
+            labels.add(stem)
+    samples = {}
+    for stem in sorted(images):
+        samples[stem] = [images[stem]] + ([stem + '.txt'] if stem in labels else [])
+    orphans = sorted(labels - set(images) - {'train', 'val', 'classes'})
+    if orphans:
+        print(f"Warnung: {len(orphans)} Labeldateien ohne Bild werden ignoriert (z.B. '{orphans[0]}.txt').")
+    return samples
+
+
+def read_classes(label_path):
+    """Liest die Klassen-IDs einer YOLO-Labeldatei."""
+    classes = set()
+    with open(label_path, 'r') as f:
+        for line in f:
+            parts = line.split()
+            if parts:
+                classes.add(int(float(parts[0])))
+    return classes
+
+
+def stratified_split(samples, classes, train_ratio, seed=0, existing=None):
     """
-    Teilt Dateien aus einem Quellordner in 'train'- und 'val'-Datensätze auf.
+    Teilt die Samples pro Schicht im Verhältnis train_ratio auf.
+
+    Die Schicht eines Samples ist seine seltenste Marker-Klasse, sodass auch
+    seltene Marker in beiden Teilen vorkommen. Bilder ohne Label bilden eine
+    eigene Schicht.
+
+    Bereits zugeordnete Samples (existing) behalten ihre Seite, zählen aber zu
+    ihrer Schicht: neue Samples füllen pro Schicht zuerst das Defizit von
+    'train' gegenüber train_ratio auf, der Rest geht nach 'val'. So bleibt das
+    Verhältnis auch erhalten, wenn Samples einzeln hinzukommen.
+
+    Args:
+        samples (list): Namen der neu zuzuordnenden Samples.
+        classes (dict): Name -> Menge der Klassen-IDs im Label (auch für existing).
+        train_ratio (float): Anteil für 'train'.
+        seed (int): Startwert für die reproduzierbare Mischung.
+        existing (dict): Name -> 'train' oder 'val' der bereits zugeordneten Samples.
+
+    Returns:
+        dict: Name -> 'train' oder 'val' für die Namen aus samples.
+    """
+    existing = existing or {}
+    everything = list(existing) + [stem for stem in samples if stem not in existing]
+    frequency = Counter(c for stem in everything for c in classes.get(stem, ()))
+    strata = {}
+    for stem in sorted(everything):
+        present = classes.get(stem)
+        key = min(present, key=lambda c: (frequency[c], c)) if present else -1
+        strata.setdefault(key, []).append(stem)
+    rng = random.Random(seed)
+    assignment = {}
+    for key in sorted(strata):
+        members = [stem for stem in strata[key] if stem not in existing]
+        rng.shuffle(members)
+        total = len(strata[key])
+        num_train = int(round(total * train_ratio)) - sum(existing.get(stem) == 'train' for stem in strata[key])
+        num_train = min(max(num_train, 0), len(members))
+        for i, stem in enumerate(members):
+            assignment[stem] = 'train' if i < num_train else 'val'
+    return assignment
+
+
+def _reflink(src_path, dst_path):
+    import fcntl
+
+    with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(src_path, dst_path)
+
+
+def _materialize(src_path, dst_path, mode):
+    """Legt dst_path als Kopie, Link oder Reflink von src_path an."""
+    if os.path.lexists(dst_path):
+        os.unlink(dst_path)
+    if mode == 'hardlink':
+        os.link(src_path, dst_path)
+    elif mode == 'symlink':
+        os.symlink(os.path.relpath(src_path, os.path.dirname(dst_path)), dst_path)
+    elif mode == 'reflink':
+        try:
+            _reflink(src_path, dst_path)
+        except (OSError, ImportError):
+            # Dateisystem ohne Reflinks: normale Kopie
+            shutil.copy2(src_path, dst_path)
+    else:
+        shutil.copy2(src_path, dst_path)  # copy2 behält Metadaten wie Erstellungs-/Änderungsdatum
+
+
+def _remove(path):
+    if os.path.lexists(path):
+        os.unlink(path)
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Manifest '{path}' nicht lesbar, es wird neu aufgebaut: {e}")
+        return {}
+
+
+def split_data(source_folder, train_ratio=0.7, mode='copy', seed=0, workers=8, stratify=True):
+    """
+    Teilt Bild/Label-Paare aus einem Quellordner in 'train'- und 'val'-Datensätze auf.
+
+    Bild und Label eines Samples landen immer auf derselben Seite; die
+    Aufteilung ist nach Marker-Klassen geschichtet. Statt zu kopieren können
+    Hardlinks, Symlinks oder Reflinks angelegt oder nur die Listen train.txt
+    und val.txt im Ultralytics-Format geschrieben werden. Verbleibende Kopien
+    laufen in einem Thread-Pool.
+
+    Ein Manifest (split_manifest.json) mit Größe, Änderungszeit und SHA-1 jeder
+    Datei macht erneute Läufe inkrementell: bekannte Samples behalten ihre
+    Seite, unveränderte Dateien werden übersprungen, entfernte Samples aus den
+    Zielordnern gelöscht.
 
     Args:
         source_folder (str): Der Pfad zum Ordner, der die Originaldateien enthält.
-        train_ratio (float): Der Anteil der Dateien, der in den 'train'-Ordner kopiert werden soll (z.B. 0.7 für 70%).
+        train_ratio (float): Der Anteil der Samples für den 'train'-Ordner (z.B. 0.7 für 70%).
                              Der Rest geht in den 'val'-Ordner.
+        mode (str): 'copy', 'hardlink', 'symlink', 'reflink' oder 'list' (nur train.txt/val.txt).
+        seed (int): Startwert für die reproduzierbare Mischung.
+        workers (int): Threads für Hashes und Kopien.
+        stratify (bool): Nach Marker-Klassen schichten (sonst eine Schicht).
     """
     if not os.path.isdir(source_folder):
         print(f"Fehler: Der Quellordner '{source_folder}' existiert nicht.")
         return
-
-    # Zielordner erstellen
-    train_folder = os.path.join(source_folder, 'train')
-    val_folder = os.path.join(source_folder, 'val')
-
-    os.makedirs(train_folder, exist_ok=True)
-    os.makedirs(val_folder, exist_ok=True)
-
-    # Alle Dateien im Quellordner auflisten (Unterordner werden ignoriert)
-    files = [f for f in os.listdir(source_folder) if os.path.isfile(os.path.join(source_folder, f))]
-    
-    if not files:
-        print(f"Keine Dateien im Ordner '{source_folder}' gefunden, die aufgeteilt werden könnten.")
+    if mode not in MODES:
+        print(f"Fehler: Unbekannter Modus '{mode}' (erlaubt: {', '.join(MODES)}).")
         return
 
-    # Dateien sortieren, damit die Namesgleichheit von images und labeln gegeben
-    files.sort()    
+    samples = find_samples(source_folder)
+    if not samples:
+        print(f"Keine Bilder im Ordner '{source_folder}' gefunden, die aufgeteilt werden könnten.")
+        return
 
-    # Aufteilungsindex berechnen
-    num_files = len(files)
-    num_train = int(num_files * train_ratio)
+    manifest_path = os.path.join(source_folder, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+    known = manifest.get('samples', {})
+    # Anderes Verhältnis oder anderer Seed: alle Samples neu zuordnen
+    reassign = manifest.get('ratio') != train_ratio or manifest.get('seed') != seed
 
-    # Dateien aufteilen
-    train_files = files[:num_train]
-    val_files = files[num_train:]
+    # Hashes nur für neue oder geänderte Dateien (Größe/Änderungszeit) berechnen
+    stats = {}
+    to_hash = []
+    for stem, names in samples.items():
+        for name in names:
+            st = os.stat(os.path.join(source_folder, name))
+            stats[name] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+            previous = known.get(stem, {}).get('files', {}).get(name)
+            if previous and previous['size'] == st.st_size and previous['mtime_ns'] == st.st_mtime_ns:
+                stats[name]['sha1'] = previous['sha1']
+            else:
+                to_hash.append(name)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for name, digest in zip(to_hash, pool.map(lambda n: _file_hash(os.path.join(source_folder, n)), to_hash)):
+            stats[name]['sha1'] = digest
 
-    print(f"Gesamtanzahl der Dateien: {num_files}")
-    print(f"Anzahl der Dateien für 'train': {len(train_files)}")
-    print(f"Anzahl der Dateien für 'val': {len(val_files)}")
+    keep = {} if reassign else {stem: entry['split'] for stem, entry in known.items() if stem in samples}
+    new = [stem for stem in samples if stem not in keep]
+    classes = {}
+    if stratify and new:
+        # Auch die bekannten Samples: sie bestimmen das Defizit ihrer Schicht
+        for stem, names in samples.items():
+            if len(names) > 1:
+                classes[stem] = read_classes(os.path.join(source_folder, names[1]))
+    assignment = dict(keep)
+    assignment.update(stratified_split(new, classes, train_ratio, seed, existing=keep))
 
-    # Dateien in die entsprechenden Ordner kopieren
-    print("\nKopiere Dateien in den 'train'-Ordner...")
-    for file_name in train_files:
-        src_path = os.path.join(source_folder, file_name)
-        dst_path = os.path.join(train_folder, file_name)
-        shutil.copy2(src_path, dst_path) # copy2 behält Metadaten wie Erstellungs-/Änderungsdatum
+    train_stems = [stem for stem in samples if assignment[stem] == 'train']
+    val_stems = [stem for stem in samples if assignment[stem] == 'val']
+    print(f"Gesamtanzahl der Samples: {len(samples)} ({len(new)} neu)")
+    print(f"Anzahl der Samples für 'train': {len(train_stems)}")
+    print(f"Anzahl der Samples für 'val': {len(val_stems)}")
 
-    print("Kopieren in den 'train'-Ordner abgeschlossen.")
+    if mode == 'list':
+        # Ultralytics liest Listen von Bildpfaden; die Labels liegen daneben
+        for split, stems in (('train', train_stems), ('val', val_stems)):
+            with open(os.path.join(source_folder, f'{split}.txt'), 'w') as f:
+                f.writelines(os.path.abspath(os.path.join(source_folder, samples[stem][0])) + '\n'
+                             for stem in stems)
+        print("Listen 'train.txt' und 'val.txt' geschrieben.")
+    else:
+        for split in ('train', 'val'):
+            os.makedirs(os.path.join(source_folder, split), exist_ok=True)
+        jobs = []
+        for stem, names in samples.items():
+            previous = known.get(stem, {})
+            split = assignment[stem]
+            for name in names:
+                dst_path = os.path.join(source_folder, split, name)
+                unchanged = (previous.get('split') == split and previous.get('mode') == mode
+                             and previous.get('files', {}).get(name, {}).get('sha1') == stats[name]['sha1']
+                             and os.path.lexists(dst_path))
+                if not unchanged:
+                    jobs.append((os.path.join(source_folder, name), dst_path))
+            # Seitenwechsel: alte Dateien auf der anderen Seite entfernen
+            if previous.get('split') and previous['split'] != split:
+                for name in previous.get('files', {}):
+                    _remove(os.path.join(source_folder, previous['split'], name))
+        for stem, entry in known.items():
+            if stem not in samples:
+                for name in entry.get('files', {}):
+                    _remove(os.path.join(source_folder, entry.get('split', 'train'), name))
 
-    print("\nKopiere Dateien in den 'val'-Ordner...")
-    for file_name in val_files:
-        src_path = os.path.join(source_folder, file_name)
-        dst_path = os.path.join(val_folder, file_name)
-        shutil.copy2(src_path, dst_path)
+        print(f"\nLege {len(jobs)} Dateien an ({mode}), {sum(map(len, samples.values())) - len(jobs)} unverändert...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda job: _materialize(job[0], job[1], mode), jobs))
 
-    print("Kopieren in den 'val'-Ordner abgeschlossen.")
+    manifest = {
+        'ratio': train_ratio,
+        'seed': seed,
+        'samples': {stem: {'split': assignment[stem], 'mode': mode,
+                           'files': {name: stats[name] for name in names}}
+                    for stem, names in samples.items()},
+    }
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
     print("\nDatenaufteilung erfolgreich!")
 
+
 # --- Beispielhafte Nutzung ---
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -78,8 +282,31 @@ if __name__ == "__main__":
         default=0.7,
         help="ratio"
     )
+    parser.add_argument(
+        "--mode",
+        choices=MODES,
+        default="copy",
+        help="copy, hardlink, symlink, reflink or list (write train.txt/val.txt only)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="shuffle seed"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="threads for hashing and copying"
+    )
+    parser.add_argument(
+        "--no-stratify",
+        action="store_true",
+        help="do not stratify by marker class"
+    )
 
     args = parser.parse_args()
 
     # Führe die Funktion mit den Kommandozeilenargumenten aus
-    split_data(args.source_folder, args.ratio)
\ No newline at end of file
+    split_data(args.source_folder, args.ratio, args.mode, args.seed, args.workers, not args.no_stratify)
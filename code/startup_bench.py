@@ -0,0 +1,202 @@
+"""
+Startzeit der Werkzeuge: Importzeiten und Zeit bis zum ersten gezeichneten Bild.
+
+  import       python -X importtime <skript> --help: alle Importe auf Modulebene
+               (argparse beendet danach). Ausgegeben werden die gesamte Importzeit
+               und die teuersten Pakete.
+  first frame  Das Werkzeug läuft mit SMC_STARTUP_PROBE=1 und meldet über
+               metrics.mark_first_frame sein erstes gezeichnetes Bild. Gemessen wird
+               vom Start des Prozesses bis zu dieser Meldung, über --repeat Läufe
+               (p50/p95 in ms).
+
+Ziel ist, dass nach einem Neustart der Installation schnell wieder ein Bild zu
+sehen ist: liegt der Median über dem Budget (BUDGET_MS bzw. --budget-ms), endet
+das Skript mit Exit-Code 1, ebenso bei einer Regression gegenüber --baseline
+(Vergleich wie in bench.py).
+
+  python startup_bench.py --targets ui photos
+  python startup_bench.py --targets live fused --model marker_ui_best.onnx --out startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import FIRST_FRAME_TAG, STARTUP_PROBE
+
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+UI_DIR = os.path.join(CODE_DIR, "UI")
+
+# Ziel für die Zeit bis zum ersten Bild in ms (Median), ohne und mit Modell
+BUDGET_MS = {"ui": 1500, "photos": 1500, "hands": 2500, "live": 2500, "fused": 3000}
+
+
+def parse_importtime(stderr: str) -> Tuple[float, List[Tuple[str, float]]]:
+    """Gibt die gesamte Importzeit (ms) und die Pakete der obersten Ebene nach kumulierter Zeit zurück."""
+    total = 0.0
+    top = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total += int(self_us)
+        if not name[1:].startswith(" "):  # eingerückt = von einem anderen Paket importiert
+            top.append((name.strip(), int(cumulative_us) / 1000.0))
+    top.sort(key=lambda item: -item[1])
+    return total / 1000.0, top
+
+
+def import_time(script: List[str], cwd: str) -> Tuple[float, List[Tuple[str, float]]]:
+    result = subprocess.run([sys.executable, "-X", "importtime", *script, "--help"], cwd=cwd,
+                            capture_output=True, text=True)
+    return parse_importtime(result.stderr)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def first_frame(command: List[str], cwd: str, env: Dict[str, str], timeout: float = 60.0) -> Optional[float]:
+    """Startet command und gibt die Zeit bis zur Meldung des ersten Bildes in ms zurück (None ohne Meldung)."""
+    lines = queue.Queue()
+    started = time.time()
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                               text=True, start_new_session=True)
+
+    def read():
+        for line in process.stdout:
+            lines.put(line)
+        lines.put(None)
+
+    threading.Thread(target=read, daemon=True).start()
+    result = None
+    deadline = started + timeout
+    try:
+        while time.time() < deadline:
+            try:
+                line = lines.get(timeout=max(0.0, deadline - time.time()))
+            except queue.Empty:
+                break
+            if line is None:
+                break
+            if line.startswith(FIRST_FRAME_TAG):
+                result = (float(line.split()[2]) - started) * 1000.0
+                break
+    finally:
+        # Ganze Prozessgruppe beenden (UI: Server plus Fensterprozess), erst freundlich
+        try:
+            os.killpg(process.pid, signal.SIGINT)
+            process.wait(timeout=5.0)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    return result
+
+
+def targets(model: Optional[str], state_dir: str) -> Dict[str, Tuple[List[str], str, List[str]]]:
+    """Name -> (Skript mit Argumenten für den Bildtest, Arbeitsverzeichnis, Skript für die Importzeit)."""
+    config = os.path.join(state_dir, "config.json")
+    with open(config, "w") as f:
+        json.dump({"background_image": os.path.join(UI_DIR, "background.png"),
+                   "state_file": os.path.join(state_dir, "circles_state.json")}, f)
+    result = {
+        "ui": (["main.py", "--config", config, "--port", str(_free_port())], UI_DIR, ["main.py"]),
+        "photos": (["take_photos.py", "--source", "synthetic", "--audio", "null", "--headless",
+                    "--output_dir", os.path.join(state_dir, "photos"), "--interval_ms", "3600000"],
+                   CODE_DIR, ["take_photos.py"]),
+        "hands": (["track_hands.py", "--source", "synthetic"], CODE_DIR, ["track_hands.py"]),
+    }
+    if model:
+        result["live"] = (["test_live_cam.py", "--source", "synthetic", "--headless", "--model", model],
+                          CODE_DIR, ["test_live_cam.py"])
+        result["fused"] = (["fused_tracker.py", "--source", "synthetic", "--headless", "--model", model],
+                           CODE_DIR, ["fused_tracker.py"])
+    return result
+
+
+def run(names: List[str], model: Optional[str] = None, repeat: int = 3, top: int = 5,
+        window: bool = False) -> Dict[str, Dict]:
+    env = dict(os.environ, **{STARTUP_PROBE: "1"})
+    if not window:
+        env.setdefault("SDL_VIDEODRIVER", "dummy")
+    results = {}
+    with tempfile.TemporaryDirectory() as state_dir:
+        available = targets(model, state_dir)
+        for name in names:
+            if name not in available:
+                print(f"{name}: übersprungen (benötigt --model)")
+                continue
+            command, cwd, script = available[name]
+            total_ms, packages = import_time(script, cwd)
+            times = [first_frame([sys.executable, *command], cwd, env) for _ in range(repeat)]
+            measured = np.array([t for t in times if t is not None])
+            result = {"import_ms": total_ms, "top_imports": [[p, ms] for p, ms in packages[:top]],
+                      "runs": len(measured)}
+            if len(measured):
+                p50, p95 = np.percentile(measured, [50, 95])
+                result.update(p50_ms=float(p50), p95_ms=float(p95), max_ms=float(measured.max()))
+            results[name] = result
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importzeiten und Zeit bis zum ersten Bild der Werkzeuge.")
+    parser.add_argument("--targets", nargs="+", choices=sorted(BUDGET_MS), default=["ui", "photos"],
+                        help="Zu messende Werkzeuge (Standard: ui photos; live/fused benötigen --model)")
+    parser.add_argument("--model", default=None, help="Marker-Modell für live und fused")
+    parser.add_argument("--repeat", type=int, default=3, help="Starts pro Werkzeug")
+    parser.add_argument("--top", type=int, default=5, help="Anzahl der teuersten Importe in der Ausgabe")
+    parser.add_argument("--window", action="store_true",
+                        help="Echtes Fenster statt SDL-Dummy-Treiber für die UI")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Budget für die Zeit bis zum ersten Bild (Standard: BUDGET_MS je Werkzeug)")
+    parser.add_argument("--out", default="startup_results.json", help="Ergebnisdatei (JSON)")
+    parser.add_argument("--baseline", default=None, help="Baseline-Datei zum Vergleich")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Erlaubte Verschlechterung (0.15 = 15 %%)")
+    args = parser.parse_args()
+
+    results = run(args.targets, args.model, args.repeat, args.top, args.window)
+    status = 0
+    for name, r in results.items():
+        budget = args.budget_ms or BUDGET_MS[name]
+        imports = ", ".join(f"{package} {ms:.0f}" for package, ms in r["top_imports"])
+        print(f"{name:<7} Importe {r['import_ms']:7.0f} ms  ({imports})")
+        if "p50_ms" not in r:
+            print(f"{'':<7} kein erstes Bild gemeldet (Anzeige nötig oder Start fehlgeschlagen)")
+            status = 1
+            continue
+        over = r["p50_ms"] > budget
+        print(f"{'':<7} erstes Bild p50 {r['p50_ms']:7.0f} ms, p95 {r['p95_ms']:7.0f} ms  "
+              f"(Budget {budget:.0f} ms{', ÜBERSCHRITTEN' if over else ''})")
+        r["budget_ms"] = budget
+        status = status or int(over)
+
+    output = {"meta": {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+                       "machine": platform.machine(), "node": platform.node(), "model": args.model},
+              "results": results}
+    with open(args.out, "w") as f:
+        json.dump(output, f, indent=2)
+
+    if args.baseline and os.path.exists(args.baseline):
+        from bench import compare
+
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, key, before, after, change in regressions:
+            print(f"REGRESSION {name}.{key}: {before:.0f} -> {after:.0f} ms ({100 * change:+.1f} %)")
+        status = status or int(bool(regressions))
+    sys.exit(status)
@@ -1,30 +1,175 @@
+"""
+Nimmt Bilder von der Kamera für den Datensatz auf.
+
+Die Vorschau läuft ungebremst weiter, während gespeichert wird: Frames gehen
+über eine begrenzte Queue an einen Pool von Writer-Threads, die JPEG/PNG
+kodieren und schreiben. Ist die Queue voll, wird der Frame verworfen und
+gezählt, statt die Aufnahme anzuhalten. Der Piepton wird einmal vorberechnet
+und ohne Warten abgespielt.
+
+Im Burst-Modus wird jeder Frame mit Kamera-Bildrate gespeichert. Für
+Durchsatzmessungen ohne Kamera und Lautsprecher:
+
+  python take_photos.py --source synthetic --audio null --headless --burst --max_frames 500
+"""
 import cv2
 import time
 import os
 import argparse
-import simpleaudio as sa # Für die Soundausgabe
-import numpy as np; 
+import queue
+import threading
+import numpy as np
+
+from frame_source import open_source
+from metrics import StageStats, mark_first_frame
 
 cam_num = 0
 
 
-def play_sound():
-    """Spielt einen kurzen Piepton ab."""
-    frequency = 800  # Hz
-    duration = 0.1   # Sekunden
-    samplerate = 44100  # Samples pro Sekunde
+class NullAudio:
+    """Audio-Backend ohne Ausgabe (für Tests und Rechner ohne Soundkarte)."""
+
+    def __init__(self):
+        self.plays = 0
+
+    def play_buffer(self, audio, num_channels, bytes_per_sample, samplerate):
+        self.plays += 1
+        return None
+
+
+def load_audio(backend="simpleaudio"):
+    """Gibt das Audio-Backend zurück; fällt auf NullAudio zurück, wenn simpleaudio fehlt."""
+    if backend == "null":
+        return NullAudio()
+    try:
+        import simpleaudio as sa  # Für die Soundausgabe
+    except ImportError:
+        print("simpleaudio nicht installiert, Aufnahme ohne Ton.")
+        return NullAudio()
+    return sa
+
+
+class Beeper:
+    """Kurzer Piepton, einmal vorberechnet und ohne Warten abgespielt."""
+
+    def __init__(self, audio=None, frequency=800, duration=0.1, samplerate=44100):
+        self.audio = audio if audio is not None else load_audio()
+        self.samplerate = samplerate
+        t = np.linspace(0, duration, int(samplerate * duration), False)
+        # Sinuswelle, auf den 16-Bit-Bereich normiert
+        self.buffer = (np.sin(2 * np.pi * frequency * t) * (2**15 - 1)).astype(np.int16)
+        self._playing = None
+
+    def play(self):
+        # Ein noch laufender Ton wird abgebrochen statt abgewartet
+        if self._playing is not None and self._playing.is_playing():
+            self._playing.stop()
+        self._playing = self.audio.play_buffer(self.buffer, 1, 2, self.samplerate)
+
+
+_default_beeper = None
+
+
+def play_sound(beeper=None):
+    """Spielt einen kurzen Piepton ab, ohne zu blockieren."""
+    global _default_beeper
+    if beeper is None:
+        if _default_beeper is None:
+            _default_beeper = Beeper()
+        beeper = _default_beeper
+    beeper.play()
+
+
+class ImageWriter:
+    """
+    Kodiert und speichert Frames in Writer-Threads.
+
+    Args:
+        workers (int): Anzahl Writer-Threads (cv2.imencode gibt den GIL frei).
+        queue_size (int): Maximal wartende Frames; darüber wird verworfen.
+        quality (int): JPEG-Qualität (0-100).
+        png_compression (int): zlib-Stufe für .png (0-9). Stufe 1 kodiert ein 1280x720-Bild
+                               etwa dreimal so schnell wie 9 bei kaum größeren Dateien.
+    """
+
+    def __init__(self, workers=2, queue_size=32, quality=95, png_compression=1):
+        self.quality = quality
+        self.png_compression = png_compression
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stats = StageStats("write")
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._run, name=f"writer-{i}", daemon=True) for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, path, frame, copy=False):
+        """
+        Reiht einen Frame zum Speichern ein, ohne zu warten.
 
-    t = np.linspace(0, duration, int(samplerate * duration), False)
-    # Generiere eine Sinuswelle mit angegebener Frequenz und Amplitude
-    audio = 0.5 * np.sin(2 * np.pi * frequency * t)
-    # Konvertiere zu 16-Bit-Integern
-    audio = audio * (2**15 - 1) / np.max(np.abs(audio))
-    audio = audio.astype(np.int16)
+        Ohne copy darf der Frame danach nicht mehr verändert werden. Mit copy
+        wird er kopiert, aber nur, wenn er auch angenommen wird (für Frames aus
+        dem Pufferring einer Quelle, die bald überschrieben werden).
 
-    play_obj = sa.play_buffer(audio, 1, 2, samplerate)
-    play_obj.wait_done()
+        Returns:
+            bool: False, wenn die Queue voll war und der Frame verworfen wurde.
+        """
+        try:
+            # Nur ein Thread reiht ein: ist die Queue jetzt nicht voll, wird put_nowait nicht scheitern
+            if self.queue.full():
+                raise queue.Full
+            self.queue.put_nowait((path, frame.copy() if copy else frame))
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
 
-def capture_images(output_dir, base_filename, interval_ms):
+    def _encode(self, path, frame):
+        ext = os.path.splitext(path)[1].lower()
+        if ext == ".png":
+            params = [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        else:
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.quality]
+        success, data = cv2.imencode(ext, frame, params)
+        if not success:
+            raise OSError(f"Kodieren fehlgeschlagen: {path}")
+        return data
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            path, frame = item
+            start = time.perf_counter()
+            try:
+                data = self._encode(path, frame)
+                with open(path, "wb") as f:
+                    f.write(data.tobytes())
+                self.stats.add(time.perf_counter() - start)
+                with self._lock:
+                    self.written += 1
+            except OSError as e:
+                print(f"Fehler beim Speichern von '{path}': {e}")
+                with self._lock:
+                    self.errors += 1
+            self.queue.task_done()
+
+    def close(self):
+        """Schreibt alle wartenden Frames und beendet die Threads."""
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+
+def capture_images(output_dir, base_filename, interval_ms, source=cam_num, burst=False, ext="jpg",
+                   workers=2, queue_size=32, quality=95, audio="simpleaudio", headless=False, max_frames=None,
+                   width=None, height=None, fps=None, fourcc=None, png_compression=1):
     """
     Nimmt Bilder von der USB-Kamera auf und speichert sie.
 
@@ -32,51 +177,94 @@ def capture_images(output_dir, base_filename, interval_ms):
         output_dir (str): Das Verzeichnis, in dem die Bilder gespeichert werden.
         base_filename (str): Der Basisname für die Bilddateien.
         interval_ms (int): Das Aufnahmeintervall in Millisekunden.
+        source: Kamera-Index, Videodatei, Bildordner oder "synthetic".
+        burst (bool): Jeden Frame speichern (Kamera-Bildrate), ohne Piepton pro Bild.
+        ext (str): "jpg" oder "png".
+        workers (int): Anzahl Writer-Threads.
+        queue_size (int): Maximal wartende Frames, darüber wird verworfen.
+        quality (int): JPEG-Qualität (0-100).
+        audio (str): "simpleaudio" oder "null".
+        headless (bool): Keine Vorschau anzeigen.
+        max_frames (int): Optional, nach dieser Anzahl Kamera-Frames beenden.
+        width, height (int): Optional, gewünschte Kameraauflösung.
+        fps (float): Optional, gewünschte Bildrate.
+        fourcc (str): Optional, Pixelformat der Kamera ("MJPG" oder "YUYV").
+        png_compression (int): zlib-Stufe für PNG (0-9, Standard 1: schnell genug für burst).
+
+    Returns:
+        dict: Anzahl Frames, gespeicherte und verworfene Bilder, Laufzeit.
     """
     # Erstelle das Ausgabeverzeichnis, falls es nicht existiert
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
     # Initialisiere die Kamera
-    cap = cv2.VideoCapture(cam_num)  # 0 steht für die Standard-USB-Kamera
+    cap = open_source(source, width, height, fps, fourcc)
 
     if not cap.isOpened():
         print("Fehler: Kamera konnte nicht geöffnet werden.")
         return
 
+    beeper = Beeper(load_audio(audio))
+    writer = ImageWriter(workers, queue_size, quality, png_compression)
     image_counter = 1
+    frames = 0
     last_capture_time = time.time() * 1000  # Aktuelle Zeit in Millisekunden
+    started = time.perf_counter()
 
     print(f"Starte Bildaufnahme. Drücken Sie 'q', um das Programm zu beenden.")
+    if burst:
+        beeper.play()
 
     while True:
         ret, frame = cap.read()
 
         if not ret:
-            print("Fehler: Konnte keinen Frame von der Kamera lesen.")
+            if frames == 0:
+                print("Fehler: Konnte keinen Frame von der Kamera lesen.")
             break
-
-        # Aktuelles Bild anzeigen
-        cv2.imshow("Aktuelles Bild (Druecke 'q' zum Beenden)", frame)
+        frames += 1
 
         current_time = time.time() * 1000
-        if current_time - last_capture_time >= interval_ms:
+        if burst or current_time - last_capture_time >= interval_ms:
             # Dateiname mit führenden Nullen
-            filename = os.path.join(output_dir, f"{base_filename}{image_counter:04d}.jpg")
-            cv2.imwrite(filename, frame)
-            print(f"Bild gespeichert: {filename}")
-            play_sound() # Ton nach dem Speichern abspielen
-            image_counter += 1
+            filename = os.path.join(output_dir, f"{base_filename}{image_counter:04d}.{ext}")
+            # Kopie, weil die Quelle ihre Frame-Puffer wiederverwendet
+            if writer.submit(filename, frame, copy=True):
+                image_counter += 1
+                if not burst:
+                    print(f"Bild gespeichert: {filename}")
+                    beeper.play()  # Ton nach dem Einreihen, ohne zu warten
             last_capture_time = current_time
 
+        if max_frames is not None and frames >= max_frames:
+            break
+        if headless:
+            mark_first_frame("photos")  # ohne Vorschau zählt der erste gelesene Frame
+            continue
+
+        # Aktuelles Bild anzeigen
+        cv2.imshow("Aktuelles Bild (Druecke 'q' zum Beenden)", frame)
+        mark_first_frame("photos")
+
         # Beenden bei Tastendruck 'q'
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
-    # Kamera und Fenster schließen
+    # Kamera und Fenster schließen, ausstehende Bilder noch schreiben
     cap.release()
-    cv2.destroyAllWindows()
-    print("Bildaufnahme beendet.")
+    if not headless:
+        cv2.destroyAllWindows()
+    writer.close()
+    elapsed = time.perf_counter() - started
+    report = {"frames": frames, "written": writer.written, "dropped": writer.dropped, "errors": writer.errors,
+              "elapsed_s": elapsed, "write": writer.stats.summary()}
+    print(f"Bildaufnahme beendet: {frames} Frames ({frames / max(elapsed, 1e-9):.1f} fps), "
+          f"{writer.written} gespeichert, {writer.dropped} verworfen")
+    if report["write"].get("count"):
+        print(f"Kodieren+Schreiben p50 {report['write']['p50_ms']:.1f} ms, p95 {report['write']['p95_ms']:.1f} ms")
+    return report
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Nimmt Bilder von einer USB-Kamera auf und speichert sie.")
@@ -86,7 +274,37 @@ if __name__ == "__main__":
                         help="Der Basisname für die Bilddateien. (Standard: bild)")
     parser.add_argument("--interval_ms", type=int, default=3000,
                         help="Das Aufnahmeintervall in Millisekunden. (Standard: 3000 ms, also 3 Sekunden)")
+    parser.add_argument("--source", default=str(cam_num),
+                        help="Kamera-Index, Videodatei, Bildordner oder 'synthetic' (Standard: 0)")
+    parser.add_argument("--burst", action="store_true",
+                        help="Jeden Frame mit Kamera-Bildrate speichern")
+    parser.add_argument("--format", choices=("jpg", "png"), default="jpg",
+                        help="Bildformat (Standard: jpg)")
+    parser.add_argument("--quality", type=int, default=95,
+                        help="JPEG-Qualität 0-100 (Standard: 95)")
+    parser.add_argument("--png_compression", type=int, default=1, choices=range(10), metavar="0-9",
+                        help="PNG-Kompressionsstufe; höhere Stufen sind deutlich langsamer (Standard: 1)")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="Anzahl Writer-Threads (Standard: 2)")
+    parser.add_argument("--queue_size", type=int, default=32,
+                        help="Maximal wartende Bilder, darüber wird verworfen (Standard: 32)")
+    parser.add_argument("--audio", choices=("simpleaudio", "null"), default="simpleaudio",
+                        help="Audio-Backend für den Piepton (Standard: simpleaudio)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Keine Vorschau anzeigen")
+    parser.add_argument("--max_frames", type=int, default=None,
+                        help="Nach dieser Anzahl Frames beenden")
+    parser.add_argument("--width", type=int, default=None,
+                        help="Gewünschte Kamerabreite in Pixeln (Standard: Treiberstandard)")
+    parser.add_argument("--height", type=int, default=None,
+                        help="Gewünschte Kamerahöhe in Pixeln (Standard: Treiberstandard)")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="Gewünschte Bildrate (Standard: Treiberstandard)")
+    parser.add_argument("--fourcc", choices=("MJPG", "YUYV"), default=None,
+                        help="Pixelformat der Kamera (Standard: Treiberstandard)")
 
     args = parser.parse_args()
 
-    capture_images(args.output_dir, args.base_filename, args.interval_ms)
\ No newline at end of file
+    capture_images(args.output_dir, args.base_filename, args.interval_ms, args.source, args.burst, args.format,
+                   args.workers, args.queue_size, args.quality, args.audio, args.headless, args.max_frames,
+                   args.width, args.height, args.fps, args.fourcc, args.png_compression)
@@ -1,25 +1,154 @@
+import argparse
+
 import cv2
-from ultralytics import YOLO
 
-model = YOLO('marker_ui_best.pt')
-#model = YOLO('best.onnx')
+from detections import Detections, draw_detections, load_detector
+from frame_source import open_source
+from metrics import mark_first_frame
+from pipeline import Pipeline, format_report, in_background
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live-Erkennung der Marker mit YOLO.")
+    parser.add_argument("--source", default="0",
+                        help="Kamera-Index, Videodatei, Stream-URL oder Bildordner (Standard: 0)")
+    parser.add_argument("--model", default="marker_ui_best.pt",
+                        help="Pfad zum Modell (.pt über Ultralytics, .onnx über ONNX Runtime)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Kein Fenster öffnen (für Benchmarks)")
+    parser.add_argument("--lossless", action="store_true",
+                        help="Keine Frames verwerfen, jede Stufe wartet auf die nächste")
+    parser.add_argument("--layout", default=None,
+                        help="Layout-Datei: Reglerwerte als OSC über UDP senden (siehe layout_example.json)")
+    parser.add_argument("--gate", action="store_true",
+                        help="Inferenz nur bei Bewegung und nur auf den geänderten Kacheln")
+    parser.add_argument("--roi", type=int, nargs=4, default=None,
+                        help="Interface-Bereich x1 y1 x2 y2 für --gate (Standard: ganzer Frame)")
+    parser.add_argument("--record", default=None,
+                        help="Erkennungen mit Zeitstempel in diese Aufnahmedatei schreiben (.smcrec)")
+    parser.add_argument("--ui", default=None,
+                        help="Marker als Kreise an die UI senden, z.B. ws://127.0.0.1:8000/ws/circles")
+    parser.add_argument("--calibration", default=None,
+                        help="Kalibrierung Kamera -> Bogen aus calibration.py (für --ui und --rectify)")
+    parser.add_argument("--rectify", action="store_true",
+                        help="Frames vor der Inferenz mit der Kalibrierung auf den Bogen entzerren")
+    parser.add_argument("--width", type=int, default=None,
+                        help="Gewünschte Kamerabreite in Pixeln, z.B. 1920 (Standard: Treiberstandard)")
+    parser.add_argument("--height", type=int, default=None,
+                        help="Gewünschte Kamerahöhe in Pixeln, z.B. 1080 (Standard: Treiberstandard)")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="Gewünschte Bildrate (Standard: Treiberstandard)")
+    parser.add_argument("--fourcc", choices=("MJPG", "YUYV"), default=None,
+                        help="Pixelformat der Kamera; MJPG erlaubt an USB 2 hohe Auflösungen mit voller Bildrate")
+    parser.add_argument("--max-frames", type=int, default=None,
+                        help="Nach dieser Anzahl Frames beenden")
+    args = parser.parse_args()
+
+    def load_models():
+        detector = load_detector(args.model, track=not args.gate)
+        # Die erste Inferenz ist die langsamste (Gewichte, Kernel, Puffer): hier statt im ersten Frame
+        detector.warmup()
+        gated = tracker = None
+        if args.gate:
+            from motion_gate import GatedDetector, MotionGate
+
+            gated = GatedDetector(detector, MotionGate(roi=tuple(args.roi) if args.roi else None))
+        if gated or not getattr(detector, "track", False):
+            # Das ONNX-Backend und die gegatete Erkennung liefern keine IDs; ohne sie
+            # wechseln die Kreisnamen in der UI von Frame zu Frame
+            from tracker import IouTracker
+
+            tracker = IouTracker()
+        print(detector.names)
+        return detector, gated, tracker
+
+    # Modell laden und aufwärmen, während Kamera und Fenster starten
+    loading = in_background(load_models, name="model-load")
+    webcamera = open_source(args.source, args.width, args.height, args.fps, args.fourcc)
+    calibration = None
+    if args.calibration:
+        from calibration import Calibration, RectifiedSource, Rectifier
+
+        calibration = Calibration.load(args.calibration)
+        if args.rectify:
+            # Inferenz auf dem kleineren, entzerrten Bogen; Koordinaten sind dann schon Bogenkoordinaten
+            webcamera = RectifiedSource(webcamera, Rectifier(calibration))
+    elif args.rectify:
+        parser.error("--rectify benötigt --calibration")
+
+    mapper = None
+    if args.layout:
+        from control_mapping import ControlMapper
+
+        mapper = ControlMapper.from_layout(args.layout)
+
+    def infer(frame):
+        if not loading.done() and not args.lossless:
+            # Die Vorschau läuft schon, Erkennungen gibt es ab dem fertig geladenen Modell
+            return Detections.empty()
+        detector, gated, tracker = loading.result()
+        detections = gated.detect(frame) if gated else detector.detect(frame)
+        if tracker:
+            detections = tracker.update(detections)
+        if mapper:
+            # Direkt nach der Inferenz senden, nicht erst in der Render-Stufe
+            mapper.update(detections)
+        return detections
+
+    bridge = None
+    if args.ui:
+        from ui_bridge import UiBridge
+
+        # Die Calibration selbst, damit die Brücke sie an die tatsächliche Kameraauflösung anpasst
+        bridge = UiBridge(args.ui, calibration if calibration and not args.rectify else None)
+
+    def sink(packet, detections):
+        # Im Inferenz-Thread mit dem Capture-Zeitstempel des Frames
+        bridge.update(detections, packet.timestamp, (packet.image.shape[1], packet.image.shape[0]))
+
+    recorder = None
+    if args.record:
+        from recording import Recorder
 
-print(model.names)
-webcamera = cv2.VideoCapture(0)
-# webcamera.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
-# webcamera.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
+        recorder = Recorder(args.record)
 
-while True:
-    success, frame = webcamera.read()
-    
-    results = model.track(frame, classes=[0,1,2,3,4,5,6,7,8,9], conf=0.1, imgsz=640, verbose=False)
-    cv2.putText(frame, f"Total: {len(results[0].boxes)}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
-    cv2.imshow("Live Camera", results[0].plot())
+    def render(packet, detections):
+        if recorder:
+            recorder.add(packet.timestamp, detections=detections)
+        names = loading.result()[0].names if loading.done() else {}
+        image = draw_detections(packet.image, detections, names)
+        cv2.putText(image, f"Total: {len(detections)}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2, cv2.LINE_AA)
+        if args.headless:
+            mark_first_frame("live")
+            return True
+        cv2.imshow("Live Camera", image)
+        mark_first_frame("live")
+        return cv2.waitKey(1) != ord('q')
 
-    #print (results[0])
+    pipeline = Pipeline(webcamera, infer, render, lossless=args.lossless, max_frames=args.max_frames,
+                        sink=sink if bridge else None)
+    report = pipeline.run()
+    print(format_report(report))
+    # Ist das Laden gescheitert, kommt die Ausnahme spätestens hier zum Vorschein
+    detector, gated, tracker = loading.result()
+    if gated:
+        from motion_gate import format_gate_report
 
-    if cv2.waitKey(1) == ord('q'):
-        break
+        print(format_gate_report(gated.report()))
+    if mapper:
+        emit = mapper.stats.summary()
+        if emit.get("count"):
+            print(f"OSC: {mapper.sent} Werte gesendet, Mapping+Senden p95 {emit['p95_ms']:.3f} ms")
+        mapper.close()
+    if bridge:
+        ack = bridge.stats.summary()
+        if ack.get("count"):
+            print(f"UI: {bridge.messages} Nachrichten, Aufnahme bis Bestätigung p50 {ack['p50_ms']:.1f} ms, "
+                  f"p95 {ack['p95_ms']:.1f} ms")
+        bridge.close()
+    if recorder:
+        recorder.close()
 
-webcamera.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+    webcamera.release()
+    if not args.headless:
+        cv2.destroyAllWindows()
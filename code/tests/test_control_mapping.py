@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+
+from control_mapping import Control, ControlMapper, check_against_listener, load_layout, synthetic_detections
+from detections import Detections
+
+LAYOUT = os.path.join(os.path.dirname(__file__), os.pardir, "layout_example.json")
+
+
+def _marker(x, y, cls=0, size=10.0):
+    return Detections(np.array([[x - size / 2, y - size / 2, x + size / 2, y + size / 2]], np.float32),
+                      np.ones(1, np.float32), np.array([cls], np.int32))
+
+
+def test_knob_value_is_position_angle_around_centre():
+    knob = Control("k", "knob", 0, [0, 0, 100, 100], "/k")
+    # 0° = oben, im Uhrzeigersinn; Bereich -135°..135°
+    assert knob.value_for(np.array([50.0, 10.0])) == pytest.approx(0.5)
+    assert knob.value_for(np.array([90.0, 50.0])) == pytest.approx((90 + 135) / 270)
+    assert knob.value_for(np.array([10.0, 50.0])) == pytest.approx((-90 + 135) / 270)
+    # Abstand zur Mitte spielt keine Rolle
+    assert knob.value_for(np.array([70.0, 30.0])) == pytest.approx(knob.value_for(np.array([95.0, 5.0])))
+
+
+def test_synthetic_sweep_maps_to_expected_values():
+    controls, _ = load_layout(LAYOUT)
+    frames = 50
+    recorded = synthetic_detections(controls, frames)
+    mapper = ControlMapper(controls, ("127.0.0.1", 9))
+    try:
+        for i, detections in enumerate(recorded):
+            t = i / (frames - 1)
+            changed = dict(mapper.update(detections))
+            for control in controls:
+                expected = round(t * (control.steps - 1)) / (control.steps - 1) if control.steps else t
+                assert control.value == pytest.approx(expected, abs=control.threshold + 1e-6)
+                if i == 0:
+                    assert control.name in changed
+    finally:
+        mapper.close()
+
+
+def test_listener_receives_exactly_the_sent_values():
+    controls, _ = load_layout(LAYOUT)
+    assert check_against_listener(LAYOUT, synthetic_detections(controls, 60), budget_ms=50.0)
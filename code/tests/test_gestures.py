@@ -0,0 +1,165 @@
+import math
+
+import numpy as np
+import pytest
+
+from gestures import GestureEngine, HysteresisSwitch, OneEuroFilter
+from hand_landmarks import analyze
+
+FPS = 30.0
+WRIST = np.array([300.0, 500.0])
+
+
+def make_hand(thumb_angle=0.4, pinch=150.0, fingers=(True, True, True, False), scale=1.0):
+    """
+    Synthetische (21, 2)-Hand mit vorgegebenem Daumenwinkel, Pinch-Abstand und gestreckten Fingern.
+
+    Die Zeigefingerbasis liegt 100 px über dem Handgelenk; die Daumenspitze ist
+    um thumb_angle dagegen gedreht und so weit entfernt, dass ihr Abstand zur
+    Zeigefingerbasis pinch beträgt.
+    """
+    points = np.zeros((21, 2))
+    points[0] = WRIST
+    mcp = WRIST + (0.0, -100.0)
+    direction = np.array([-math.sin(thumb_angle), -math.cos(thumb_angle)])
+    length = 100 * math.cos(thumb_angle) + math.sqrt(pinch ** 2 - (100 * math.sin(thumb_angle)) ** 2)
+    tip = WRIST + length * direction
+    for j, t in zip((1, 2, 3, 4), (0.25, 0.5, 0.75, 1.0)):
+        points[j] = WRIST + t * (tip - WRIST)
+    for f, up in enumerate(fingers):
+        x = 300.0 + 50 * f
+        base = 5 + 4 * f
+        points[base] = (x, 400.0) if f else mcp
+        points[base + 1] = (x, 300.0)                   # PIP
+        points[base + 2] = (x, 260.0 if up else 330.0)  # DIP
+        points[base + 3] = (x, 220.0 if up else 360.0)  # Spitze
+    return (WRIST + scale * (points - WRIST)).astype(np.float32)
+
+
+class Driver:
+    """Spielt Posen mit FPS Bildern pro Sekunde in die Engine."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.t = 0.0
+
+    def hold(self, hand, seconds):
+        events = []
+        for _ in range(int(round(seconds * FPS))):
+            events += self.engine.process(self.t, hand[None])
+            self.t += 1.0 / FPS
+        return events
+
+
+def kinds(events, *wanted):
+    return [e.kind for e in events if e.kind in wanted]
+
+
+def raw_engine():
+    # Sehr hohe Grenzfrequenz: der Filter folgt der Eingabe praktisch sofort
+    return GestureEngine(min_cutoff=1e4)
+
+
+def test_synthetic_hand_geometry():
+    hand = make_hand(thumb_angle=0.4, pinch=125.0, fingers=(True, False, True, False))
+    geometry = analyze(hand)
+    assert geometry.thumb_angle[0] == pytest.approx(0.4, abs=1e-4)
+    assert geometry.pinch[0] == pytest.approx(125.0, abs=1e-3)
+    assert geometry.fingers_up[0].tolist() == [True, False, True, False]
+    assert GestureEngine.AREA_ON[0] < geometry.area[0] < GestureEngine.AREA_ON[1]
+
+
+def test_grip_toggles_with_hysteresis():
+    drive = Driver(GestureEngine())
+    events = drive.hold(make_hand(thumb_angle=0.6), 1.0)
+    events += drive.hold(make_hand(thumb_angle=0.1), 1.0)
+    assert kinds(events, "grip_on", "grip_off") == ["grip_on"]
+    # Zwischen GRIP_ON (0.2) und GRIP_OFF (0.28): der Griff bleibt
+    events = drive.hold(make_hand(thumb_angle=0.24), 1.0)
+    assert kinds(events, "grip_on", "grip_off") == []
+    assert drive.engine.hands[1].grip.state
+    events = drive.hold(make_hand(thumb_angle=0.5), 1.0)
+    assert kinds(events, "grip_on", "grip_off") == ["grip_off"]
+
+
+def test_debounce_suppresses_flicker():
+    drive = Driver(raw_engine())
+    drive.hold(make_hand(thumb_angle=0.6), 0.5)
+    # Griff jeweils nur zwei Frames (67 ms < hold = 100 ms)
+    events = []
+    for _ in range(10):
+        events += drive.hold(make_hand(thumb_angle=0.1), 2 / FPS)
+        events += drive.hold(make_hand(thumb_angle=0.6), 3 / FPS)
+    assert kinds(events, "grip_on", "grip_off") == []
+    # Ein Griff, der lange genug anliegt, löst genau einmal aus, frühestens nach hold
+    start = drive.t
+    events = drive.hold(make_hand(thumb_angle=0.1), 0.5)
+    grip = [e for e in events if e.kind == "grip_on"]
+    assert len(grip) == 1 and grip[0].timestamp - start >= drive.engine.hold - 1e-9
+
+
+def test_hysteresis_switch_needs_uninterrupted_condition():
+    switch = HysteresisSwitch(hold=0.1)
+    assert switch.update(0.00, True, False) is None
+    assert switch.update(0.05, False, False) is None  # Unterbrechung setzt die Zeit zurück
+    assert switch.update(0.06, True, False) is None
+    assert switch.update(0.15, True, False) is None
+    assert switch.update(0.16, True, False) is True
+    assert switch.update(0.30, True, False) is None   # bleibt an, kein erneutes Ereignis
+    assert switch.update(0.31, False, True) is None
+    assert switch.update(0.42, False, True) is False
+
+
+def test_one_euro_filter_smooths_jitter_and_converges():
+    rng = np.random.default_rng(0)
+    f = OneEuroFilter(min_cutoff=1.0, beta=0.05)
+    target = np.full((21, 2), 100.0, np.float32)
+    noisy = [target + rng.normal(0, 3, target.shape).astype(np.float32) for _ in range(120)]
+    smoothed = np.array([f(i / FPS, x).copy() for i, x in enumerate(noisy)])
+    assert np.std(smoothed[30:] - target) < 0.5 * np.std(np.array(noisy[30:]) - target)
+    f = OneEuroFilter()
+    for i in range(60):
+        result = f(i / FPS, target + 50)
+    assert np.allclose(result, target + 50, atol=1e-3)
+
+
+def test_volume_follows_pinch_like_track_hands():
+    drive = Driver(raw_engine())
+    volume_pose = (True, True, True, False)
+    events = drive.hold(make_hand(pinch=125.0, fingers=volume_pose), 0.5)
+    assert kinds(events, "control_on") == ["control_on"]
+    volume = [e for e in events if e.kind == "volume"]
+    # np.interp(distance, [50, 200], [0, 100]) wie in track_hands.py
+    assert volume and volume[-1].value == pytest.approx(50.0, abs=0.1)
+    for pinch, expected in ((200.0, 100.0), (50.0, 0.0), (260.0, 100.0), (80.0, 20.0)):
+        events = drive.hold(make_hand(pinch=pinch, fingers=volume_pose), 0.5)
+        assert drive.engine.volume == pytest.approx(expected, abs=0.1)
+        assert [e.value for e in events if e.kind == "volume"][-1:] in ([], [pytest.approx(expected, abs=0.1)])
+    # Ohne Lautstärke-Pose (kleiner Finger gestreckt) ändert der Pinch nichts mehr
+    drive.hold(make_hand(pinch=80.0, fingers=(True, True, True, True)), 0.5)
+    events = drive.hold(make_hand(pinch=180.0, fingers=(True, True, True, True)), 0.5)
+    assert kinds(events, "volume") == []
+    assert drive.engine.volume == pytest.approx(20.0, abs=0.1)
+
+
+def test_mute_and_unmute_poses():
+    drive = Driver(raw_engine())
+    events = drive.hold(make_hand(fingers=(True, False, False, True)), 0.5)
+    assert kinds(events, "control_on", "mute", "unmute") == ["control_on", "mute"]
+    assert drive.engine.muted
+    # Gehaltene Pose schaltet nicht erneut
+    assert kinds(drive.hold(make_hand(fingers=(True, False, False, True)), 0.5), "mute", "unmute") == []
+    events = drive.hold(make_hand(fingers=(True, False, False, False)), 0.5)
+    assert kinds(events, "mute", "unmute") == ["unmute"]
+    assert not drive.engine.muted
+
+
+def test_gesture_control_needs_hand_size_in_range():
+    drive = Driver(raw_engine())
+    # Hand zu nah an der Kamera (Fläche über AREA_OFF): keine Steuerung, kein Mute
+    events = drive.hold(make_hand(fingers=(True, False, False, True), scale=2.5), 0.5)
+    assert kinds(events, "control_on", "mute") == []
+    events = drive.hold(make_hand(fingers=(True, False, False, True)), 0.5)
+    assert kinds(events, "control_on", "mute") == ["control_on", "mute"]
+    events = drive.hold(make_hand(fingers=(True, False, False, True), scale=2.5), 0.5)
+    assert kinds(events, "control_off") == ["control_off"]
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from hand_landmarks import ZERO_VECTOR_ANGLE, _scalar_reference, analyze
+
+
+def _frames(hands, count=200, seed=0):
+    # Ganzzahlige Pixelkoordinaten, damit die int()-Rundung der alten Berechnung nichts verändert
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 640, size=(count, hands, 21, 2)).astype(np.float32)
+
+
+@pytest.mark.parametrize("hands", [1, 2, 3])
+def test_matches_scalar_reference(hands):
+    for frame in _frames(hands):
+        geometry = analyze(frame)
+        for h, hand in enumerate(frame):
+            angle, distance, box, area, fingers = _scalar_reference(hand)
+            assert abs(geometry.thumb_angle[h] - angle) < 1e-4
+            assert abs(geometry.pinch[h] - distance) < 1e-3
+            assert tuple(geometry.box[h].astype(int)) == box
+            assert int(geometry.area[h]) == area
+            assert geometry.fingers_up[h].astype(int).tolist() == fingers
+
+
+def test_single_hand_path_matches_vectorized_path():
+    for frame in _frames(1):
+        single = analyze(frame)
+        # Dieselbe Hand zweimal geht über den vektorisierten Pfad
+        both = analyze(np.concatenate([frame, frame]))
+        for field in single.__dataclass_fields__:
+            a, b = getattr(single, field), getattr(both, field)[:1]
+            assert a.shape == b.shape and a.dtype == b.dtype
+            # arccos in float32 ist nahe 0 und pi ungenauer als in float64
+            assert np.allclose(a, b, atol=1e-3), field
+
+
+def test_zero_vectors_and_input_shapes():
+    hand = np.zeros((21, 3), np.float32)
+    geometry = analyze(hand)
+    assert geometry.joint_angles.shape == (1, 15)
+    assert np.all(geometry.joint_angles == np.float32(ZERO_VECTOR_ANGLE))
+    assert geometry.thumb_angle[0] == np.float32(ZERO_VECTOR_ANGLE)
+    assert analyze(np.zeros((0, 21, 2), np.float32)).box.shape == (0, 4)
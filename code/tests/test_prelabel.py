@@ -0,0 +1,80 @@
+import json
+import os
+
+import cv2
+import numpy as np
+
+import prelabel
+from detections import Detections
+from prelabel import CACHE_NAME, cache_header, load_cache
+
+
+class _FakeDetector:
+    def __init__(self):
+        self.images = 0
+
+    def detect_batch(self, images):
+        self.images += len(images)
+        return [Detections(np.array([[0, 0, 10, 10]], np.float32), np.ones(1, np.float32), np.zeros(1, np.int32))
+                for _ in images]
+
+
+def _write(path, lines):
+    with open(path, "wb") as f:
+        f.write(b"".join(lines))
+
+
+def _record(sha1, labels=()):
+    return json.dumps({"sha1": sha1, "labels": list(labels)}).encode() + b"\n"
+
+
+def test_truncated_tail_is_cut_so_appended_records_load(tmp_path):
+    header = {"model_sha1": "m", "conf": 0.25, "imgsz": 640}
+    path = str(tmp_path / CACHE_NAME)
+    _write(path, [json.dumps({"header": header}).encode() + b"\n", _record("a"), b'{"sha1": "b", "lab'])
+    assert load_cache(path, header) == {"a": []}
+    # Ein fortgesetzter Lauf hängt an
+    with open(path, "ab") as f:
+        f.write(_record("c") + _record("d"))
+    assert load_cache(path, header) == {"a": [], "c": [], "d": []}
+
+
+def test_complete_json_without_newline_counts_as_truncated(tmp_path):
+    header = {"model_sha1": "m", "conf": 0.25, "imgsz": 640}
+    path = str(tmp_path / CACHE_NAME)
+    _write(path, [json.dumps({"header": header}).encode() + b"\n", _record("a"), _record("b")[:-1]])
+    assert load_cache(path, header) == {"a": []}
+    with open(path, "ab") as f:
+        f.write(_record("c"))
+    assert load_cache(path, header) == {"a": [], "c": []}
+
+
+def test_mismatching_header_discards_cache(tmp_path):
+    path = str(tmp_path / CACHE_NAME)
+    _write(path, [json.dumps({"header": {"model_sha1": "m", "conf": 0.25, "imgsz": 640}}).encode() + b"\n"])
+    assert load_cache(path, {"model_sha1": "m", "conf": 0.5, "imgsz": 640}) is None
+
+
+def test_resumed_run_after_interruption(tmp_path, monkeypatch):
+    detector = _FakeDetector()
+    monkeypatch.setattr(prelabel, "load_detector", lambda *args, **kwargs: detector)
+    model = tmp_path / "model.onnx"
+    model.write_bytes(b"weights")
+    for i in range(4):
+        cv2.imwrite(str(tmp_path / f"{i}.png"), np.full((20, 20, 3), i * 40, np.uint8))
+    prelabel.prelabel(str(tmp_path), str(model), batch=2)
+    assert detector.images == 4
+
+    # Abbruch mitten im letzten Cache-Eintrag, Labels werden neu geschrieben
+    cache_path = str(tmp_path / CACHE_NAME)
+    os.truncate(cache_path, os.path.getsize(cache_path) - 5)
+    for i in range(4):
+        os.remove(tmp_path / f"{i}.txt")
+    prelabel.prelabel(str(tmp_path), str(model), batch=2)
+    assert detector.images == 5
+    # Der neu geschriebene Eintrag wird beim nächsten Lauf gelesen
+    for i in range(4):
+        os.remove(tmp_path / f"{i}.txt")
+    report = prelabel.prelabel(str(tmp_path), str(model), batch=2)
+    assert detector.images == 5 and report["cached"] == 4
+    assert len(load_cache(cache_path, cache_header(str(model), 0.25, 640))) == 4
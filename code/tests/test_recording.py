@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+from detections import Detections
+from recording import MAGIC, Recorder, RecordingReader
+
+
+def _detections(n, offset=0.0):
+    xyxy = np.tile(np.array([[10, 10, 30, 30]], np.float32), (n, 1)) + offset
+    return Detections(xyxy, np.full(n, 0.9, np.float32), np.arange(n, dtype=np.int32), np.arange(n, dtype=np.int32))
+
+
+def _record(path, frames, start=0, chunk_frames=4):
+    recorder = Recorder(path, chunk_frames=chunk_frames)
+    for i in range(start, start + frames):
+        recorder.add(float(i), hands=np.full((1, 21, 3), i, np.float32), detections=_detections(i % 3, i))
+    recorder.close()
+
+
+def test_round_trip_and_append(tmp_path):
+    path = str(tmp_path / "a.smcrec")
+    _record(path, 10)
+    _record(path, 5, start=10)
+    timestamps = [t for t, _, _ in RecordingReader(path).frames()]
+    assert timestamps == [float(i) for i in range(15)]
+    for t, hands, detections in RecordingReader(path).frames():
+        assert hands[0, 0, 0] == t and len(detections) == int(t) % 3
+
+
+def test_append_after_truncated_chunk(tmp_path):
+    path = str(tmp_path / "a.smcrec")
+    _record(path, 8)
+    complete = os.path.getsize(path)
+    _record(path, 4, start=8)
+    # Letzten Block mitten im Schreiben abbrechen
+    os.truncate(path, os.path.getsize(path) - 20)
+    assert len(RecordingReader(path)) == 8
+    _record(path, 4, start=100)
+    reader = RecordingReader(path)
+    assert [t for t, _, _ in reader.frames()] == [float(i) for i in range(8)] + [100.0, 101.0, 102.0, 103.0]
+    assert os.path.getsize(path) > complete
+
+
+def test_refuses_to_append_to_other_files(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"keine Aufnahme, aber lang genug")
+    with pytest.raises(ValueError):
+        Recorder(str(path))
+    assert path.read_bytes() == b"keine Aufnahme, aber lang genug"
+
+
+def test_partial_header_is_rewritten(tmp_path):
+    path = tmp_path / "a.smcrec"
+    path.write_bytes(MAGIC[:3])
+    _record(str(path), 3)
+    assert len(RecordingReader(str(path))) == 3
+
+
+def test_untracked_detections_come_back_without_ids(tmp_path):
+    from ui_bridge import detections_to_circles
+
+    path = str(tmp_path / "a.smcrec")
+    xyxy = np.array([[10, 10, 30, 30], [50, 50, 70, 70], [90, 90, 110, 110]], np.float32)
+    recorder = Recorder(path)
+    recorder.add(0.0, detections=Detections(xyxy, np.full(3, 0.9, np.float32), np.arange(3, dtype=np.int32)))
+    recorder.add(1.0, detections=Detections(xyxy, np.full(3, 0.9, np.float32), np.arange(3, dtype=np.int32),
+                                            np.array([4, 5, 6], np.int32)))
+    recorder.add(2.0)
+    recorder.close()
+
+    (_, _, untracked), (_, _, tracked), (_, _, empty) = RecordingReader(path).frames()
+    assert untracked.ids is None
+    assert sorted(detections_to_circles(untracked, np.eye(3))) == ["marker_0_0", "marker_1_0", "marker_2_0"]
+    assert tracked.ids.tolist() == [4, 5, 6]
+    assert empty.ids is None and len(empty) == 0
@@ -0,0 +1,70 @@
+"""
+Leichtgewichtiger IoU-Tracker für Marker-Erkennungen.
+
+Jede Bildquelle bekommt eine eigene Tracker-Instanz, damit mehrere Kameras
+ein gemeinsames Modell nutzen können, ohne dass sich ihre IDs vermischen.
+"""
+import numpy as np
+
+from detections import Detections
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Paarweise IoU zwischen (N, 4)- und (M, 4)-Boxen im xyxy-Format als (N, M)-Matrix."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class IouTracker:
+    """
+    Ordnet Erkennungen gleicher Klasse bestehenden Tracks über die höchste IoU zu.
+
+    Args:
+        iou_threshold (float): Mindest-IoU für eine Zuordnung.
+        max_age (int): Anzahl Frames, die ein Track ohne Erkennung erhalten bleibt.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, max_age: int = 15):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.boxes = np.zeros((0, 4), np.float32)
+        self.classes = np.zeros(0, np.int32)
+        self.ids = np.zeros(0, np.int32)
+        self.ages = np.zeros(0, np.int32)
+        self.next_id = 1
+
+    def update(self, detections: Detections) -> Detections:
+        """Vergibt Tracker-IDs für die Erkennungen eines Frames und gibt sie mit ids zurück."""
+        count = len(detections)
+        det_ids = np.full(count, -1, np.int32)
+        matched_tracks = np.zeros(len(self.ids), bool)
+
+        if count and len(self.ids):
+            iou = iou_matrix(detections.xyxy, self.boxes)
+            iou[detections.cls[:, None] != self.classes[None, :]] = 0.0
+            # Gierige Zuordnung: Paare absteigend nach IoU
+            for flat in np.argsort(iou, axis=None)[::-1]:
+                d, t = divmod(int(flat), len(self.ids))
+                if iou[d, t] < self.iou_threshold:
+                    break
+                if det_ids[d] >= 0 or matched_tracks[t]:
+                    continue
+                det_ids[d] = self.ids[t]
+                matched_tracks[t] = True
+
+        new = det_ids < 0
+        det_ids[new] = np.arange(self.next_id, self.next_id + int(new.sum()), dtype=np.int32)
+        self.next_id += int(new.sum())
+
+        # Nicht zugeordnete Tracks altern, zugeordnete und neue werden aktualisiert
+        keep = ~matched_tracks & (self.ages + 1 <= self.max_age)
+        self.boxes = np.concatenate([self.boxes[keep], detections.xyxy])
+        self.classes = np.concatenate([self.classes[keep], detections.cls])
+        self.ids = np.concatenate([self.ids[keep], det_ids])
+        self.ages = np.concatenate([self.ages[keep] + 1, np.zeros(count, np.int32)])
+
+        return Detections(detections.xyxy, detections.conf, detections.cls, det_ids)
@@ -0,0 +1,202 @@
+"""
+Brücke von den Marker-Erkennungen zur Kreisanzeige in UI/main.py.
+
+Die Mittelpunkte der YOLO-Boxen werden mit einer kalibrierten Homographie von
+Kamerapixeln auf den Hintergrund der UI abgebildet (calibration.py). Jede Tracker-ID bekommt
+einen festen Kreisnamen ("marker_<id>"). Pro Frame werden nur geänderte,
+neue und verschwundene Kreise über eine dauerhafte WebSocket-Verbindung
+(/ws/circles) an die UI geschickt, zusammen mit dem Aufnahmezeitpunkt des
+Frames. Ein Sende-Thread fasst Änderungen zusammen, die eintreffen, während
+die vorige Nachricht noch unterwegs ist, sodass die Kamera nie auf das Netz
+wartet.
+
+Die UI misst daraus die Glass-to-Glass-Latenz (Aufnahme bis gezeichnetes
+Pixel, GET /latency); die Brücke selbst misst die Zeit bis zur Bestätigung.
+"""
+import json
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from calibration import Calibration, project
+from detections import Detections
+from metrics import StageStats
+
+# RGB-Farben der Kreise pro Marker-Klasse
+PALETTE = [(230, 25, 75), (60, 180, 75), (255, 225, 25), (0, 130, 200), (245, 130, 48),
+           (145, 30, 180), (70, 240, 240), (240, 50, 230), (210, 245, 60), (250, 190, 212)]
+
+
+def load_homography(path: str) -> np.ndarray:
+    """Lädt eine 3x3-Homographie (JSON mit Schlüssel "homography", z.B. aus calibration.py, oder .npy)."""
+    if path.endswith(".npy"):
+        return np.load(path).astype(np.float64).reshape(3, 3)
+    with open(path, "r") as f:
+        return np.asarray(json.load(f)["homography"], dtype=np.float64).reshape(3, 3)
+
+
+def detections_to_circles(detections: Detections, homography: np.ndarray, prefix: str = "marker_") -> Dict[str, dict]:
+    """Bildet die Erkennungen auf Kreise (Name -> Circle-Dictionary) in UI-Koordinaten ab."""
+    if not len(detections):
+        return {}
+    xyxy = detections.xyxy
+    centers = (xyxy[:, :2] + xyxy[:, 2:]) / 2
+    # Mittelpunkt und die vier Boxecken in einem Aufruf abbilden
+    corners = np.stack([xyxy[:, [0, 1]], xyxy[:, [2, 1]], xyxy[:, [2, 3]], xyxy[:, [0, 3]]], axis=1)
+    mapped = project(homography, np.concatenate([centers[:, None], corners], axis=1))
+    mapped = mapped.reshape(len(detections), 5, 2)
+    radius = np.linalg.norm(mapped[:, 1:] - mapped[:, :1], axis=2).mean(axis=1) / np.sqrt(2)
+    if detections.ids is not None:
+        keys = detections.ids.tolist()
+    else:
+        # Ohne Tracker: Reihenfolge pro Klasse, nicht stabil über die Frames (daher vorher
+        # tracker.IouTracker verwenden, wenn das Backend selbst nicht trackt)
+        keys = [f"{c}_{(detections.cls[:i] == c).sum()}" for i, c in enumerate(detections.cls.tolist())]
+    circles = {}
+    for key, (x, y), r, c in zip(keys, mapped[:, 0].tolist(), radius.tolist(), detections.cls.tolist()):
+        name = f"{prefix}{key}"
+        circles[name] = {"name": name, "x": int(round(x)), "y": int(round(y)),
+                         "radius": max(1, int(round(r))), "color": PALETTE[c % len(PALETTE)]}
+    return circles
+
+
+class UiBridge:
+    """
+    Schickt getrackte Marker als Kreise an die UI.
+
+    Args:
+        url (str): WebSocket-Adresse der UI, z.B. ws://127.0.0.1:8000/ws/circles.
+        homography (np.ndarray | Calibration): Optional, Kamera -> UI-Hintergrund (sonst Identität).
+            Eine Calibration wird in update() an die tatsächliche Bildgröße
+            angepasst (Calibration.for_frame_size); eine 3x3-Matrix gilt nur
+            für die Auflösung, mit der sie kalibriert wurde.
+        min_move (float): Mindeständerung in UI-Pixeln für ein erneutes Senden.
+        lost_frames (int): Frames ohne Erkennung, nach denen ein Kreis entfernt wird.
+        prefix (str): Namensprefix der Kreise.
+    """
+
+    def __init__(self, url: str, homography: Union[np.ndarray, Calibration, None] = None, min_move: float = 1.0,
+                 lost_frames: int = 15, prefix: str = "marker_"):
+        from websockets.sync.client import connect
+
+        self._connect = connect
+        self.url = url
+        self.calibration = homography if isinstance(homography, Calibration) else None
+        if self.calibration is not None:
+            homography = self.calibration.homography
+        self.homography = np.eye(3) if homography is None else homography
+        self._frame_size: Optional[Tuple[int, int]] = None
+        self.min_move = min_move
+        self.lost_frames = lost_frames
+        self.prefix = prefix
+        self.stats = StageStats("ui_ack")  # Aufnahme bis Bestätigung durch die UI
+        self.messages = 0
+        self.errors = 0
+        self._sent: Dict[str, dict] = {}      # zuletzt gesendeter Stand pro Name
+        self._last_seen: Dict[str, int] = {}
+        self._frame = 0
+        self._pending: Dict[str, dict] = {}
+        self._deleted: Set[str] = set()
+        self._capture_time = 0.0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._send_loop, name="ui-bridge", daemon=True)
+        self._thread.start()
+
+    def circles_for(self, detections: Detections) -> Dict[str, dict]:
+        """Bildet die Erkennungen auf Kreise (Name -> Circle-Dictionary) in UI-Koordinaten ab."""
+        return detections_to_circles(detections, self.homography, self.prefix)
+
+    def _changed(self, circle: dict) -> bool:
+        previous = self._sent.get(circle["name"])
+        return (previous is None or abs(circle["x"] - previous["x"]) >= self.min_move
+                or abs(circle["y"] - previous["y"]) >= self.min_move
+                or circle["radius"] != previous["radius"] or circle["color"] != previous["color"])
+
+    def update(self, detections: Detections, timestamp: float,
+               frame_size: Optional[Tuple[int, int]] = None) -> int:
+        """
+        Übernimmt die Erkennungen eines Frames.
+
+        Args:
+            detections (Detections): Getrackte Erkennungen (mit ids).
+            timestamp (float): Capture-Zeitstempel des Frames (time.perf_counter()).
+            frame_size (tuple): (w, h) des Frames, passt eine Calibration an die Auflösung an.
+
+        Returns:
+            int: Anzahl geänderter oder entfernter Kreise.
+        """
+        if self.calibration is not None and frame_size is not None and frame_size != self._frame_size:
+            self.homography = self.calibration.for_frame_size(frame_size).homography
+            self._frame_size = frame_size
+        self._frame += 1
+        circles = self.circles_for(detections)
+        upsert = [c for c in circles.values() if self._changed(c)]
+        for name in circles:
+            self._last_seen[name] = self._frame
+        delete = [name for name, seen in self._last_seen.items() if self._frame - seen > self.lost_frames]
+        for name in delete:
+            del self._last_seen[name]
+        if not upsert and not delete:
+            return 0
+        capture_time = time.time() - (time.perf_counter() - timestamp)
+        with self._cond:
+            for name in delete:
+                self._sent.pop(name, None)
+            for circle in upsert:
+                self._sent[circle["name"]] = circle
+                self._pending[circle["name"]] = circle
+                self._deleted.discard(circle["name"])
+            for name in delete:
+                self._pending.pop(name, None)
+                self._deleted.add(name)
+            self._capture_time = capture_time
+            self._cond.notify()
+        return len(upsert) + len(delete)
+
+    def _take(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._pending or self._deleted or self._closed)
+            message = {"upsert": list(self._pending.values()), "delete": sorted(self._deleted),
+                       "capture_time": self._capture_time}
+            self._pending, self._deleted = {}, set()
+            return message
+
+    def _send_loop(self):
+        websocket = None
+        while not self._closed:
+            message = self._take()
+            if not message["upsert"] and not message["delete"]:
+                continue
+            try:
+                if websocket is None:
+                    websocket = self._connect(self.url)
+                    # Nach (Wieder-)Verbindung den vollen Stand schicken
+                    with self._cond:
+                        message["upsert"] = list(self._sent.values())
+                websocket.send(json.dumps(message))
+                reply = json.loads(websocket.recv())
+                self.messages += 1
+                if "error" in reply:
+                    self.errors += 1
+                    print(f"UI meldet Fehler: {reply['error']}")
+                else:
+                    self.stats.add(time.time() - message["capture_time"])
+            except Exception as e:  # OSError, websockets.ConnectionClosed u.a.
+                self.errors += 1
+                print(f"Keine Verbindung zur UI ({self.url}): {e}")
+                websocket = None
+                # Entfernte Kreise erneut vormerken; der übrige Stand geht beim Verbinden vollständig raus
+                with self._cond:
+                    self._deleted.update(name for name in message["delete"] if name not in self._sent)
+                time.sleep(1.0)
+        if websocket is not None:
+            websocket.close()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=2.0)